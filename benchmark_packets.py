@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks ETFetch packet compilation on synthetic packet directories.
+
+Compile time per field should stay flat as the number of fields grows.
+
+Usage: python benchmark_packets.py [n_fields ...]
+"""
+from collections import deque
+from src import ETFetch
+
+import numpy as np
+import pandas as pd
+import sys
+import tempfile
+import time
+
+NAMES = ["actual_et", "actual_eto", "actual_etof"]
+# Roughly a year of daily values per field.
+N_DAYS = 365
+
+def write_packets(path: str, n_fields: int) -> None:
+    times = pd.date_range("2024-01-01", periods=N_DAYS).strftime("%Y-%m-%d")
+    rng = np.random.default_rng(0)
+    for field in range(n_fields):
+        for name in NAMES:
+            values = rng.random(N_DAYS).round(3)
+            pd.DataFrame({"time": times, name.split("_")[1]: values}).to_csv(
+                f"{path}/CA_{field}.47.{name}.csv", index=False
+            )
+
+def compile_time(n_fields: int) -> float:
+    with tempfile.TemporaryDirectory() as tempdir:
+        fetch = ETFetch(deque(), pd.DataFrame(), api_key="")
+        fetch.__temp_bin__ = f"{tempdir}/"
+        fetch.__names__ = NAMES
+        write_packets(tempdir, n_fields)
+
+        start = time.perf_counter()
+        fetch.__compile_packets__()
+        elapsed = time.perf_counter() - start
+
+        assert len(fetch.data_table) == n_fields * N_DAYS
+        return elapsed
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [250, 500, 1000, 2000]
+
+    print(f"{'fields':>8} {'seconds':>10} {'ms/field':>10}")
+    for n_fields in sizes:
+        elapsed = compile_time(n_fields)
+        print(f"{n_fields:>8} {elapsed:>10.2f} {elapsed / n_fields * 1000:>10.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -3,15 +3,15 @@
 # reference_et: cimis
 # 1985-2024
 # 468 files per band
-from src import ETRequest
+from src import ETRequest, RateLimiter
 from datetime import datetime
 
 from dotenv import dotenv_values
 
-import time
-
 endpoint = "https://developer.openet-api.org/raster/export/stack"
 key = dotenv_values(".env").get('ET_KEY')
+# One export job every 2 seconds.
+limiter = RateLimiter(rate=0.5)
 
 def export_stacks():
     year_start = 1985
@@ -35,11 +35,11 @@ def export_stacks():
         }
         
         req = ETRequest(endpoint, request_arg, key=key)
+        req.limiter = limiter
         
         req.send()
         
         year_end-=1
-        time.sleep(2)
 
 def main():
     export_stacks()
@@ -1,15 +1,16 @@
 import argparse
-import gzip
 import pathlib
 from typing import Any
 
 from dotenv import dotenv_values
 from geopandas import GeoDataFrame
-from pandas import DataFrame
-from shapely import get_coordinates
+from shapely import get_coordinates, get_parts
 from shapely.geometry.polygon import Polygon
 from requests import post
 
+from src.ETCatalog import FieldCatalog
+from src.ETDecode import loads, records_frame
+
 FIELD_ID_ENDPOINT = "https://developer.openet-api.org/geodatabase/metadata/ids"
 BOUNDARIES_ENDPOINT = "https://developer.openet-api.org/geodatabase/metadata/boundaries"
 PROPERTIES_ENDPOINT = "https://developer.openet-api.org/geodatabase/metadata/properties"
@@ -19,45 +20,61 @@ parser.add_argument("--outer", "-i")
 parser.add_argument("--asset", "-a")
 parser.add_argument("--name-property", "-p")
 parser.add_argument("--export-shp", "-s", action="store_true")
+parser.add_argument("--catalog", "-c", help="SQLite field catalog. Defaults to ET_CATALOG_PATH, if set")
 
-def get_intersecting_fields(outer: Polygon, key: str) -> GeoDataFrame:
-    outer_coords = list(get_coordinates(outer).flatten())
-
-    fields_req = post(
-        url = FIELD_ID_ENDPOINT,
+def fetch(endpoint: str, key: str, params: dict) -> bytes:
+    req = post(
+        url = endpoint,
         headers = {"Authorization": key},
-        json = {"geometry": outer_coords}
+        json = params
     )
 
-    if not fields_req.ok:
-        raise Exception(fields_req.json()["detail"])
+    if not req.ok:
+        raise Exception(req.json()["detail"])
     
-    field_ids = eval(gzip.decompress(fields_req.content).decode())
-
-    boundaries_req = post(
-        url = BOUNDARIES_ENDPOINT,
-        headers = {"Authorization": key},
-        json = {"field_ids": field_ids}
-    )
-
-    if not boundaries_req.ok:
-        raise Exception(boundaries_req.json()["detail"])
-
-    boundaries = eval(gzip.decompress(boundaries_req.content).decode())
-
-    gdf = GeoDataFrame.from_features(boundaries, columns=["field_id", "geometry"], crs="EPSG:4326")
-
-    properties_req = post(
-        url = PROPERTIES_ENDPOINT,
-        headers = {"Authorization": key},
-        json = {"field_ids": field_ids}
-    )
+    return req.content
 
-    if not properties_req.ok:
-        raise Exception(properties_req.json()["detail"])
+def query_field_ids(outer: Polygon, key: str, catalog: FieldCatalog | None = None) -> list[str]:
+    if catalog is None:
+        return loads(fetch(FIELD_ID_ENDPOINT, key, {"geometry": list(get_coordinates(outer).flatten())}))
+    
+    # Where earlier queries cover the polygon, fields are found among the stored boundaries.
+    covered = catalog.coverage(outer)
+    field_ids = [] if covered.is_empty else catalog.intersecting(covered)
+    
+    # Only the rest is queried, one ring per part.
+    for part in get_parts(outer.difference(covered)):
+        if isinstance(part, Polygon) and part.area > 0:
+            field_ids += loads(fetch(FIELD_ID_ENDPOINT, key, {"geometry": list(get_coordinates(part.exterior).flatten())}))
+    
+    return list(dict.fromkeys(field_ids))
 
-    properties = eval(gzip.decompress(properties_req.content).decode())
-    df = DataFrame.from_records(properties)
+def get_intersecting_fields(outer: Polygon, key: str, catalog: FieldCatalog | None = None) -> GeoDataFrame:
+    # Field IDs of a polygon queried before are read from the catalog.
+    field_ids = catalog.field_ids(outer) if catalog else None
+    
+    if field_ids is None:
+        field_ids = query_field_ids(outer, key, catalog)
+        if catalog:
+            catalog.put_field_ids(outer, field_ids)
+
+    if catalog is None:
+        boundaries = loads(fetch(BOUNDARIES_ENDPOINT, key, {"field_ids": field_ids}))
+        gdf = GeoDataFrame.from_features(boundaries, columns=["field_id", "geometry"], crs="EPSG:4326")
+        df = records_frame(fetch(PROPERTIES_ENDPOINT, key, {"field_ids": field_ids}))
+    else:
+        # Only boundaries and properties missing from the catalog are fetched.
+        missing = catalog.missing_boundaries(field_ids)
+        if len(missing) > 0:
+            boundaries = loads(fetch(BOUNDARIES_ENDPOINT, key, {"field_ids": missing}))
+            catalog.put_boundaries(boundaries["features"] if isinstance(boundaries, dict) else boundaries)
+        
+        missing = catalog.missing_properties(field_ids)
+        if len(missing) > 0:
+            catalog.put_properties(records_frame(fetch(PROPERTIES_ENDPOINT, key, {"field_ids": missing})))
+        
+        gdf = catalog.boundaries(field_ids)
+        df = catalog.properties(field_ids)
     
     # Get only the latest year for the crop columns.
     crop_years = [col for col in list(df.columns) if col.startswith("crop_")]
@@ -68,7 +85,7 @@ def get_intersecting_fields(outer: Polygon, key: str) -> GeoDataFrame:
     
     return gdf[["field_id"] + crop_years + ["geometry"]]
     
-def ee_GIF(region_asset: str, key: str, shp: bool = False, name_prop: str = "NAME"):
+def ee_GIF(region_asset: str, key: str, shp: bool = False, name_prop: str = "NAME", catalog: FieldCatalog | None = None):
     from ee import FeatureCollection, Initialize # type: ignore
     
     Initialize()
@@ -78,7 +95,7 @@ def ee_GIF(region_asset: str, key: str, shp: bool = False, name_prop: str = "NAM
     for feature in asset["features"]:
         shapely_poly = Polygon(feature["geometry"]["coordinates"][0])
         
-        gdf = get_intersecting_fields(shapely_poly, key)
+        gdf = get_intersecting_fields(shapely_poly, key, catalog)
         
         gdf.to_file(f"{feature["properties"][name_prop]}_properties.geojson", driver="GeoJSON")
         
@@ -89,9 +106,12 @@ def ee_GIF(region_asset: str, key: str, shp: bool = False, name_prop: str = "NAM
 
 def main():
     args = parser.parse_args()
-    key = dotenv_values(".env")["ET_KEY"]
+    config = dotenv_values(".env")
+    key = config["ET_KEY"]
     assert key
     
+    catalog = FieldCatalog(args.catalog) if args.catalog else FieldCatalog.from_config(config)
+    
     if args.outer:
         file = pathlib.Path(args.outer)
         
@@ -100,7 +120,7 @@ def main():
             raise FileNotFoundError(f"File {args.outer} does not exist.")
         
         outer_border = GeoDataFrame.from_file(args.outer)
-        gdf = get_intersecting_fields(outer_border.iloc[0].geometry, key)
+        gdf = get_intersecting_fields(outer_border.iloc[0].geometry, key, catalog)
         
         gdf.to_file(f"{file.stem}_fields.geojson", driver="GeoJSON")
     
@@ -108,7 +128,7 @@ def main():
         if not args.name_property:
             raise Exception("Name property must be specified.")
         
-        ee_GIF(args.asset, key, shp=args.export_shp, name_prop=args.name_property)
+        ee_GIF(args.asset, key, shp=args.export_shp, name_prop=args.name_property, catalog=catalog)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -8,12 +8,15 @@ from collections import deque
 from copy import deepcopy
 from datetime import datetime, timedelta
 from dotenv import dotenv_values
-from src import ETArg, ETFetch
+from src import (
+    ETArg, ETFetch, ForecastArchive, RateLimiter, Reference, ResponseCache, read_history, set_cache, set_limiter,
+    update_history
+)
+from src.ETGeometry import load_reference, simplification_from_config
 from src.ETUtils import CloudStorage, Authenticate
 
 import logging
 import os
-import pandas as pd
 import sys
 import time
 
@@ -38,11 +41,19 @@ logger = logging.getLogger(__name__)
 fret_endpoint = "https://developer.openet-api.org/experimental/raster/timeseries/forecasting/fret"
 timeseries_endpoint = "https://developer.openet-api.org/raster/timeseries/polygon"
 
-api_key = dotenv_values(".env").get("ET_KEY")
-kern_fields = pd.read_csv("./data/kern_polygons.csv", low_memory=False).set_index("OPENET_ID")
-monterey_fields = pd.read_csv("./data/monterey_polygons.csv", low_memory=False).set_index("OPENET_ID")
-# Drop fields with too large of polygons
-monterey_fields.drop(index=['CA_244144', 'CA_244402'], inplace=True)
+config = dotenv_values(".env")
+api_key = config.get("ET_KEY")
+# Throttles every request when ET_RATE_PER_MINUTE is set in .env.
+set_limiter(RateLimiter.from_config(config))
+# Serves repeated requests from disk when ET_CACHE_DIR is set in .env.
+set_cache(ResponseCache.from_config(config))
+# Polygons are simplified once and cached to keep request payloads small when ET_SIMPLIFY_GEOMETRY is set in .env.
+simplification = simplification_from_config(config)
+kern_fields = load_reference("./data/kern_polygons.csv", "OPENET_ID", **simplification)
+monterey_fields = load_reference("./data/monterey_polygons.csv", "OPENET_ID", **simplification)
+if not simplification:
+    # Drop fields with too large of polygons
+    monterey_fields.drop(index=['CA_244144', 'CA_244402'], inplace=True)
 
 def main():
     if not api_key:
@@ -57,6 +68,11 @@ def main():
 
     monterey_queue = deque(monterey_fields.index.to_list())
     kern_queue = deque(kern_fields.index.to_list())
+    # Geometries are parsed once and shared by every weekly fetch.
+    monterey_reference = Reference(monterey_fields)
+    kern_reference = Reference(kern_fields)
+    # FRET forecasts of every county, partitioned for the notebooks.
+    fret_archive = ForecastArchive("data/forecasts/archive/fret")
 
     eto_arg = ETArg(
         "fret_eto",
@@ -81,23 +97,25 @@ def main():
                 
                 # -- Monterey FRET -- #
                 monterey_fret = ETFetch(
-                    deepcopy(monterey_queue), monterey_fields, api_key=api_key
+                    deepcopy(monterey_queue), monterey_reference, api_key=api_key
                 )  # type: ignore
                 monterey_fret.start(request_args=[eto_arg], logger=logger, packets=True, frequency='daily')
                 storage_client.fetch_save(
                     monterey_fret,
                     f"forecasts/fret/monterey_fret_{export_date_format}.csv",
                 )
+                fret_archive.write(monterey_fret.data_table, county="monterey", forecast_date=export_date_format, logger=logger)
                 
                 # -- Kern FRET -- #
                 kern_fret = ETFetch(
-                    deepcopy(kern_queue), kern_fields, api_key=api_key
+                    deepcopy(kern_queue), kern_reference, api_key=api_key
                 )  # type: ignore
                 
                 kern_fret.start(request_args=[eto_arg], logger=logger, packets=True, frequency='daily')
                 storage_client.fetch_save(
                     kern_fret, f"forecasts/fret/kern_fret_{export_date_format}.csv"
                 )
+                fret_archive.write(kern_fret.data_table, county="kern", forecast_date=export_date_format, logger=logger)
                 
                 logger.info(
                     f"FRET fetched on: {check_time}. Next check will be on: {upcoming_check_time}"
@@ -156,27 +174,32 @@ def main():
             },
         )
 
+        # Only the dates after each field's last available date are requested and appended to the existing data.
         logger.info("Fetching Monterey County historical data.")
-        mo_historical_fetch = ETFetch(
-            monterey_queue, monterey_fields, api_key=api_key
-        )  # type: ignore
-        mo_historical_fetch.start(
+        mo_historical_fetch = update_history(
+            read_history("data/monterey_polygon_historical.csv", storage_client),
+            monterey_queue,
+            monterey_reference,
+            api_key=api_key,  # type: ignore
             request_args=[historical_arg_et, historical_arg_eto, historical_arg_etof],
-            frequency="daily",
-            packets=True,
+            end_date=final_fetch_time_api_format,
             logger=logger,
+            packets=True,
         )
         storage_client.fetch_save(
             mo_historical_fetch, "monterey_polygon_historical.csv"
         )
 
         logger.info("Fetching Kern County historical data.")
-        ke_historical_fetch = ETFetch(kern_queue, kern_fields, api_key=api_key)  # type: ignore
-        ke_historical_fetch.start(
+        ke_historical_fetch = update_history(
+            read_history("data/kern_polygon_historical.csv", storage_client),
+            kern_queue,
+            kern_reference,
+            api_key=api_key,  # type: ignore
             request_args=[historical_arg_et, historical_arg_eto, historical_arg_etof],
-            frequency="daily",
-            packets=True,
+            end_date=final_fetch_time_api_format,
             logger=logger,
+            packets=True,
         )
         storage_client.fetch_save(ke_historical_fetch, "kern_polygon_historical.csv")
 
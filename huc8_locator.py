@@ -1,11 +1,11 @@
 import argparse
-import gzip
 import logging
 import pathlib
 import sys
 import time
 
-from typing import Any, Optional, List, Union, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, List, Union, Tuple
 
 if sys.version_info < (3, 8):
     print("Python 3.8+ is supported. Please update to use this script.")
@@ -42,13 +42,34 @@ except ImportError:
     print("Please run `pip install pandas` and try again.")
     sys.exit(1)
 
+try:
+    from src.ETCatalog import FieldCatalog
+    from src.ETDecode import loads
+    from src.ETException import ETException
+    from src.ETLimiter import RateLimiter, get_limiter, set_limiter
+    from src.ETRequest import POOL_MAXSIZE, create_session, get_session, set_session
+    from src.HUC8_cache import BoundaryCache
+    from src.HUC8_core import FIELD_CHUNK_SIZE, request_chunks
+except ImportError:
+    print("Please run this script from the repository root after `pip install -r requirements.txt`.")
+    sys.exit(1)
+
 parser = argparse.ArgumentParser(add_help=True)
-parser.add_argument("-huc8", "--huc8", nargs=1, type=str, required=True, help="HUC8 Code")
+codes = parser.add_mutually_exclusive_group(required=True)
+codes.add_argument("-huc8", "--huc8", nargs='+', type=str, help="One or more HUC8 Codes")
+codes.add_argument("-f", "--file", type=str, help="File listing HUC8 Codes, one per line")
 parser.add_argument("-y", "--year", nargs=OPTIONAL, default="2022", help="Year of Reference. Default, 2022")
-parser.add_argument("-d", "--dest", nargs=OPTIONAL, default=None, help="Directory or file prefix for output. Defaults to huc8 code")
+parser.add_argument("-d", "--dest", nargs=OPTIONAL, default=None, help="Directory or file prefix for output. Defaults to huc8 code, or huc8_batch for multiple codes")
 parser.add_argument("-t", "--top", nargs=OPTIONAL, default=0, type=int, help="Number of top crops to fetch for each watershed. To include all, enter 0. Default, 0")
 parser.add_argument("-p", "--peak", nargs=2, default=(4,8), type=int, help="Start and end months of peak season. Default, (4,8)")
 parser.add_argument("-k", "--key", required=True, help="OpenET API Key")
+parser.add_argument("-r", "--rate", nargs=OPTIONAL, default=None, type=int, help="Maximum requests per minute. Default, unlimited")
+parser.add_argument("-c", "--chunk", nargs=OPTIONAL, default=FIELD_CHUNK_SIZE, type=int, help=f"Number of fields per request. Default, {FIELD_CHUNK_SIZE}")
+parser.add_argument("-w", "--workers", nargs=OPTIONAL, default=4, type=int, help="Number of requests sent at once. Default, 4")
+parser.add_argument("--cache", nargs=OPTIONAL, default="data/huc8_boundaries.gpkg", help="GeoPackage caching watershed boundaries. Default, data/huc8_boundaries.gpkg")
+parser.add_argument("--no-cache", action="store_true", help="Always fetch watershed boundaries from Earth Engine")
+parser.add_argument("--catalog", nargs=OPTIONAL, default=None, help="SQLite field catalog storing field IDs and properties between runs. Default, none")
+parser.add_argument("-b", "--basins", nargs=OPTIONAL, default=4, type=int, help="Number of watersheds processed at once. Default, 4")
 
 group = parser.add_mutually_exclusive_group()
 group.add_argument("-e", "--exclude", nargs='*', default=[], help="List of USDA CDL codes to exclude for EToF maxes")
@@ -70,145 +91,328 @@ endpoints = {
     "timeseries": "https://openet-api.org/geodatabase/timeseries",
 }
 
-ee.Authenticate()
-
-if not _valid_credentials_exist():
-    print("No valid Earth Engine credentials found. Please run `earthengine authenticate` and try again.")
-    sys.exit(1)
-
-ee.Initialize()
+dataset: Optional[FeatureCollection] = None
 
-dataset = FeatureCollection("USGS/WBD/2017/HUC08")
+def get_dataset() -> FeatureCollection:
+    # Earth Engine is initialized on first use so cached watersheds can be processed offline.
+    global dataset
+    if dataset is None:
+        ee.Authenticate()
+        
+        if not _valid_credentials_exist():
+            print("No valid Earth Engine credentials found. Please run `earthengine authenticate` and try again.")
+            sys.exit(1)
+        
+        ee.Initialize()
+        
+        dataset = FeatureCollection("USGS/WBD/2017/HUC08")
+    
+    return dataset
 
 def request_handler(**kwargs) -> Optional[requests.Response]:
     try:
-        req = requests.post(timeout=260, **kwargs)
+        limiter = get_limiter()
+        if limiter:
+            limiter.acquire()
+        
+        # Shared session keeps connections to the API alive between calls.
+        req = get_session().post(timeout=260, **kwargs)
         
         if req.status_code != 200:
-            print(f"Error {req.status_code}: {req.text}")
-            sys.exit(1)
-            return
+            # Raised rather than exiting so one failing watershed does not abort the others.
+            raise ETException(f"Error {req.status_code}: {req.text}")
         
         return req
     except KeyboardInterrupt:
         sys.exit(1)
 
-def get_huc8_metadata(huc8_id: str, api_key: str) -> Tuple[pd.DataFrame, Any]:
-    # Filter huc8 IDs to return element matching ID provided.
-    elements: Collection = dataset.filter(Filter.eq("huc8", huc8_id))
+def get_huc8_boundaries(huc8_ids: List[str], cache: Optional[BoundaryCache] = None) -> Dict[str, Any]:
+    boundaries: Dict[str, Any] = {}
     
-    # Localize.
-    info = elements.getInfo()
+    # Cached watersheds are used without contacting Earth Engine.
+    if cache is not None:
+        for huc8_id in huc8_ids:
+            info = cache.get(huc8_id)
+            if info is not None:
+                boundaries[huc8_id] = info
     
-    if info is None:
-        print("Unexpected error from Earth Engine. Please try again.")
-        sys.exit(1)
+    uncached = [huc8_id for huc8_id in huc8_ids if huc8_id not in boundaries]
     
-    # If features list is empty, filter did not find the huc8 ID.
-    if len(info["features"]) == 0:
+    if len(uncached) > 0:
+        # Filter huc8 IDs to return every element matching the IDs provided in one call.
+        elements: Collection = get_dataset().filter(Filter.inList("huc8", uncached))
+        
+        # Localize.
+        info = elements.getInfo()
+        
+        if info is None:
+            print("Unexpected error from Earth Engine. Please try again.")
+            sys.exit(1)
+        
+        if cache is not None:
+            cache.put(info)
+        
+        # Group features by watershed. Each value has the shape of a single watershed's getInfo().
+        for feature in info["features"]:
+            huc8_id = feature["properties"]["huc8"]
+            boundaries.setdefault(huc8_id, {"type": info["type"], "features": []})["features"].append(feature)
+    
+    missing = [huc8_id for huc8_id in huc8_ids if huc8_id not in boundaries]
+    
+    # If no features were found, filter did not find any of the huc8 IDs.
+    if len(boundaries) == 0:
         print("HUC8 ID not found. Please check ID provided.")
         sys.exit(1)
-        return
+    
+    if len(missing) > 0:
+        print(f"HUC8 IDs not found, skipping: {', '.join(missing)}")
+    
+    return boundaries
+
+def get_huc8_metadata(huc8_id: str, api_key: str, chunk_size: int = FIELD_CHUNK_SIZE, max_workers: int = 4, info: Optional[Any] = None, catalog: Optional[FieldCatalog] = None) -> Tuple[pd.DataFrame, Any]:
+    # Boundary from a batch lookup, otherwise fetched for this watershed alone.
+    if info is None:
+        info = get_huc8_boundaries([huc8_id])[huc8_id]
     
     # Extract coordinates from dataset element.
     boundaries_raw = [x["geometry"]["coordinates"] for x in info["features"]]
     # Flatten coordinate list as float values.
     boundaries = np.array(boundaries_raw).flatten().astype(float).tolist()
     
-    print("Found HUC8 ID. Fetching fields within watershed boundary...")
-    # Request Handler for getting Field IDs from geometry.
-    id_res = request_handler(
-        url=endpoints["fieldId"],
-        json={"geometry": boundaries},
-        headers={"Authorization": api_key},
-    )
-    
-    if id_res is None:
-        print("Unexpected error during field fetching. Please try again.")
-        print("Use the request query for reference: \n\turl: ", endpoints["fieldId"], "\n\tgeometry: ", boundaries)
-        sys.exit(1)
+    # Field IDs of a watershed queried before are read from the catalog.
+    field_Ids = catalog.field_ids(boundaries) if catalog else None
+    
+    if field_Ids is None:
+        print(f"Found HUC8 ID {huc8_id}. Fetching fields within watershed boundary...")
+        # Request Handler for getting Field IDs from geometry.
+        id_res = request_handler(
+            url=endpoints["fieldId"],
+            json={"geometry": boundaries},
+            headers={"Authorization": api_key},
+        )
+        
+        if id_res is None:
+            raise ETException(f"Unexpected error during field fetching for {huc8_id}. Please try again.")
+        
+        # Unzip data. List of Field IDs.
+        field_Ids = loads(id_res.content)
+        
+        if catalog:
+            catalog.put_field_ids(boundaries, field_Ids)
     
-    # Check if request was successful.
-    if id_res.status_code != 200:
-        print(f"Error {id_res.status_code}: {id_res.text}")
-        sys.exit(1)
-        return
+    # Only properties missing from the catalog are fetched.
+    missing = catalog.missing_properties(field_Ids) if catalog else field_Ids
     
-    # Unzip data. List of Field IDs.
-    field_Ids = eval(gzip.decompress(id_res.content).decode())
+    print(f"Found {len(field_Ids)} fields in {huc8_id}. Fetching metadata for {len(missing)} fields...")
+    try:
+        # Field metadata, fetched in chunks. Columns ["field_id", "hectares", "crop_2016", ..., "crop_2022", ...]
+        df = request_chunks(
+            endpoints["fieldProps"],
+            {"field_ids": missing},
+            api_key,
+            chunk_size=chunk_size,
+            max_workers=max_workers,
+            logger=logger,
+        )
+    except ETException as e:
+        raise ETException(f"Unexpected error during metadata retrieval for {huc8_id}. {e}") from e
+    
+    if catalog:
+        if len(df) > 0:
+            catalog.put_properties(df)
+        df = catalog.properties(field_Ids)
+    
+    return df, info
+
+def get_timeseries_data(field_ids: List[str], api_key: str, year: Union[str, int], chunk_size: int = FIELD_CHUNK_SIZE, max_workers: int = 4) -> Optional[pd.DataFrame]:
+    print(f"Fetching {year} EToF timeseries data for {len(field_ids)} fields...")
+    try:
+        # Timeseries data, fetched in chunks so large watersheds do not time out.
+        df = request_chunks(
+            endpoints["timeseries"],
+            {
+                "date_range": [f"{year}-01-01", f"{year}-12-31"],
+                "interval": "monthly",
+                "field_ids": field_ids,
+                "models": [
+                    "Ensemble",
+                    "geeSEBAL",
+                    "SSEBop",
+                    "SIMS",
+                    "DisALEXI",
+                    "PTJPL",
+                    "eeMetric",
+                ],
+                "variables": ["ETof"],
+                "file_format": "JSON",
+            },
+            api_key,
+            chunk_size=chunk_size,
+            max_workers=max_workers,
+            logger=logger,
+        )
+    except ETException as e:
+        print(f"Unexpected error during timeseries retrieval. {e}")
+        return
+
+    return df
+
+def process_watershed(
+    huc8Id: str,
+    ee_info: Any,
+    api_key: str,
+    year: Union[str, int],
+    n_crops: int,
+    s_peak: int,
+    e_peak: int,
+    crop_excludes: List[str],
+    crop_includes: List[str],
+    chunk_size: int,
+    max_workers: int,
+    catalog: Optional[FieldCatalog] = None,
+) -> Optional[Tuple[pd.DataFrame, pd.DataFrame, pd.Series]]:
+    crop_col = f"crop_{year}"
     
-    print(f"Found {len(field_Ids)} fields. Fetching metadata for all fields...")
-    # Request Handler for getting field metadata.
-    metadata_res = request_handler(
-        url=endpoints["fieldProps"],
-        json={"field_ids": field_Ids},
-        headers={"Authorization": api_key},
-    )
+    # Gets metadata from field IDs found in HUC8 boundary.
+    metadata, _ = get_huc8_metadata(huc8Id, api_key=api_key, chunk_size=chunk_size, max_workers=max_workers, info=ee_info, catalog=catalog)
     
-    if metadata_res is None:
-        print("Unexpected error during metadata retrieval. Please try again.")
-        print("Use the request query for reference: \n\turl: ", endpoints["fieldProps"], "\n\tfield_ids: ", field_Ids)
-        sys.exit(1)
+    # Check if metadata contains year provided.
+    if crop_col not in metadata.columns:
+        print(f"{year} is not present in field metadata for {huc8Id}.")
+        return None
     
-    # Check if request was successful.
-    if metadata_res.status_code != 200:
-        print(f"Error {metadata_res.status_code}: {metadata_res.text}")
-        sys.exit(1)
-        return
+    exported = metadata
     
-    # Unzips data. List of Dicts["field_id", "hectares", "crop_2016", ..., "crop_2022", ...]
-    metadata = eval(gzip.decompress(metadata_res.content).decode())
+    if len(crop_excludes) > 0:
+        # Goes through list of crops to exclude. If empty, does nothing.
+        metadata = metadata[~metadata[crop_col].isin(crop_excludes)]
     
-    # Convert to pandas dataframe.
-    df = pd.DataFrame.from_records(metadata)
+    if len(crop_includes) > 0:
+        # Modify metadata to only include crops in allowlist.
+        metadata = metadata[metadata[crop_col].isin(crop_includes)]
     
-    return df, info
+    if n_crops > 0:
+        print(f"Trimming fields for top {n_crops} crops in {huc8Id}...")
+        # Grabs the top crops for the given year.
+        top_crops = metadata[crop_col].value_counts(ascending=False)[:n_crops].index.to_list()
+        
+        metadata = metadata[metadata[crop_col].isin(top_crops)]
 
-def get_timeseries_data(field_ids: List[str], api_key: str, year: Union[str, int]) -> Optional[pd.DataFrame]:
-    print(f"Fetching {year} EToF timeseries data for {len(field_ids)} fields...")
-    # Request Handler for timeseries data.
-    res = request_handler(
-        url=endpoints["timeseries"],
-        json={
-            "date_range": [f"{year}-01-01", f"{year}-12-31"],
-            "interval": "monthly",
-            "field_ids": field_ids,
-            "models": [
-                "Ensemble",
-                "geeSEBAL",
-                "SSEBop",
-                "SIMS",
-                "DisALEXI",
-                "PTJPL",
-                "eeMetric",
-            ],
-            "variables": ["ETof"],
-            "file_format": "JSON",
-        },
-        headers={"Authorization": api_key},
-    )
-    
-    if res is None:
-        return
+    # Discard other crop years.
+    metadata = metadata[["field_id", crop_col, "hectares"]]
     
-    # Check if request was successful.
-    if res.status_code != 200:
-        print(f"Error {res.status_code}: {res.text}")
-        sys.exit(1)
-        return
+    start = time.perf_counter()
+    data = get_timeseries_data(metadata["field_id"].astype(str).tolist(), api_key=api_key, year=year, chunk_size=chunk_size, max_workers=max_workers)
+    stop = time.perf_counter()
     
-    data = eval(gzip.decompress(res.content).decode())
+    if data is None:
+        print(f"Failed to get timeseries data for {huc8Id}.")
+        return None
+    
+    # Filter data for peak season.
+    data["time"] = pd.to_datetime(data["time"])
+    data = data[(data["time"].dt.month >= s_peak) & (data["time"].dt.month <= e_peak)]
+    
+    # Join metadata columns.
+    data = data.set_index("field_id").join(metadata.set_index("field_id"), on="field_id", how="left", validate="many_to_one").reset_index()
+    
+    print(f"{huc8Id}: {metadata['field_id'].agg('count')} fields took {round((stop-start), 2)} seconds.")
+    
+    # Calculate max EToF for each field per model during the peak season.
+    crops_max = data.groupby(['field_id', crop_col, "collection"])["value_mm"].agg('max')
+    
+    return exported, data, crops_max
 
-    df = pd.DataFrame(data)
+def plot_boxplot(crops_max: pd.Series, ee_info: Any, huc8Id: str, crop_col: str, filename: str, s_peak: int, e_peak: int, year: Union[str, int]) -> None:
+    import seaborn as sns
+    import matplotlib.pyplot as plt
+    
+    print(f"Generating boxplot for {huc8Id}...")
+    # Import CDL lookup table.
+    cdl_lookup = pd.read_csv(
+        "https://media.githubusercontent.com/media/watrs-csumb/openet-forecast-analysis/refs/heads/main/data/cdl_codes.csv",
+        index_col="Codes"
+    )["Class_Names"]
+    kcp_lookup = pd.read_csv(
+        "https://raw.githubusercontent.com/watrs-csumb/openet-forecast-analysis/refs/heads/main/data/1993%20NEH%20Kcp.csv",
+        index_col="cdl_code", na_values={'kcp': KCP_NULL} # type: ignore
+    )[['kcp']]
+    
+    ee_props = ee_info["features"][0]["properties"]
+    # Watershed Name.
+    watershed = f'{ee_props["name"]}, {ee_props["states"]} ({huc8Id})'
+    
+    # Join CDL lookup table.
+    data_plotter = crops_max.reset_index().join(cdl_lookup, on=crop_col)
+    
+    # Join KCP lookup table.
+    data_plotter = data_plotter.join(kcp_lookup, on=crop_col)
+    
+    # Filter out crops with null kcp values.
+    data_plotter = data_plotter[~data_plotter["kcp"].isnull()]
+    
+    # Calculate n_wrap so that facet grid remains square-like.
+    n_wrap = int(np.ceil(np.sqrt(data_plotter["Class_Names"].nunique())))
+    
+    with sns.axes_style("darkgrid"): # type: ignore
+        # Generate FacetGrid showing the interquartile range of max EToF by crop. 
+        # Each facet contains a boxplot showcasing each model.
+        boxplot = sns.catplot(  # type: ignore
+            data=data_plotter.reset_index(),
+            kind="box",
+            x="collection",
+            y="value_mm",
+            col="Class_Names",
+            col_wrap=n_wrap,
+            estimator="median",
+            errorbar=("pi", 50),
+            sharex=False,
+            showfliers=False,
+            width=0.25,
+            formatter=lambda x: x.split("_")[0].capitalize(),
+        )
 
-    return df
+        boxplot.set_titles(col_template="{col_name}")
+        boxplot.despine(left=True)
+        boxplot.tick_params(axis="x", rotation=90)
+        boxplot.set_ylabels("EToF$_{max}$ | Kc$_{MAX}$")
+        boxplot.set_xlabels("Model")
+        
+        # Goes through each facet.
+        for (row, col, hue), data_rch in boxplot.facet_data():
+            try:
+                # Get kcp value for current facet's crop.
+                kcp_val = data_rch["kcp"].unique()[0]
+
+                # Draw a horizontal line showing the documented kcMAX for the crop.
+                ax = boxplot.facet_axis(row, col)
+                ax.axhline(y=kcp_val, linestyle="dotted")
+            except Exception:
+                print(f"Failed to plot KCP line. Crop code {data_rch[crop_col].unique()[0]} likely undocumented.")
+        
+        # Refits grid to clean up appearance.
+        plt.tight_layout() # type: ignore
+        
+        plt.suptitle(f"{watershed} (n={data_plotter.reset_index()['field_id'].nunique()})", y=1.02) # type: ignore
+        
+        fig_name = f"Boxplot Grid for Interquartile Ranges of EToF_max by Crop and Model for {watershed} ({s_peak}-{e_peak}, {year}).png"
+        
+        boxplot.savefig(f"{filename} {fig_name}")
+        print(f"Exported boxplot to {fig_name}")
+
+def read_huc8_file(path: str) -> List[str]:
+    # One code per line. Blank lines and lines starting with # are ignored.
+    with open(path, "r") as file:
+        return [line.strip() for line in file if line.strip() and not line.strip().startswith("#")]
 
 def main():
     args = parser.parse_args()
     
-    huc8Id = args.huc8[0]
+    # Unique codes in the order provided.
+    huc8Ids = list(dict.fromkeys(args.huc8 or read_huc8_file(args.file)))
+    batch = len(huc8Ids) > 1
     year = args.year
-    filename = args.dest or huc8Id
+    filename = args.dest or ("huc8_batch" if batch else huc8Ids[0])
     api_key = args.key
     n_crops = args.top
     s_peak, e_peak = args.peak
@@ -219,6 +423,17 @@ def main():
     # Graphical flags.
     boxplot = args.box
     
+    if args.rate:
+        set_limiter(RateLimiter.per_minute(args.rate))
+    
+    if args.chunk < 1 or args.workers < 1 or args.basins < 1:
+        print("Chunk size, number of workers and number of basins must be at least 1.")
+        sys.exit(1)
+    
+    if len(huc8Ids) == 0:
+        print("No HUC8 codes provided.")
+        sys.exit(1)
+    
     if boxplot:
         try:
             import seaborn as sns
@@ -243,137 +458,85 @@ def main():
     
     # If filename is a directory, append HUC8 ID to it.
     if pathlib.Path(filename).is_dir():
-        filename = f"{filename}/{huc8Id}"
+        filename = f"{filename}/{'huc8_batch' if batch else huc8Ids[0]}"
     
     crop_col = f"crop_{year}"
     
-    # Gets metadata from field IDs found in HUC8 boundary.
-    metadata, ee_info = get_huc8_metadata(huc8Id, api_key=api_key)
+    boundary_cache = None if args.no_cache else BoundaryCache(args.cache)
+    catalog = FieldCatalog(args.catalog) if args.catalog else None
+    
+    # Boundaries for every watershed from the cache, and the rest in a single Earth Engine call.
+    ee_infos = get_huc8_boundaries(huc8Ids, cache=boundary_cache)
+    
+    n_basins = min(args.basins, len(ee_infos))
+    # Every watershed shares one connection pool sized for all of their requests in flight.
+    set_session(create_session(pool_maxsize=max(POOL_MAXSIZE, n_basins * args.workers)))
+    
+    with ThreadPoolExecutor(max_workers=n_basins) as executor:
+        futures = {
+            huc8Id: executor.submit(
+                process_watershed,
+                huc8Id,
+                ee_info,
+                api_key,
+                year,
+                n_crops,
+                s_peak,
+                e_peak,
+                crop_excludes,
+                crop_includes,
+                args.chunk,
+                args.workers,
+                catalog,
+            )
+            for huc8Id, ee_info in ee_infos.items()
+        }
+        results = {}
+        failed = []
+        for huc8Id, future in futures.items():
+            try:
+                results[huc8Id] = future.result()
+            except Exception as e:
+                # A failing watershed is skipped so the rest of the batch is still exported.
+                logger.error(f"Skipping {huc8Id}. {e}")
+                failed.append(huc8Id)
+    
+    results = {huc8Id: result for huc8Id, result in results.items() if result is not None}
+    
+    if len(results) == 0:
+        if len(failed) > 0:
+            sys.exit(1)
+        return None
     
-    # Check if metadata contains year provided.
-    if crop_col not in metadata.columns:
-        print(f"{year} is not present in field metadata.")
-        return
+    def combine(frames: List[pd.DataFrame]) -> pd.DataFrame:
+        # Batch outputs are combined into one file per output, partitioned by a leading huc8 column.
+        if not batch:
+            return frames[0]
+        return pd.concat(frames, keys=list(results.keys()), names=["huc8", None]).reset_index(level="huc8").reset_index(drop=True)
+    
+    metadata = combine([metadata for metadata, _, _ in results.values()])
+    data = combine([data for _, data, _ in results.values()])
+    crops_max = combine([crops_max.reset_index() for _, _, crops_max in results.values()])
     
     metadata_loc = f"{filename}_metadata_{year}.csv"
     metadata.to_csv(metadata_loc)
     print(f"Exported metadata to {metadata_loc}")
     
-    if len(crop_excludes) > 0:
-        # Goes through list of crops to exclude. If empty, does nothing.
-        metadata = metadata[~metadata[crop_col].isin(crop_excludes)]
-    
-    if len(crop_includes) > 0:
-        # Modify metadata to only include crops in allowlist.
-        metadata = metadata[metadata[crop_col].isin(crop_includes)]
-    
-    if n_crops > 0:
-        print(f"Trimming fields for top {n_crops} crops...")
-        # Grabs the top crops for the given year.
-        top_crops = metadata[crop_col].value_counts(ascending=False)[:n_crops].index.to_list()
-        
-        metadata = metadata[metadata[crop_col].isin(top_crops)]
-
-    # Discard other crop years.
-    metadata = metadata[["field_id", crop_col, "hectares"]]
-    
-    start = time.perf_counter()
-    data = get_timeseries_data(metadata["field_id"].astype(str).tolist(), api_key=api_key, year=year)
-    stop = time.perf_counter()
-    
-    if data is None:
-        print("Failed to get timeseries data.")
-        return None
-    
-    # Filter data for peak season.
-    data["time"] = pd.to_datetime(data["time"])
-    data = data[(data["time"].dt.month >= s_peak) & (data["time"].dt.month <= e_peak)]
-    
-    # Join metadata columns.
-    data = data.set_index("field_id").join(metadata.set_index("field_id"), on="field_id", how="left", validate="many_to_one").reset_index()
-    
     data.to_csv(f"{filename}_values_{year}.csv", index=False)
-    
-    print(f"{metadata['field_id'].agg('count')} fields took {round((stop-start), 2)} seconds.")
-    
-    # Calculate max EToF for each field per model during the peak season.
-    crops_max = data.groupby(['field_id', crop_col, "collection"])["value_mm"].agg('max')
-    crops_max.round(2).reset_index().to_csv(f"{filename}_etof_maxes_{year}.csv", index=False)
+    crops_max.round(2).to_csv(f"{filename}_etof_maxes_{year}.csv", index=False)
     
     if boxplot:
-        print("Generating boxplot...")
-        # Import CDL lookup table.
-        cdl_lookup = pd.read_csv(
-            "https://media.githubusercontent.com/media/watrs-csumb/openet-forecast-analysis/refs/heads/main/data/cdl_codes.csv",
-            index_col="Codes"
-        )["Class_Names"]
-        kcp_lookup = pd.read_csv(
-            "https://raw.githubusercontent.com/watrs-csumb/openet-forecast-analysis/refs/heads/main/data/1993%20NEH%20Kcp.csv",
-            index_col="cdl_code", na_values={'kcp': KCP_NULL} # type: ignore
-        )[['kcp']]
-        
-        ee_props = ee_info["features"][0]["properties"]
-        # Watershed Name.
-        watershed = f'{ee_props["name"]}, {ee_props["states"]} ({huc8Id})'
-        
-        # Join CDL lookup table.
-        data_plotter = crops_max.reset_index().join(cdl_lookup, on=crop_col)
-        
-        # Join KCP lookup table.
-        data_plotter = data_plotter.join(kcp_lookup, on=crop_col)
-        
-        # Filter out crops with null kcp values.
-        data_plotter = data_plotter[~data_plotter["kcp"].isnull()]
-        
-        # Calculate n_wrap so that facet grid remains square-like.
-        n_wrap = int(np.ceil(np.sqrt(data_plotter["Class_Names"].nunique())))
-        
-        with sns.axes_style("darkgrid"): # type: ignore
-            # Generate FacetGrid showing the interquartile range of max EToF by crop. 
-            # Each facet contains a boxplot showcasing each model.
-            boxplot = sns.catplot(  # type: ignore
-                data=data_plotter.reset_index(),
-                kind="box",
-                x="collection",
-                y="value_mm",
-                col="Class_Names",
-                col_wrap=n_wrap,
-                estimator="median",
-                errorbar=("pi", 50),
-                sharex=False,
-                showfliers=False,
-                width=0.25,
-                formatter=lambda x: x.split("_")[0].capitalize(),
+        for huc8Id, (_, _, crops_max) in results.items():
+            plot_boxplot(
+                crops_max,
+                ee_infos[huc8Id],
+                huc8Id,
+                crop_col,
+                f"{filename}_{huc8Id}" if batch else filename,
+                s_peak,
+                e_peak,
+                year,
             )
-
-            boxplot.set_titles(col_template="{col_name}")
-            boxplot.despine(left=True)
-            boxplot.tick_params(axis="x", rotation=90)
-            boxplot.set_ylabels("EToF$_{max}$ | Kc$_{MAX}$")
-            boxplot.set_xlabels("Model")
-            
-            # Goes through each facet.
-            for (row, col, hue), data_rch in boxplot.facet_data():
-                try:
-                    # Get kcp value for current facet's crop.
-                    kcp_val = data_rch["kcp"].unique()[0]
-
-                    # Draw a horizontal line showing the documented kcMAX for the crop.
-                    ax = boxplot.facet_axis(row, col)
-                    ax.axhline(y=kcp_val, linestyle="dotted")
-                except Exception:
-                    print(f"Failed to plot KCP line. Crop code {data_rch[crop_col].unique()[0]} likely undocumented.")
-            
-            # Refits grid to clean up appearance.
-            plt.tight_layout() # type: ignore
-            
-            plt.suptitle(f"{watershed} (n={data_plotter.reset_index()['field_id'].nunique()})", y=1.02) # type: ignore
-            
-            fig_name = f"Boxplot Grid for Interquartile Ranges of EToF_max by Crop and Model for {watershed} ({s_peak}-{e_peak}, {year}).png"
-            
-            boxplot.savefig(f"{filename} {fig_name}")
-            print(f"Exported boxplot to {fig_name}")
-        
     
     return
 
@@ -9,7 +9,11 @@ from collections import deque
 from copy import deepcopy
 from datetime import datetime, timedelta
 from dotenv import dotenv_values
-from src import CloudStorage, ETFetch, ETArg, Authenticate
+from src import (
+    Averages, Climatology, CloudStorage, ETFetch, ETArg, Authenticate, ForecastArchive, RateLimiter, ResponseCache, Sweep,
+    read_history, set_cache, set_limiter, update_history
+)
+from src.ETGeometry import load_reference, simplification_from_config
 from pathlib import Path
 
 import logging
@@ -34,7 +38,12 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 # END LOGGING CONFIG
 
-api_key = dotenv_values(".env").get("ET_KEY")
+config = dotenv_values(".env")
+api_key = config.get("ET_KEY")
+# Throttles every request when ET_RATE_PER_MINUTE is set in .env.
+set_limiter(RateLimiter.from_config(config))
+# Serves repeated requests from disk when ET_CACHE_DIR is set in .env.
+set_cache(ResponseCache.from_config(config))
 timeseries_endpoint = "https://developer.openet-api.org/raster/timeseries/point"
 polygon_timeseries_endpoint = (
     "https://developer.openet-api.org/raster/timeseries/polygon"
@@ -48,12 +57,10 @@ monterey_fields = pd.read_csv("./data/Monterey.csv", low_memory=False).set_index
     "OPENET_ID"
 )
 
-kern_polygon_fields = pd.read_csv(
-    "./data/kern_polygons.csv", low_memory=False
-).set_index("OPENET_ID")
-monterey_polygon_fields = pd.read_csv(
-    "./data/monterey_polygons.csv", low_memory=False
-).set_index("OPENET_ID")
+# Polygons are simplified once and cached to keep request payloads small when ET_SIMPLIFY_GEOMETRY is set in .env.
+simplification = simplification_from_config(config)
+kern_polygon_fields = load_reference("./data/kern_polygons.csv", "OPENET_ID", **simplification)
+monterey_polygon_fields = load_reference("./data/monterey_polygons.csv", "OPENET_ID", **simplification)
 
 
 def get_historical_data(
@@ -65,13 +72,8 @@ def get_historical_data(
     endpoint=timeseries_endpoint,
     polygon=False,
     use_cloud: bool | CloudStorage = False,
+    incremental=False,
 ):
-    et_data = ETFetch(
-        deepcopy(fields_queue),
-        reference,
-        api_key=api_key,  # type: ignore
-    )
-
     timeseries_et = ETArg(
         "actual_et",
         args={
@@ -104,56 +106,86 @@ def get_historical_data(
         timeseries_eto.reducer = "mean"
         timeseries_etof.reducer = "mean"
 
-    et_data.start(
-        request_args=[timeseries_et, timeseries_eto, timeseries_etof],
-        frequency="daily",
-        logger=logger,
-        packets=True,
-    )
+    names = ["actual_et", "actual_eto", "actual_etof"]
+
+    if incremental:
+        # Only the dates after each field's last available date are requested and appended to the existing data.
+        history = read_history(f"data/{filename}", use_cloud if isinstance(use_cloud, CloudStorage) else None)
+        et_data = update_history(
+            history,
+            fields_queue,
+            reference,
+            api_key=api_key,  # type: ignore
+            request_args=[timeseries_et, timeseries_eto, timeseries_etof],
+            end_date=end_date,
+            logger=logger,
+            packets=True,
+        )
+        # Existing data is already in memory, so aggregates are compiled from the updated table.
+        climatology = Climatology.from_history(et_data.data_table, names)
+        averages = Averages.from_history(et_data.data_table, names, 2024)
+    else:
+        # Climatology and year-to-date averages are accumulated as each field arrives.
+        climatology = Climatology(names, capacity=len(fields_queue))
+        averages = Averages(names, 2024)
+
+        def accumulate(field_id, crop, contents):
+            climatology.add(field_id, crop, contents)
+            averages.add(field_id, crop, contents)
+
+        et_data = ETFetch(
+            deepcopy(fields_queue),
+            reference,
+            api_key=api_key,  # type: ignore
+        )
+        et_data.start(
+            request_args=[timeseries_et, timeseries_eto, timeseries_etof],
+            frequency="daily",
+            on_field=accumulate,
+            logger=logger,
+            packets=True,
+        )
+
+        # Fields restored from the packets of an interrupted run never reached accumulate.
+        if len(climatology) < len(et_data.data_table.drop_duplicates(["field_id", "crop"])):
+            climatology = Climatology.from_history(et_data.data_table, names)
+            averages = Averages.from_history(et_data.data_table, names, 2024)
 
     if isinstance(use_cloud, CloudStorage):
         use_cloud.fetch_save(et_data, filename, parents=True)
     else:
         et_data.export(f"data/{filename}")
+    # The table is only needed for the export. Aggregates are already compiled, so it is released before their tables are built.
+    del et_data
     
     # Climatology compilation
-    et_data.data_table["time"] = pd.to_datetime(et_data.data_table["time"])
-    # Create a column for day of year
-    et_data.data_table["doy"] = et_data.data_table["time"].dt.dayofyear
-    # Group by field, crop, and doy then calculate the average conditions
-    climatology_table = et_data.data_table.groupby(["field_id", "crop", "doy"])[
-        ["actual_et", "actual_eto", "actual_etof"]
-    ].agg("mean")
+    climatology_table = climatology.to_frame()
     
     if isinstance(use_cloud, CloudStorage):
         fname = f"{filename}_climatology.csv"
-        climatology_table.reset_index().to_csv(f"data/{fname}", index=False)
+        climatology_table.to_csv(f"data/{fname}", index=False)
         use_cloud.pd_write(
             fname,
-            climatology_table.reset_index(),
+            climatology_table,
             index=False,
         )
     
-    climatology_table.reset_index().to_csv(f"{filename}_climatology.csv", index=False)
+    climatology_table.to_csv(f"{filename}_climatology.csv", index=False)
     # End Climatology
 
     # Year-to-date Averages Compilation
-    avgs_table = (
-        et_data.data_table.loc[(et_data.data_table["time"].dt.year == 2024), :]
-        .groupby(["field_id", "crop"])[["actual_et", "actual_eto", "actual_etof"]]
-        .agg("mean")
-    )
+    avgs_table = averages.to_frame()
     if isinstance(use_cloud, CloudStorage):
         fname = f"{filename}_2024_avgs.csv"
-        avgs_table.reset_index().to_csv(f'data/{fname}', index=False)
+        avgs_table.to_csv(f'data/{fname}', index=False)
 
         use_cloud.pd_write(
             fname,
-            climatology_table.reset_index(),
+            avgs_table,
             index=False,
         )
     
-    avgs_table.reset_index().to_csv(f"{filename}_2024_avgs.csv", index=False)
+    avgs_table.to_csv(f"{filename}_2024_avgs.csv", index=False)
     # End Year-to-date Averages Compilation
 
 def get_forecasts(
@@ -167,7 +199,10 @@ def get_forecasts(
     align=False,
     use_cloud: bool | CloudStorage = False,
     make_parents=False,
-    skip_exists=True
+    skip_exists=True,
+    max_workers=4,
+    archive: ForecastArchive | None = None,
+    county: str | None = None,
 ):
     # Gather predictions at weekly intervals.
     # Forecast begins predictions from the end_range. So to start predictions for Jan 1, set to Dec 31
@@ -180,21 +215,14 @@ def get_forecasts(
     if file_dir.exists() is False and make_parents:
         file_dir.mkdir(parents=True)
 
-    logger.info("Getting forecast data.")
+    # Every forecast date is one cell of a single sweep sharing the worker pool.
+    sweep = Sweep(fields_queue, reference, api_key=api_key)  # type: ignore
+    # Forecast date of each file, used as its archive partition.
+    forecast_dates = {}
+
     while forecasting_date < end_date_s:
-        process = ETFetch(
-            deepcopy(fields_queue),
-            reference,
-            api_key=api_key,  # type: ignore
-        )
         api_date_format = forecasting_date.strftime("%Y-%m-%d")
         filename = f"{file_dir}/{api_date_format}_forecast.csv"
-        
-        # If skip_exists is True, skips operation if the output path already exists.
-        if skip_exists and Path(filename).exists():
-            print(f"{filename} already exists. Moving on..")
-            forecasting_date = forecasting_date + interval_delta
-            continue
 
         forecast_et = ETArg(
             "expected_et",
@@ -231,15 +259,14 @@ def get_forecasts(
             forecast_eto.reducer = "mean"
             forecast_etof.reducer = "mean"
 
-        logger.info(f"Forecasting from {api_date_format}")
-        process.start(
-            request_args=[forecast_et, forecast_eto, forecast_etof],
-            frequency="daily",
-            packets=True,
-            logger=logger,
-        )
-        
-        process.export(filename)
+        sweep.add([forecast_et, forecast_eto, forecast_etof], filename)
+        forecast_dates[filename] = api_date_format
+        forecasting_date = forecasting_date + interval_delta
+
+    def upload(filename, process):
+        # If an archive is provided, the forecast is also written to its partition for the notebooks.
+        if archive is not None:
+            archive.write(process.data_table, county=county, forecast_date=forecast_dates[filename], logger=logger)
 
         # If the use_cloud flag is a CloudStorage object, export to the bucket contained in the object.
         if isinstance(use_cloud, CloudStorage):
@@ -248,7 +275,15 @@ def get_forecasts(
             except Exception:
                 pass
 
-        forecasting_date = forecasting_date + interval_delta
+    logger.info("Getting forecast data.")
+    # If skip_exists is True, skips forecast dates whose output path already exists.
+    sweep.start(
+        frequency="daily",
+        max_workers=max_workers,
+        skip_exists=skip_exists,
+        on_complete=upload,
+        logger=logger,
+    )
 
 def main():
     if not api_key:
@@ -260,6 +295,8 @@ def main():
     )
     
     version_prompt = input("What version of DTW is this?: ")
+    # Polygon forecasts of every county, partitioned for the notebooks.
+    archive = ForecastArchive(f"data/forecasts/archive/{version_prompt}/polygon")
 
     kern_queue = deque(kern_fields.index.to_list())
     monterey_queue = deque(monterey_fields.index.to_list())
@@ -302,6 +339,8 @@ def main():
         polygon=True,
         use_cloud=storage_client,
         end_date="2024-12-14",
+        archive=archive,
+        county="monterey",
     )
     get_historical_data(
         monterey_queue,
@@ -310,7 +349,8 @@ def main():
         endpoint=polygon_timeseries_endpoint,
         polygon=True,
         use_cloud=storage_client,
-        end_date='2024-12-14'
+        end_date='2024-12-14',
+        incremental=True,
     )
 
     logger.info("Getting polygon data for Kern County")
@@ -322,6 +362,8 @@ def main():
         polygon=True,
         use_cloud=storage_client,
         end_date="2024-12-14",
+        archive=archive,
+        county="kern",
     )
     get_historical_data(
         kern_queue,
@@ -331,6 +373,7 @@ def main():
         polygon=True,
         use_cloud=storage_client,
         end_date="2024-12-14",
+        incremental=True,
     )
 
 if __name__ == "__main__":
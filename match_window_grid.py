@@ -8,12 +8,14 @@ from collections import deque
 from copy import deepcopy
 from datetime import datetime, timedelta
 from dotenv import dotenv_values
-from src import ETArg, ETFetch
+from src import (
+    ETArg, ETFetch, ForecastArchive, RateLimiter, ResponseCache, Sweep, read_history, set_cache, set_limiter, update_history
+)
+from src.ETGeometry import load_reference, simplification_from_config
 from pathlib import Path
 
 import logging
 import os
-import pandas as pd
 import sys
 
 # LOGGING CONFIG
@@ -41,11 +43,21 @@ polygon_forecast_endpoint = (
 )
 polygon_timeseries_endpoint = "https://developer.openet-api.org/raster/timeseries/polygon"
 
-api_key = dotenv_values(".env").get("ET_KEY")
-kern_polygon_fields = pd.read_csv("./data/kern_polygons_large.csv", low_memory=False).set_index("field_id")
-monterey_polygon_fields = pd.read_csv("./data/monterey_polygons_large.csv", low_memory=False).set_index("field_id")
-
-def get_forecasts(fields_queue, reference, *, dir, endpoint=polygon_forecast_endpoint, align=True, skip_exist=False):
+config = dotenv_values(".env")
+api_key = config.get("ET_KEY")
+# Throttles every request when ET_RATE_PER_MINUTE is set in .env.
+set_limiter(RateLimiter.from_config(config))
+# Serves repeated requests from disk when ET_CACHE_DIR is set in .env.
+set_cache(ResponseCache.from_config(config))
+# Polygons are simplified once and cached to keep request payloads small when ET_SIMPLIFY_GEOMETRY is set in .env.
+simplification = simplification_from_config(config)
+kern_polygon_fields = load_reference("./data/kern_polygons_large.csv", "field_id", **simplification)
+monterey_polygon_fields = load_reference("./data/monterey_polygons_large.csv", "field_id", **simplification)
+
+def get_forecasts(
+    fields_queue, reference, *, dir, endpoint=polygon_forecast_endpoint, align=True, skip_exist=False, max_workers=4,
+    archive: ForecastArchive | None = None, county: str | None = None
+):
     forecasting_date = datetime(2024, 5, 6)  # Marker for loop
     end_date = datetime(2024, 9, 3) 
     interval_delta = timedelta(weeks=1)  # weekly interval
@@ -57,23 +69,16 @@ def get_forecasts(fields_queue, reference, *, dir, endpoint=polygon_forecast_end
     if file_dir.exists() is False:
         file_dir.mkdir(parents=True)
 
-    logger.info("Getting forecast data.")
+    # Every forecast date, match window and variable is one cell of a single sweep sharing the worker pool.
+    sweep = Sweep(fields_queue, reference, api_key=api_key)  # type: ignore
+    # Forecast date, match window and variable of each file, used as its archive partition.
+    partitions = {}
+
     while forecasting_date < end_date:
-        window_queue = deque(deepcopy(match_windows))
-        while (len(window_queue) == 0) is False:
-            var_queue = deque(deepcopy(match_variables))
-            while (len(var_queue) == 0) is False:
-                process = ETFetch(
-                    deepcopy(fields_queue),
-                    reference,
-                    api_key=api_key,  # type: ignore
-                )
-                api_date_format = forecasting_date.strftime("%Y-%m-%d")
-                filename = f"{file_dir}/{api_date_format}_{str(var_queue[0])}_window_{window_queue[0]}_forecast.csv"
-                if Path(filename).exists() and skip_exist:
-                    print(f'{filename} already exists. Moving on..')
-                    var_queue.popleft()
-                    continue
+        api_date_format = forecasting_date.strftime("%Y-%m-%d")
+        for window in match_windows:
+            for variable in match_variables:
+                filename = f"{file_dir}/{api_date_format}_{str(variable)}_window_{window}_forecast.csv"
 
                 forecast_et = ETArg(
                     "expected_et",
@@ -83,12 +88,12 @@ def get_forecasts(fields_queue, reference, *, dir, endpoint=polygon_forecast_end
                         "variable": "ET",
                         "reference_et": "cimis",
                         "reducer": "mean",
-                        "match_window": window_queue[0],
+                        "match_window": window,
                         "align": align
                     },
                 )
-                if var_queue[0]:
-                    forecast_et.match_variable = var_queue[0]
+                if variable:
+                    forecast_et.match_variable = variable
 
                 forecast_eto = ETArg(
                     "expected_eto",
@@ -98,12 +103,12 @@ def get_forecasts(fields_queue, reference, *, dir, endpoint=polygon_forecast_end
                         "variable": "ETo",
                         "reference_et": "cimis",
                         "reducer": "mean",
-                        "match_window": window_queue[0],
+                        "match_window": window,
                         "align": align,
                     },
                 )
-                if var_queue[0]:
-                    forecast_eto.match_variable = var_queue[0]
+                if variable:
+                    forecast_eto.match_variable = variable
 
                 forecast_etof = ETArg(
                     "expected_etof",
@@ -113,38 +118,36 @@ def get_forecasts(fields_queue, reference, *, dir, endpoint=polygon_forecast_end
                         "variable": "ETof",
                         "reference_et": "cimis",
                         "reducer": "mean",
-                        "match_window": window_queue[0],
+                        "match_window": window,
                         "align": align,
                     },
                 )
-                if var_queue[0]:
-                    forecast_etof.match_variable = var_queue[0]
-
-                logger.info(f"Forecasting from {api_date_format} with match_variable {var_queue[0]} and match window of {window_queue[0]}")
-                process.start(
-                    request_args=[forecast_et, forecast_eto, forecast_etof],
-                    frequency="daily",
-                    packets=True,
-                    logger=logger,
-                )
-                
-                process.export(filename)
-                var_queue.popleft()
+                if variable:
+                    forecast_etof.match_variable = variable
 
-            window_queue.popleft()
+                sweep.add([forecast_et, forecast_eto, forecast_etof], filename)
+                partitions[filename] = dict(forecast_date=api_date_format, match_window=window, match_variable=variable)
 
         forecasting_date = forecasting_date + interval_delta
 
-def get_historical(
-    fields_queue, reference, *, filename, endpoint=polygon_timeseries_endpoint
+    def store(filename, process):
+        # If an archive is provided, the forecast is also written to its partition for the notebooks.
+        if archive is not None:
+            archive.write(process.data_table, county=county, **partitions[filename], logger=logger)
 
-):
-    et_data = ETFetch(
-        deepcopy(fields_queue),
-        reference,
-        api_key=api_key,  # type: ignore
+    logger.info("Getting forecast data.")
+    sweep.start(
+        frequency="daily",
+        max_workers=max_workers,
+        skip_exists=skip_exist,
+        on_complete=store,
+        logger=logger,
     )
 
+def get_historical(
+    fields_queue, reference, *, filename, endpoint=polygon_timeseries_endpoint, incremental=False
+
+):
     timeseries_et = ETArg(
         "actual_et",
         args={
@@ -175,17 +178,37 @@ def get_historical(
         },
     )
     
-    et_data.start(
-        request_args=[timeseries_et, timeseries_eto, timeseries_etof],
-        frequency="daily",
-        logger=logger,
-        packets=True,
-    )
+    if incremental:
+        # Only the dates after each field's last available date are requested and appended to the existing data.
+        et_data = update_history(
+            read_history(f"data/{filename}.csv"),
+            fields_queue,
+            reference,
+            api_key=api_key,  # type: ignore
+            request_args=[timeseries_et, timeseries_eto, timeseries_etof],
+            end_date="2024-09-03",
+            logger=logger,
+            packets=True,
+        )
+    else:
+        et_data = ETFetch(
+            deepcopy(fields_queue),
+            reference,
+            api_key=api_key,  # type: ignore
+        )
+        et_data.start(
+            request_args=[timeseries_et, timeseries_eto, timeseries_etof],
+            frequency="daily",
+            logger=logger,
+            packets=True,
+        )
     
     et_data.export(f"data/{filename}.csv")
 
 def main():
     version_prompt = input("What version of DTW is this?: ")
+    # Match window forecasts of every county, partitioned for the notebooks.
+    archive = ForecastArchive(f"data/forecasts/archive/match_sample/{version_prompt}/polygon")
     
     monterey_queue = deque(monterey_polygon_fields.index.to_list())
     kern_queue = deque(kern_polygon_fields.index.to_list())
@@ -197,9 +220,11 @@ def main():
         dir=f"{version_prompt}/polygon/monterey/sampled",
         endpoint=polygon_forecast_endpoint,
         # align=False,
-        skip_exist=False
+        skip_exist=False,
+        archive=archive,
+        county="monterey",
     )
-    get_historical(monterey_queue, monterey_polygon_fields, filename='monterey_window_historical')
+    get_historical(monterey_queue, monterey_polygon_fields, filename='monterey_window_historical', incremental=True)
     
     logger.info("Getting polygon data for Kern County")
     get_forecasts(
@@ -209,8 +234,10 @@ def main():
         endpoint=polygon_forecast_endpoint,
         # align=False,
         skip_exist=False,
+        archive=archive,
+        county="kern",
     )
-    get_historical(kern_queue, kern_polygon_fields, filename='kern_window_historical')
+    get_historical(kern_queue, kern_polygon_fields, filename='kern_window_historical', incremental=True)
 
 if __name__ == '__main__':
     main()
@@ -1,3 +1,4 @@
+from pathlib import Path
 from sklearn.metrics import mean_absolute_error, root_mean_squared_error
 
 import contextily as cx
@@ -9,6 +10,34 @@ import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
 import matplotlib.ticker as mtick
 import seaborn as sns
+import sys
+
+# Notebooks run from notebook/, so the repository root is added to import src.
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from src.ETAlignment import Alignment
+from src.ETArchive import ForecastArchive
+from src.ETClimatology import Climatology
+
+### load_forecasts
+# This function loads forecasts from a ForecastArchive, e.g. ../data/forecasts/archive/fret, in place of globbing and concatenating the forecast csv files.
+
+# Only partitions matching the keys (county, forecast_date, match_window, match_variable) are opened, and filters on other columns skip row groups, so only the slice needed is read.
+# forecast_date is returned as forecasting_date to match the tables the notebooks build.
+def load_forecasts(path, *, columns=None, filters=None, **partitions) -> pd.DataFrame:
+    table = ForecastArchive(path).read(columns=columns, filters=filters, **partitions)
+    return table.rename(columns={"forecast_date": "forecasting_date"})
+
+
+### align_forecasts
+# This function pairs forecasts of every forecasting date with the actuals in one pass, in place of merging the historical table onto each forecasting table and masking the lead window.
+
+# actuals is either the historical table or an Alignment built from it once, which is reused across forecasting tables instead of sorting the historical data again.
+# lead is the first and last day after the forecasting date kept, so (1, 6) matches (time > forecasting_date) & (time < forecasting_date + timedelta(days=7)).
+# until drops times from that date on, e.g. analysis_end_date. how='inner' drops forecasts without an actual, as merging with how='inner' did.
+def align_forecasts(actuals, forecasts, *, names=("actual_et", "actual_eto", "actual_etof"), lead=(1, 6), until=None, how="right") -> pd.DataFrame:
+    alignment = actuals if isinstance(actuals, Alignment) else Alignment(actuals, names)
+    return alignment.pairs(forecasts, lead=lead, until=until, dropna=how == "inner")
+
 
 ### calculate_metrics
 # This function calculate the mean absolute error (mae), root mean squared error (rmse), mean forecast error (bias), correlation coefficient (R), and skill score.
@@ -21,6 +50,9 @@ import seaborn as sns
 
 
 # The function is very flexible given the data is formatted appropriately. It has the option of enabling normalization which is based on the average specified variable (ET, ETo, or ETof) throughout that field's historical data.
+
+# climatology_ref is either the climatology table or a Climatology built from it once with Climatology.from_frame, which slices each field's days instead of filtering the table.
+# avgs_ref is either the averages table or the same table indexed by field_id.
 def calculate_metrics(
     data: pd.DataFrame,
     *,
@@ -52,14 +84,20 @@ def calculate_metrics(
         start_date = data["time"].min().dayofyear
         end_date = data["time"].max().dayofyear
 
-        # Filter the climatology reference
-        field_mask = climatology_ref["field_id"] == field["field_id"]
-        crop_mask = climatology_ref["crop"] == field["crop"]
-        date_mask = (climatology_ref["doy"] >= start_date) & (
-            climatology_ref["doy"] <= end_date
-        )
+        if isinstance(climatology_ref, Climatology):
+            # Slice the days of the range that had a row in the climatology table.
+            row = climatology_ref.row(field["field_id"], field["crop"])
+            present = climatology_ref.present()[row, start_date - 1:end_date]
+            climatology = climatology_ref.slice(field["field_id"], field["crop"], start_date, end_date, actual)[present]
+        else:
+            # Filter the climatology reference
+            field_mask = climatology_ref["field_id"] == field["field_id"]
+            crop_mask = climatology_ref["crop"] == field["crop"]
+            date_mask = (climatology_ref["doy"] >= start_date) & (
+                climatology_ref["doy"] <= end_date
+            )
 
-        climatology = climatology_ref[field_mask & crop_mask & date_mask][actual]
+            climatology = climatology_ref[field_mask & crop_mask & date_mask][actual]
         climatology_mse = np.square(root_mean_squared_error(data[actual], climatology))
         climatology_mae = mean_absolute_error(data[actual], climatology)
         climatology_bias: float = np.mean(climatology - data[actual])
@@ -71,9 +109,13 @@ def calculate_metrics(
         )
 
         if normalize:
-            avg: float = avgs_ref[avgs_ref["field_id"] == field["field_id"]][
-                actual
-            ].values[0]
+            if "field_id" in avgs_ref.columns:
+                avg: float = avgs_ref[avgs_ref["field_id"] == field["field_id"]][
+                    actual
+                ].values[0]
+            else:
+                # avgs_ref indexed by field_id, e.g. avgs.drop_duplicates("field_id").set_index("field_id")
+                avg: float = avgs_ref[actual].to_numpy()[avgs_ref.index.get_loc(field["field_id"])]
 
             mae: float = mae.astype(float) / avg.astype(float)
             rmse = np.sqrt(forecast_mse.astype(float) / avg.astype(float))
@@ -94,87 +136,152 @@ def calculate_metrics(
         print(err)
 
 
+### VARIABLES
+# Actual and expected column of each variable evaluated by eval_metrics.
+VARIABLES = {
+    "ET": ("actual_et", "expected_et"),
+    "ETo": ("actual_eto", "expected_eto"),
+    "ETof": ("actual_etof", "expected_etof"),
+}
+
+METRICS = ["mae", "rmse", "corr", "bias", "skill_score", "c_mae", "c_bias"]
+
+
+### grouped_metrics
+# This function calculates the same metrics as calculate_metrics for every group and variable in one pass.
+
+# Rows are assigned a group code once, and every metric is a sum over those codes with np.bincount, so there is no per-group Python call.
+# The climatology is read from a Climatology by field, crop and day of year instead of masking climatology_ref for every group.
+# Groups calculate_metrics fails on (missing values, a date range the climatology does not fully cover, or no average when normalizing) are NaN, as they are from groupby().apply(calculate_metrics).
+
+# Rows of a group are expected to be consecutive days, which is how calculate_metrics pairs them with the climatology.
+# c_bias is the mean of climatology minus actual for each row. Given the climatology table, calculate_metrics subtracts the two Series by index label, so its c_bias only matches when both tables share the same index.
+
+# by must include field_id and crop. Extra keys, e.g. forecasting_date, evaluate every forecast at once instead of calling eval_metrics per forecast.
+def grouped_metrics(
+    table: pd.DataFrame,
+    *,
+    climatology_ref: pd.DataFrame,
+    avgs_ref: pd.DataFrame,
+    by=["field_id", "crop"],
+    variables: dict = VARIABLES,
+    normalize: bool = False,
+) -> pd.DataFrame:
+    if "field_id" not in by or "crop" not in by:
+        raise ValueError("by must include field_id and crop.")
+
+    codes = table.groupby(by=by).ngroup().to_numpy()
+    # Rows with a missing key belong to no group.
+    table = table.loc[codes >= 0]
+    codes = codes[codes >= 0]
+
+    # Keys of each group in code order.
+    _, first = np.unique(codes, return_index=True)
+    keys = table[by].iloc[first].reset_index(drop=True)
+    n_groups = len(keys)
+    counts = np.bincount(codes, minlength=n_groups).astype(float)
+
+    def group_sum(values):
+        return np.bincount(codes, weights=values, minlength=n_groups)
+
+    def group_any(mask):
+        return np.bincount(codes, weights=mask, minlength=n_groups) > 0
+
+    # Day of year range of each group, as calculate_metrics filters the climatology with.
+    doy = table["time"].dt.dayofyear.to_numpy()
+    start_doy = np.full(n_groups, 367)
+    end_doy = np.zeros(n_groups, dtype=int)
+    np.minimum.at(start_doy, codes, doy)
+    np.maximum.at(end_doy, codes, doy)
+
+    if not isinstance(climatology_ref, Climatology):
+        climatology_ref = Climatology.from_frame(climatology_ref, names=[actual for actual, _ in variables.values()])
+
+    # Climatology days of each group's field and crop within that range, counted from a running total.
+    group_rows = climatology_ref.rows(keys["field_id"], keys["crop"])
+    total = np.concatenate(
+        [np.zeros((len(climatology_ref), 1), dtype=int), np.cumsum(climatology_ref.present(), axis=1)], axis=1
+    )
+    in_range = np.zeros(n_groups, dtype=int)
+    held = group_rows >= 0
+    in_range[held] = total[group_rows[held], end_doy[held]] - total[group_rows[held], start_doy[held] - 1]
+
+    # Climatology row matching each row's field and crop.
+    matches = climatology_ref.rows(table["field_id"], table["crop"])
+    matched = matches >= 0
+
+    if normalize:
+        avgs = avgs_ref.drop_duplicates("field_id").set_index("field_id")
+
+    frames = []
+    for variable, (actual, expected) in variables.items():
+        a = table[actual].to_numpy(dtype=float)
+        e = table[expected].to_numpy(dtype=float)
+        c = np.full(len(table), np.nan)
+        c[matched] = climatology_ref.means(actual)[matches[matched], doy[matched] - 1]
+
+        failed = group_any(np.isnan(a) | np.isnan(e) | np.isnan(c)) | (in_range != counts)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            diff = e - a
+            mae = group_sum(np.abs(diff)) / counts
+            # Squared back from the RMSE as calculate_metrics does.
+            forecast_mse = np.square(np.sqrt(group_sum(np.square(diff)) / counts))
+            rmse = np.sqrt(forecast_mse)
+            bias = group_sum(diff) / counts
+
+            # Pearson correlation of actual and expected.
+            a_dev = a - (group_sum(a) / counts)[codes]
+            e_dev = e - (group_sum(e) / counts)[codes]
+            corr = group_sum(a_dev * e_dev) / np.sqrt(group_sum(np.square(a_dev)) * group_sum(np.square(e_dev)))
+
+            c_diff = c - a
+            climatology_mse = np.square(np.sqrt(group_sum(np.square(c_diff)) / counts))
+            c_mae = group_sum(np.abs(c_diff)) / counts
+            c_bias = group_sum(c_diff) / counts
+
+            skill_score = 1 - np.clip(forecast_mse / climatology_mse, -1, 2)
+
+            if normalize:
+                avg = avgs[actual].reindex(keys["field_id"]).to_numpy(dtype=float)
+                failed |= np.isnan(avg)
+
+                mae = mae / avg
+                rmse = np.sqrt(forecast_mse / avg)
+                bias = bias / avg
+
+        metrics = pd.DataFrame(
+            {
+                "mae": mae.round(2),
+                "rmse": rmse.round(2),
+                "corr": corr.round(2),
+                "bias": bias.round(2),
+                "skill_score": skill_score.round(2),
+                "c_mae": c_mae,
+                "c_bias": c_bias,
+            }
+        )
+        metrics.loc[failed, :] = np.nan
+
+        frame = pd.concat([keys, metrics], axis=1)
+        frame["variable"] = variable
+        frames.append(frame)
+
+    return pd.concat(frames, ignore_index=True)
+
+
 ### eval_metrics
 # This function evaluates the metrics for each variable. The output is a DataFrame containing the metrics with a column specifying which variable (ET, ETo, ETof)
 def eval_metrics(
     table: pd.DataFrame, by=["field_id", "crop"], **kwargs
 ) -> pd.DataFrame:
-    metrics_table = pd.DataFrame(
-        columns=[
-            "field_id",
-            "variable",
-            "crop",
-            "mae",
-            "rmse",
-            "corr",
-            "bias",
-            "skill_score",
-            "c_mae",
-            "c_bias",
-        ]
-    )
+    metrics_table = grouped_metrics(table, by=by, **kwargs)
 
-    et_metrics = (
-        table.groupby(by=by)[["field_id", "crop", "time", "actual_et", "expected_et"]]
-        .apply(
-            calculate_metrics,
-            actual="actual_et",
-            expected="expected_et",
-            **kwargs,
-        )
-        .reset_index()
-    )
-    et_metrics["variable"] = "ET"
-
-    metrics_table = pd.concat(
-        [
-            et_metrics.astype(metrics_table.dtypes),
-            metrics_table.astype(et_metrics.dtypes),
-        ],
-        ignore_index=True,
-    )
-
-    eto_metrics = (
-        table.groupby(by=by)[["field_id", "crop", "time", "actual_eto", "expected_eto"]]
-        .apply(
-            calculate_metrics,
-            actual="actual_eto",
-            expected="expected_eto",
-            **kwargs,
-        )
-        .reset_index()
-    )
-    eto_metrics["variable"] = "ETo"
-    metrics_table = pd.concat(
-        [
-            eto_metrics.astype(metrics_table.dtypes),
-            metrics_table.astype(eto_metrics.dtypes),
-        ],
-        ignore_index=True,
-    )
-
-    etof_metrics = (
-        table.groupby(by=by)[
-            ["field_id", "crop", "time", "actual_etof", "expected_etof"]
-        ]
-        .apply(
-            calculate_metrics,
-            actual="actual_etof",
-            expected="expected_etof",
-            **kwargs,
-        )
-        .reset_index()
-    )
-    etof_metrics["variable"] = "ETof"
-    metrics_table = pd.concat(
-        [
-            etof_metrics.astype(metrics_table.dtypes),
-            metrics_table.astype(etof_metrics.dtypes),
-        ],
-        ignore_index=True,
-    )
+    # Variables are listed last to first, as they were when each was prepended to the table.
+    order = {variable: position for position, variable in enumerate(reversed(list(VARIABLES)))}
+    metrics_table = metrics_table.sort_values("variable", key=lambda column: column.map(order), kind="stable")
 
-    return metrics_table
+    return metrics_table.reset_index(drop=True).astype(object)
 
 
 ### timeseries_rel
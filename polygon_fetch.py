@@ -5,10 +5,12 @@ Created on Mon Sep 16 8:42:18 2024
 @author: Robin Fishman
 """
 
+from concurrent.futures import Future, ThreadPoolExecutor
 from dotenv import dotenv_values
+from src.ETDecode import loads
 
-import gzip
 import json
+import numpy as np
 import pandas as pd
 import requests
 
@@ -17,6 +19,23 @@ boundaries_endpoint = "https://developer.openet-api.org/geodatabase/metadata/bou
 api_key = dotenv_values(".env").get("ET_KEY")
 kern_fields = pd.read_csv("./data/Kern.csv", low_memory=False)
 monterey_fields = pd.read_csv("./data/Monterey.csv", low_memory=False)
+# GeoJSON exports are written in the background. Their futures raise any error writing them.
+executor = ThreadPoolExecutor(max_workers=2)
+exports: list[Future] = []
+
+
+def export_geojson(data, export) -> None:
+    with open(export, "w") as file:
+        json.dump(data, file, ensure_ascii=False, indent=4)
+
+
+def flatten_coordinates(geometry) -> list:
+    if geometry["type"] == "Polygon":
+        # Rings concatenated as one flat [x1, y1, x2, y2, ...] list.
+        return np.concatenate(
+            [np.asarray(ring, dtype=float).ravel() for ring in geometry["coordinates"]]
+        ).tolist()
+    return [x for f in geometry["coordinates"] for s in f for x in s]
 
 
 def get_polygons(fields, export, field_ref) -> pd.DataFrame | None:
@@ -26,27 +45,34 @@ def get_polygons(fields, export, field_ref) -> pd.DataFrame | None:
         json={"field_ids": fields},
     )
 
-    data = eval(gzip.decompress(res.content).decode())
-    df = pd.DataFrame(columns=["OPENET_ID", "CROP_2023", ".geo"])
-    for feat in data["features"]:
-        str_format_id = "CA_" + feat["properties"]["field_id"][2:]
-        crop = field_ref[field_ref["OPENET_ID"] == feat["properties"]["field_id"]][
-            "CROP_2023"
-        ].values[0]
-        feat["geometry"]["coordinates"] = [
-            x for f in feat["geometry"]["coordinates"] for s in f for x in s
-        ]
-        df = pd.concat(
-            [
-                pd.DataFrame(
-                    [[str_format_id, crop, feat["geometry"]]], columns=df.columns
-                ),
-                df,
-            ],
-            ignore_index=True,
-        )
-    with open(export, "w") as file:
-        json.dump(data, file, ensure_ascii=False, indent=4)
+    data = loads(res.content)
+    features = data["features"]
+    field_ids = pd.Series([feat["properties"]["field_id"] for feat in features])
+
+    # Crop of every feature from one indexed lookup. The first row is used for duplicated IDs.
+    crops = field_ref.drop_duplicates("OPENET_ID").set_index("OPENET_ID")["CROP_2023"]
+    # A missing field would turn the column to float, e.g. 27.0, which breaks packet file names.
+    missing = ~field_ids.isin(crops.index)
+    if missing.any():
+        raise KeyError(f"Fields missing from the reference: {field_ids[missing].tolist()}")
+    crops = crops.reindex(field_ids).to_numpy()
+
+    geometries = []
+    for feat in features:
+        feat["geometry"]["coordinates"] = flatten_coordinates(feat["geometry"])
+        geometries.append(feat["geometry"])
+
+    # Rows are in reverse feature order, as they were when each row was prepended.
+    df = pd.DataFrame(
+        {
+            "OPENET_ID": ("CA_" + field_ids.str.slice(start=2)).to_numpy()[::-1],
+            "CROP_2023": crops[::-1],
+            ".geo": geometries[::-1],
+        }
+    )
+
+    # The GeoJSON export is written in the background while the caller uses the table.
+    exports.append(executor.submit(export_geojson, data, export))
 
     return df
 
@@ -68,6 +94,10 @@ def main():
         monterey_fields,
     ).to_csv("data/monterey_polygons.csv", index=False)
 
+    with executor:
+        for future in exports:
+            future.result()
+
 
 if __name__ == "__main__":
     main()
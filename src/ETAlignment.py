@@ -0,0 +1,124 @@
+from typing import Any, Iterable
+
+import numpy as np
+import pandas as pd
+
+class Alignment:
+    """
+    Actual values indexed by (field_id, crop, time) once, for pairing with many forecasts.
+
+    Parameters
+    ----------
+    actuals : DataFrame
+        Historical data with 'field_id', 'crop', 'time' and the actual columns, e.g. as exported by get_historical_data.
+
+    names : list of str, default None
+        Actual columns paired with forecasts. Every column other than the keys if None.
+
+    Notes
+    -----
+    Rows are sorted once by one int64 key combining the (field_id, crop) code and the day, so the actual of
+    any forecast row is found with a binary search instead of merging the tables. Times are compared by day.
+    If a (field_id, crop, time) appears more than once, the first row is used.
+
+    Examples
+    --------
+    >>> alignment = Alignment(historical, ["actual_et", "actual_eto", "actual_etof"])
+    >>> pairs = alignment.pairs(forecasting_table, lead=(1, 6), until=analysis_end_date)
+    """
+    def __init__(self, actuals: pd.DataFrame, names: Iterable[str] | None = None) -> None:
+        self.names = [column for column in actuals.columns if column not in ('field_id', 'crop', 'time')] \
+            if names is None else list(names)
+
+        codes, self.__keys__ = pd.factorize(pd.MultiIndex.from_arrays([actuals['field_id'], actuals['crop']]))
+        days = pd.to_datetime(actuals['time']).to_numpy(dtype='datetime64[D]').astype(np.int64)
+
+        # Keys are code * span + day offset, so sorting by key sorts by (field_id, crop) then time.
+        self.__first__ = int(days.min()) if len(days) > 0 else 0
+        self.__span__ = int(days.max()) - self.__first__ + 1 if len(days) > 0 else 1
+        keys = codes.astype(np.int64) * self.__span__ + (days - self.__first__)
+
+        order = np.argsort(keys, kind='stable')
+        self.__sorted__ = keys[order]
+        self.__values__ = {name: actuals[name].to_numpy()[order] for name in self.names}
+
+    def __len__(self) -> int:
+        return len(self.__sorted__)
+
+    def positions(self, field_ids: Iterable, crops: Iterable, times: Any) -> np.ndarray:
+        """Returns the sorted position of the actual of every (field_id, crop, time), or -1 where there is none."""
+        codes = self.__keys__.get_indexer(pd.MultiIndex.from_arrays([list(field_ids), list(crops)]))
+        days = pd.to_datetime(pd.Series(times)).to_numpy(dtype='datetime64[D]').astype(np.int64) - self.__first__
+
+        valid = (codes >= 0) & (days >= 0) & (days < self.__span__)
+        keys = codes.astype(np.int64) * self.__span__ + days
+
+        positions = np.searchsorted(self.__sorted__, keys)
+        found = valid & (positions < len(self.__sorted__))
+        found[found] = self.__sorted__[positions[found]] == keys[found]
+        return np.where(found, positions, -1)
+
+    def __gather__(self, positions: np.ndarray) -> pd.DataFrame:
+        # Actual columns at sorted positions, NaN at -1.
+        found = positions >= 0
+        columns = {}
+        for name in self.names:
+            column = np.full(len(positions), np.nan, dtype=np.float64)
+            column[found] = self.__values__[name][positions[found]]
+            columns[name] = column
+        return pd.DataFrame(columns)
+
+    def lookup(self, field_ids: Iterable, crops: Iterable, times: Any) -> pd.DataFrame:
+        """Returns the actual columns of every (field_id, crop, time), NaN where there is no actual."""
+        return self.__gather__(self.positions(field_ids, crops, times))
+
+    def pairs(
+        self,
+        forecasts: pd.DataFrame,
+        *,
+        lead: tuple[int, int] = (1, 6),
+        forecast_col: str = 'forecasting_date',
+        until: Any = None,
+        dropna: bool = False,
+    ) -> pd.DataFrame:
+        """
+        Pairs forecast rows inside a lead time window with their actuals.
+
+        Parameters
+        ----------
+        forecasts : DataFrame
+            Forecasts with 'field_id', 'crop', 'time' and forecast_col, e.g. from every forecast date at once.
+        lead : (int, int), default (1, 6)
+            First and last day after the forecast date kept, inclusive. The default keeps the 7-day window
+            `(time > forecasting_date) & (time < forecasting_date + 7 days)`.
+        forecast_col : str, default 'forecasting_date'
+            Column holding the date each forecast was made.
+        until : date-like, default None
+            If provided, only times before it are kept.
+        dropna : bool, default False
+            If True, rows without an actual are dropped, as an inner merge would. Otherwise their actuals are NaN,
+            as a right merge onto the forecasts would.
+
+        Returns
+        -------
+        DataFrame
+            Forecast rows in the window, in their original order, with 'lead' in days and the actual columns.
+        """
+        time = pd.to_datetime(forecasts['time'])
+        issued = pd.to_datetime(forecasts[forecast_col])
+
+        days = (time.to_numpy(dtype='datetime64[D]') - issued.to_numpy(dtype='datetime64[D]')).astype(np.int64)
+        keep = (days >= lead[0]) & (days <= lead[1])
+        if until is not None:
+            keep &= (time < pd.Timestamp(until)).to_numpy()
+
+        window = forecasts.loc[keep].assign(time=time[keep], **{forecast_col: issued[keep]}).reset_index(drop=True)
+        window['lead'] = days[keep]
+
+        positions = self.positions(window['field_id'], window['crop'], window['time'])
+        window = window.drop(columns=[name for name in self.names if name in window.columns])
+        paired = pd.concat([window, self.__gather__(positions)], axis=1)
+
+        if dropna:
+            paired = paired.loc[positions >= 0].reset_index(drop=True)
+        return paired
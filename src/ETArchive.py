@@ -0,0 +1,192 @@
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any
+
+import logging
+import os
+import pandas as pd
+
+# Partition keys, outermost first.
+PARTITIONS = ['county', 'forecast_date', 'match_window', 'match_variable']
+# Directory name of a partition without a value, e.g. forecasts without a match window.
+NULL_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+
+class ForecastArchive:
+    """
+    Parquet dataset of forecasts partitioned by county, forecast date, match window and match variable.
+
+    Parameters
+    ----------
+    path : str, path object, default 'data/forecasts/archive'
+        Root directory of the dataset.
+
+    Notes
+    -----
+    Each forecast, i.e. one ETFetch export, is written to its own partition directory in hive layout,
+    `<path>/county=kern/forecast_date=2024-10-28/match_window=60/match_variable=ndvi/part-0.parquet`,
+    with the rows sorted by field_id and time. Writing the same partition again replaces it.
+
+    `read` only opens the partitions matching the keys provided and skips row groups using the Parquet
+    statistics of any other filter, so a slice of the archive is loaded without reading the rest.
+
+    Requires pyarrow.
+
+    Examples
+    --------
+    >>> archive = ForecastArchive()
+    >>> archive.write(process.data_table, county='kern', forecast_date='2024-10-28', match_window=60)
+    >>> archive.read(county='kern', match_window=[60, 90], filters=[('field_id', '==', 'CA_244144')])
+    """
+    def __init__(self, path: str | Path = 'data/forecasts/archive') -> None:
+        try:
+            import pyarrow as pa
+            import pyarrow.dataset as ds
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("ForecastArchive requires pyarrow. Please run `pip install pyarrow`.")
+
+        self.__pa__ = pa
+        self.__ds__ = ds
+        self.__pq__ = pq
+        self.path = Path(path)
+
+    @staticmethod
+    def __value__(key: str, value: Any) -> Any:
+        # Partition values are stored as text. Dates are written as YYYY-MM-DD.
+        if value is None:
+            return None
+        if key == 'forecast_date' and isinstance(value, (str, date, datetime, pd.Timestamp)):
+            return pd.Timestamp(value).strftime('%Y-%m-%d')
+        if key == 'match_window':
+            return int(value)
+        return str(value)
+
+    def partition(self, county: str, forecast_date: Any, match_window: int | None = None, match_variable: str | None = None) -> Path:
+        """Returns the directory of a partition."""
+        values = [county, forecast_date, match_window, match_variable]
+        parts = []
+        for key, value in zip(PARTITIONS, values):
+            value = self.__value__(key, value)
+            parts.append(f"{key}={NULL_PARTITION if value is None else value}")
+        return self.path.joinpath(*parts)
+
+    def exists(self, county: str, forecast_date: Any, match_window: int | None = None, match_variable: str | None = None) -> bool:
+        """Returns True if the partition has been written."""
+        return (self.partition(county, forecast_date, match_window, match_variable) / 'part-0.parquet').exists()
+
+    def write(
+        self,
+        table: pd.DataFrame,
+        *,
+        county: str,
+        forecast_date: Any,
+        match_window: int | None = None,
+        match_variable: str | None = None,
+        logger: logging.Logger | None = None,
+    ) -> Path:
+        """
+        Writes one forecast to its partition, replacing it if it was written before.
+
+        Parameters
+        ----------
+        table : DataFrame
+            Forecast as exported by ETFetch, with 'field_id', 'crop', 'time' and a column per ETArg.
+        county, forecast_date, match_window, match_variable
+            Partition of the forecast. match_window and match_variable are null if None.
+        logger : logging.Logger, default None
+            If provided, warns when the table is empty, e.g. every field failed.
+
+        Returns
+        -------
+        path object
+            File written.
+        """
+        frame = table.drop(columns=[key for key in PARTITIONS if key in table.columns])
+        frame = frame.assign(time=pd.to_datetime(frame['time'])).sort_values(['field_id', 'time'], kind='stable')
+        if len(frame) == 0 and logger:
+            logger.warning(f"Writing an empty forecast to {county} {forecast_date} {match_window} {match_variable}")
+
+        directory = self.partition(county, forecast_date, match_window, match_variable)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        file = directory / 'part-0.parquet'
+        # Written to a hidden temporary file first so readers never see a partial file.
+        tmp = directory / '.part-0.parquet.tmp'
+        self.__pq__.write_table(self.__pa__.Table.from_pandas(frame, schema=self.__schema__(frame), preserve_index=False), tmp)
+        os.replace(tmp, file)
+        return file
+
+    def __schema__(self, frame: pd.DataFrame):
+        # Types are fixed rather than inferred, so a table of failed fields, whose empty columns are all float64,
+        # is written with the same schema as any other partition.
+        pa = self.__pa__
+        types = {'field_id': pa.string(), 'crop': pa.int64(), 'time': pa.timestamp('ns')}
+        return pa.schema([
+            (column, types.get(column, pa.string() if frame[column].dtype == object else pa.float64()))
+            for column in frame.columns
+        ])
+
+    def __dataset__(self):
+        pa, ds = self.__pa__, self.__ds__
+        partitioning = ds.partitioning(
+            pa.schema([
+                ('county', pa.string()),
+                ('forecast_date', pa.string()),
+                ('match_window', pa.int64()),
+                ('match_variable', pa.string()),
+            ]),
+            flavor='hive',
+        )
+        return ds.dataset(self.path, format='parquet', partitioning=partitioning)
+
+    def __filter__(self, partitions: dict[str, Any], filters: Any):
+        ds, pq = self.__ds__, self.__pq__
+        expression = None
+        for key, value in partitions.items():
+            if isinstance(value, (list, tuple, set)):
+                values = [self.__value__(key, item) for item in value]
+                condition = ds.field(key).isin([item for item in values if item is not None])
+                if None in values:
+                    condition = condition | ds.field(key).is_null()
+            elif value is None:
+                condition = ds.field(key).is_null()
+            else:
+                condition = ds.field(key) == self.__value__(key, value)
+            expression = condition if expression is None else expression & condition
+
+        if filters is not None:
+            # Accepts a pyarrow expression or pyarrow.parquet's list of tuples, e.g. [('time', '>=', timestamp)].
+            condition = filters if isinstance(filters, ds.Expression) else pq.filters_to_expression(filters)
+            expression = condition if expression is None else expression & condition
+        return expression
+
+    def read(self, *, columns: list[str] | None = None, filters: Any = None, **partitions) -> pd.DataFrame:
+        """
+        Reads the forecasts matching the partition keys and filters.
+
+        Parameters
+        ----------
+        columns : list of str, default None
+            Columns read. Every column if None.
+        filters : pyarrow expression or list of tuples, default None
+            Conditions on other columns, e.g. [('field_id', 'in', ['CA_1', 'CA_2'])].
+        **partitions
+            Value, or list of values, of any of county, forecast_date, match_window and match_variable.
+            None matches forecasts without a value for the key.
+
+        Returns
+        -------
+        DataFrame
+            Rows with forecast_date and time as datetime64. Empty if nothing matches.
+        """
+        unknown = [key for key in partitions if key not in PARTITIONS]
+        if len(unknown) > 0:
+            raise ValueError(f"Unknown partition keys: {unknown}. Accepted keys are {PARTITIONS}.")
+
+        if not self.path.exists():
+            return pd.DataFrame(columns=columns or ['field_id', 'crop', 'time', *PARTITIONS])
+
+        frame = self.__dataset__().to_table(columns=columns, filter=self.__filter__(partitions, filters)).to_pandas()
+        if 'forecast_date' in frame.columns:
+            frame['forecast_date'] = pd.to_datetime(frame['forecast_date'])
+        return frame
@@ -0,0 +1,276 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from pathlib import Path
+from typing import Any
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+from shapely import get_coordinates, intersection, intersects, union_all
+from shapely.geometry import Polygon, mapping, shape
+from shapely.geometry.base import BaseGeometry
+
+# Decimal places coordinates are rounded to before hashing. About 1 cm.
+HASH_PRECISION = 7
+# Parameters bound per statement. Below SQLite's default limit.
+BATCH_SIZE = 900
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS queries (
+    geometry_hash TEXT PRIMARY KEY,
+    fetched REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS query_fields (
+    geometry_hash TEXT NOT NULL,
+    field_id TEXT NOT NULL,
+    PRIMARY KEY (geometry_hash, field_id)
+);
+CREATE TABLE IF NOT EXISTS query_areas (
+    geometry_hash TEXT PRIMARY KEY,
+    geometry TEXT NOT NULL,
+    minx REAL NOT NULL,
+    maxx REAL NOT NULL,
+    miny REAL NOT NULL,
+    maxy REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS fields (
+    id INTEGER PRIMARY KEY,
+    field_id TEXT NOT NULL UNIQUE,
+    geometry TEXT NOT NULL,
+    fetched REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS properties (
+    field_id TEXT PRIMARY KEY,
+    properties TEXT NOT NULL,
+    fetched REAL NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS field_index USING rtree(id, minx, maxx, miny, maxy);
+"""
+
+class FieldCatalog:
+    """
+    Local catalog of field IDs, boundaries and properties from the OpenET geodatabase.
+
+    Parameters
+    ----------
+    path : str, path object, default 'data/fields.sqlite'
+        SQLite database the catalog is stored in.
+
+    ttl : float, default None
+        Seconds an entry is used for after it was fetched. Never expires if None.
+
+    Notes
+    -----
+    The field IDs returned for a geometry are stored under the SHA-256 of its coordinates rounded to
+    HASH_PRECISION decimals, so the same polygon read from different files maps to the same entry.
+
+    Boundaries are indexed by bounding box in an R*Tree, so fields intersecting a polygon can be answered
+    from the boundaries already in the catalog with `intersecting`. The polygons queried are stored too, and
+    `coverage` returns the part of a new polygon they already answer.
+    """
+    def __init__(self, path: str | Path = "data/fields.sqlite", ttl: float | None = None) -> None:
+        self.path = Path(path)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.executescript(SCHEMA)
+
+    @classmethod
+    def from_config(cls, config: dict) -> "FieldCatalog | None":
+        """Builds a FieldCatalog from ET_CATALOG_PATH and ET_CATALOG_TTL_DAYS.
+
+        Returns None if ET_CATALOG_PATH is not set.
+        """
+        path = config.get("ET_CATALOG_PATH")
+        if not path:
+            return None
+
+        ttl_days = config.get("ET_CATALOG_TTL_DAYS")
+        return cls(path, ttl=float(ttl_days) * 86400 if ttl_days else None)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def __fresh__(self) -> float:
+        # Entries fetched before this time are ignored.
+        return 0 if self.ttl is None else time.time() - self.ttl
+
+    def __select__(self, query: str, field_ids: list[str]) -> list[tuple]:
+        rows = []
+        with self._lock:
+            for start in range(0, len(field_ids), BATCH_SIZE):
+                batch = field_ids[start:start + BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows.extend(self._connection.execute(query.format(placeholders), [*batch, self.__fresh__()]))
+        return rows
+
+    @staticmethod
+    def __shape__(geometry: BaseGeometry | dict | list[float]) -> BaseGeometry:
+        # Shapely geometry of a GeoJSON geometry or flat coordinate list.
+        if isinstance(geometry, dict):
+            return shape(geometry)
+        if isinstance(geometry, BaseGeometry):
+            return geometry
+        return Polygon(np.reshape(np.asarray(geometry, dtype=float), (-1, 2)))
+
+    @staticmethod
+    def geometry_hash(geometry: BaseGeometry | dict | list[float]) -> str:
+        """Returns the key of a shapely geometry, GeoJSON geometry or flat coordinate list."""
+        if isinstance(geometry, dict):
+            geometry = shape(geometry)
+        if isinstance(geometry, BaseGeometry):
+            coordinates = get_coordinates(geometry).flatten()
+        else:
+            coordinates = np.asarray(geometry, dtype=float)
+        return hashlib.sha256(np.round(coordinates, HASH_PRECISION).tobytes()).hexdigest()
+
+    def field_ids(self, geometry: BaseGeometry | dict | list[float]) -> list[str] | None:
+        """Returns the field IDs stored for geometry, or None if it was never queried or has expired."""
+        key = self.geometry_hash(geometry)
+        with self._lock:
+            fetched = self._connection.execute(
+                "SELECT fetched FROM queries WHERE geometry_hash = ?", (key,)
+            ).fetchone()
+            if fetched is None or fetched[0] < self.__fresh__():
+                return None
+            rows = self._connection.execute(
+                "SELECT field_id FROM query_fields WHERE geometry_hash = ? ORDER BY rowid", (key,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def put_field_ids(self, geometry: BaseGeometry | dict | list[float], field_ids: list[str]) -> None:
+        key = self.geometry_hash(geometry)
+        area = self.__shape__(geometry)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO query_areas VALUES (?, ?, ?, ?, ?, ?)",
+                (key, json.dumps(mapping(area)), area.bounds[0], area.bounds[2], area.bounds[1], area.bounds[3]),
+            )
+            self._connection.execute("DELETE FROM query_fields WHERE geometry_hash = ?", (key,))
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO query_fields VALUES (?, ?)", [(key, field_id) for field_id in field_ids]
+            )
+            self._connection.execute("INSERT OR REPLACE INTO queries VALUES (?, ?)", (key, time.time()))
+
+    def coverage(self, geometry: BaseGeometry | dict) -> BaseGeometry:
+        """
+        Returns the part of geometry inside polygons queried before, which may be empty.
+
+        Only queries whose fields all have a stored boundary count, so every field intersecting the
+        returned area is found by `intersecting`.
+        """
+        geometry = self.__shape__(geometry)
+
+        minx, miny, maxx, maxy = geometry.bounds
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT query_areas.geometry_hash, query_areas.geometry FROM query_areas "
+                "JOIN queries ON queries.geometry_hash = query_areas.geometry_hash "
+                "WHERE query_areas.minx <= ? AND query_areas.maxx >= ? "
+                "AND query_areas.miny <= ? AND query_areas.maxy >= ? AND queries.fetched >= ?",
+                (maxx, minx, maxy, miny, self.__fresh__()),
+            ).fetchall()
+            queried = [
+                [row[0] for row in self._connection.execute(
+                    "SELECT field_id FROM query_fields WHERE geometry_hash = ?", (key,)
+                )]
+                for key, _ in rows
+            ]
+
+        areas = [
+            shape(json.loads(area)) for (_, area), field_ids in zip(rows, queried)
+            if len(self.missing_boundaries(field_ids)) == 0
+        ]
+        return intersection(union_all(areas), geometry) if len(areas) > 0 else Polygon()
+
+    def missing_boundaries(self, field_ids: list[str]) -> list[str]:
+        """Returns the IDs in field_ids without a stored boundary, in the order provided."""
+        rows = self.__select__("SELECT field_id FROM fields WHERE field_id IN ({}) AND fetched >= ?", field_ids)
+        stored = {row[0] for row in rows}
+        return [field_id for field_id in field_ids if field_id not in stored]
+
+    def put_boundaries(self, features: list[dict[str, Any]]) -> None:
+        """Stores GeoJSON features with a `field_id` property, e.g. from the metadata/boundaries endpoint."""
+        now = time.time()
+        with self._lock, self._connection:
+            for feature in features:
+                field_id = feature["properties"]["field_id"]
+                minx, miny, maxx, maxy = shape(feature["geometry"]).bounds
+                cursor = self._connection.execute(
+                    "INSERT INTO fields (field_id, geometry, fetched) VALUES (?, ?, ?) "
+                    "ON CONFLICT (field_id) DO UPDATE SET geometry = excluded.geometry, fetched = excluded.fetched "
+                    "RETURNING id",
+                    (field_id, json.dumps(feature["geometry"]), now),
+                )
+                row_id = cursor.fetchone()[0]
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO field_index VALUES (?, ?, ?, ?, ?)", (row_id, minx, maxx, miny, maxy)
+                )
+
+    def boundaries(self, field_ids: list[str]) -> gpd.GeoDataFrame:
+        """Returns the stored boundaries of field_ids in the order provided, with columns ['field_id', 'geometry']."""
+        rows = dict(self.__select__("SELECT field_id, geometry FROM fields WHERE field_id IN ({}) AND fetched >= ?", field_ids))
+        stored = [field_id for field_id in field_ids if field_id in rows]
+        return gpd.GeoDataFrame(
+            {"field_id": stored},
+            geometry=[shape(json.loads(rows[field_id])) for field_id in stored],
+            crs="EPSG:4326",
+        )
+
+    def missing_properties(self, field_ids: list[str]) -> list[str]:
+        """Returns the IDs in field_ids without stored properties, in the order provided."""
+        rows = self.__select__("SELECT field_id FROM properties WHERE field_id IN ({}) AND fetched >= ?", field_ids)
+        stored = {row[0] for row in rows}
+        return [field_id for field_id in field_ids if field_id not in stored]
+
+    def put_properties(self, records: pd.DataFrame) -> None:
+        """Stores the rows of a metadata/properties response, one per field_id."""
+        now = time.time()
+        rows = [
+            (record["field_id"], json.dumps(record), now)
+            for record in json.loads(records.to_json(orient="records"))
+        ]
+        with self._lock, self._connection:
+            self._connection.executemany("INSERT OR REPLACE INTO properties VALUES (?, ?, ?)", rows)
+
+    def properties(self, field_ids: list[str]) -> pd.DataFrame:
+        """Returns the stored properties of field_ids in the order provided, e.g. ['field_id', 'hectares', 'crop_2016', ...]."""
+        rows = dict(self.__select__("SELECT field_id, properties FROM properties WHERE field_id IN ({}) AND fetched >= ?", field_ids))
+        records = [json.loads(rows[field_id]) for field_id in field_ids if field_id in rows]
+        return pd.DataFrame.from_records(records) if len(records) > 0 else pd.DataFrame(columns=["field_id"])
+
+    def intersecting(self, geometry: BaseGeometry | dict) -> list[str]:
+        """
+        Returns the IDs of stored fields whose boundary intersects geometry.
+
+        Only boundaries already in the catalog are searched. Candidates are found with the R*Tree
+        and confirmed against their boundary.
+        """
+        if isinstance(geometry, dict):
+            geometry = shape(geometry)
+
+        minx, miny, maxx, maxy = geometry.bounds
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT fields.field_id, fields.geometry FROM field_index "
+                "JOIN fields ON fields.id = field_index.id "
+                "WHERE field_index.minx <= ? AND field_index.maxx >= ? "
+                "AND field_index.miny <= ? AND field_index.maxy >= ? AND fields.fetched >= ? "
+                "ORDER BY fields.id",
+                (maxx, minx, maxy, miny, self.__fresh__()),
+            ).fetchall()
+
+        if len(rows) == 0:
+            return []
+
+        candidates = [shape(json.loads(row[1])) for row in rows]
+        hits = intersects(np.array(candidates, dtype=object), geometry)
+        return [row[0] for row, hit in zip(rows, hits) if hit]
@@ -0,0 +1,285 @@
+from typing import Any, Iterable
+
+import numpy as np
+import pandas as pd
+
+# Days of year, including February 29th.
+DAYS = 366
+# Storage of the running sums and counts. A day of year holds one value per year, far below the uint16 limit.
+SUM_DTYPE = np.float32
+COUNT_DTYPE = np.uint16
+
+def __unpack__(content: list[dict]) -> tuple[list[str], np.ndarray]:
+    # Rows of one variable as ETFetch receives them, i.e. [{'time': str, '$variable': float}, ...].
+    if len(content) == 0:
+        return [], np.empty(0)
+    value_key = [key for key in content[0] if key != 'time'][0]
+    values = np.array([np.nan if item[value_key] is None else item[value_key] for item in content], dtype=np.float64)
+    return [item['time'] for item in content], values
+
+class Climatology:
+    """
+    Day-of-year climatology of each (field_id, crop), stored as dense NumPy arrays.
+
+    Parameters
+    ----------
+    names : list of str
+        Variables held, e.g. ['actual_et', 'actual_eto', 'actual_etof'].
+
+    capacity : int, default 0
+        Rows allocated up front, e.g. the number of fields about to be fetched.
+
+    Notes
+    -----
+    Every key owns one row of a (keys, 366) array per variable, with day of year 1 at position 0, so the
+    climatology of a key over a range of days is a slice rather than a scan of the climatology table.
+    Days without data are NaN. Rows are allocated in blocks that double in size, so keys added one at a time
+    are not copied on every addition. Sums are float32 and counts uint16, about 2.2 kB per key and variable.
+
+    Means are kept as running sums and counts, so a climatology can be compiled from a historical table with
+    `from_history`, accumulated field by field with `add` while fetching, or read back from a table produced by
+    `to_frame` with `from_frame`.
+
+    Examples
+    --------
+    >>> climatology = Climatology.from_frame(pd.read_csv("data/kern_historical_climatology.csv"))
+    >>> climatology.slice("CA_244144", 69, 120, 126, "actual_et")
+    array([...])
+    """
+    def __init__(self, names: Iterable[str], capacity: int = 0) -> None:
+        self.names = list(names)
+
+        # private
+        self.__keys__: dict[tuple[Any, Any], int] = {}
+        # Only the first len(self) rows are in use.
+        self.__sums__ = np.zeros((len(self.names), capacity, DAYS), dtype=SUM_DTYPE)
+        self.__counts__ = np.zeros((len(self.names), capacity, DAYS), dtype=COUNT_DTYPE)
+        # Days with a row in the source table, even if every value is missing.
+        self.__present__ = np.zeros((capacity, DAYS), dtype=bool)
+        self.__means__: np.ndarray | None = None
+
+    def __len__(self) -> int:
+        return len(self.__keys__)
+
+    def __contains__(self, key: tuple[Any, Any]) -> bool:
+        return key in self.__keys__
+
+    @property
+    def keys(self) -> list[tuple[Any, Any]]:
+        """(field_id, crop) of each row, in row order."""
+        return list(self.__keys__)
+
+    def __grow__(self, keys: list[tuple[Any, Any]]) -> np.ndarray:
+        # Adds rows for keys not held yet and returns the row of every key.
+        new = [key for key in dict.fromkeys(keys) if key not in self.__keys__]
+        if len(new) > 0:
+            self.__reserve__(len(self.__keys__) + len(new))
+            for key in new:
+                self.__keys__[key] = len(self.__keys__)
+        return np.array([self.__keys__[key] for key in keys], dtype=np.int64)
+
+    def __reserve__(self, size: int) -> None:
+        # Reallocates at least double the capacity when size rows do not fit.
+        capacity = self.__present__.shape[0]
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity, 16)
+        used = len(self.__keys__)
+
+        sums = np.zeros((len(self.names), capacity, DAYS), dtype=SUM_DTYPE)
+        counts = np.zeros((len(self.names), capacity, DAYS), dtype=COUNT_DTYPE)
+        present = np.zeros((capacity, DAYS), dtype=bool)
+        sums[:, :used] = self.__sums__[:, :used]
+        counts[:, :used] = self.__counts__[:, :used]
+        present[:used] = self.__present__[:used]
+        self.__sums__, self.__counts__, self.__present__ = sums, counts, present
+
+    def __accumulate__(
+        self, rows: np.ndarray, doy: np.ndarray, values: dict[str, np.ndarray], names: list[str] | None = None
+    ) -> None:
+        # Adds values of each (row, day of year) pair to the running sums of names, every variable by default.
+        flat = rows * DAYS + (doy - 1)
+        for name in self.names if names is None else names:
+            position = self.names.index(name)
+            value = np.asarray(values[name], dtype=SUM_DTYPE)
+            valid = ~np.isnan(value)
+            np.add.at(self.__sums__[position].reshape(-1), flat[valid], value[valid])
+            np.add.at(self.__counts__[position].reshape(-1), flat[valid], 1)
+        self.__present__.reshape(-1)[flat] = True
+        self.__means__ = None
+
+    def add(self, field_id: Any, crop: Any, contents: dict[str, list[dict]]) -> None:
+        """
+        Adds the rows retrieved for one field, as passed to ETFetch's on_field.
+
+        Parameters
+        ----------
+        contents : dict
+            Rows of each variable, e.g. {'actual_et': [{'time': '2024-01-01', 'et': 1.2}, ...]}.
+        """
+        row = self.__grow__([(field_id, crop)])[0]
+        for name in self.names:
+            times, values = __unpack__(contents.get(name, []))
+            if len(times) == 0:
+                continue
+            doy = pd.DatetimeIndex(times).dayofyear.to_numpy()
+            self.__accumulate__(np.full(len(doy), row), doy, {name: values}, names=[name])
+
+    @classmethod
+    def from_history(cls, table: pd.DataFrame, names: Iterable[str]) -> "Climatology":
+        """Compiles the climatology of a historical table with 'field_id', 'crop', 'time' and a column per name."""
+        climatology = cls(names)
+        if len(table) == 0:
+            return climatology
+
+        rows = climatology.__grow__(list(zip(table['field_id'], table['crop'])))
+        doy = pd.to_datetime(table['time']).dt.dayofyear.to_numpy()
+        climatology.__accumulate__(rows, doy, {name: table[name].to_numpy(dtype=np.float64) for name in climatology.names})
+        return climatology
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame, names: Iterable[str] | None = None) -> "Climatology":
+        """
+        Reads a climatology table with 'field_id', 'crop', 'doy' and a column per variable, e.g. from `to_frame`.
+
+        Variables default to every other column. Each (field_id, crop, doy) is expected once.
+        """
+        names = [column for column in frame.columns if column not in ('field_id', 'crop', 'doy')] if names is None else names
+        climatology = cls(names)
+        if len(frame) == 0:
+            return climatology
+
+        rows = climatology.__grow__(list(zip(frame['field_id'], frame['crop'])))
+        climatology.__accumulate__(
+            rows, frame['doy'].to_numpy(dtype=np.int64), {name: frame[name].to_numpy(dtype=np.float64) for name in climatology.names}
+        )
+        return climatology
+
+    def means(self, variable: str) -> np.ndarray:
+        """Returns the (keys, 366) array of mean values of variable. Days without data are NaN."""
+        if self.__means__ is None:
+            used = len(self.__keys__)
+            sums, counts = self.__sums__[:, :used], self.__counts__[:, :used]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                self.__means__ = np.where(counts > 0, sums.astype(np.float64) / counts, np.nan)
+        return self.__means__[self.names.index(variable)]
+
+    def present(self) -> np.ndarray:
+        """Returns the (keys, 366) mask of days that had a row in the source, even if every value was missing."""
+        return self.__present__[:len(self.__keys__)]
+
+    def row(self, field_id: Any, crop: Any) -> int:
+        """Returns the row of (field_id, crop). Raises KeyError if it is not held."""
+        return self.__keys__[(field_id, crop)]
+
+    def rows(self, field_ids: Iterable, crops: Iterable) -> np.ndarray:
+        """Returns the row of every (field_id, crop) pair, or -1 where it is not held."""
+        query = pd.MultiIndex.from_arrays([list(field_ids), list(crops)])
+        if len(self.__keys__) == 0:
+            return np.full(len(query), -1, dtype=np.int64)
+        return pd.MultiIndex.from_tuples(self.keys).get_indexer(query).astype(np.int64)
+
+    def get(self, field_id: Any, crop: Any, variable: str) -> np.ndarray:
+        """Returns the 366 daily means of variable for (field_id, crop)."""
+        return self.means(variable)[self.row(field_id, crop)]
+
+    def slice(self, field_id: Any, crop: Any, start_doy: int, end_doy: int, variable: str) -> np.ndarray:
+        """Returns the daily means of variable from start_doy to end_doy inclusive. Empty if start_doy > end_doy."""
+        return self.means(variable)[self.row(field_id, crop), start_doy - 1:end_doy]
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Returns the climatology as a table of 'field_id', 'crop', 'doy' and a column per variable.
+
+        Matches `table.groupby(['field_id', 'crop', 'doy'])[names].mean().reset_index()` of the source table.
+        """
+        keys = self.keys
+        rows, days = np.nonzero(self.present())
+        frame = pd.DataFrame({
+            'field_id': [keys[row][0] for row in rows],
+            'crop': [keys[row][1] for row in rows],
+            'doy': days + 1,
+            **{name: self.means(name)[rows, days] for name in self.names},
+        })
+        return frame.sort_values(['field_id', 'crop', 'doy'], kind='stable').reset_index(drop=True)
+
+class Averages:
+    """
+    Mean of each variable per (field_id, crop) over one calendar year, e.g. year-to-date averages.
+
+    Parameters
+    ----------
+    names : list of str
+        Variables held, e.g. ['actual_et', 'actual_eto', 'actual_etof'].
+
+    year : int
+        Only rows dated in this year are averaged.
+
+    Notes
+    -----
+    Like Climatology, means are kept as running sums and counts, filled from a historical table with
+    `from_history` or field by field with `add`.
+    """
+    def __init__(self, names: Iterable[str], year: int) -> None:
+        self.names = list(names)
+        self.year = year
+
+        # private
+        self.__keys__: dict[tuple[Any, Any], int] = {}
+        self.__sums__: list[np.ndarray] = []
+        self.__counts__: list[np.ndarray] = []
+
+    def __len__(self) -> int:
+        return len(self.__keys__)
+
+    def __row__(self, key: tuple[Any, Any]) -> int:
+        if key not in self.__keys__:
+            self.__keys__[key] = len(self.__keys__)
+            self.__sums__.append(np.zeros(len(self.names)))
+            self.__counts__.append(np.zeros(len(self.names), dtype=np.int64))
+        return self.__keys__[key]
+
+    def add(self, field_id: Any, crop: Any, contents: dict[str, list[dict]]) -> None:
+        """Adds the rows retrieved for one field, as passed to ETFetch's on_field."""
+        prefix = f"{self.year}-"
+        row = None
+        for position, name in enumerate(self.names):
+            times, values = __unpack__(contents.get(name, []))
+            in_year = np.array([time.startswith(prefix) for time in times], dtype=bool)
+            if not in_year.any():
+                continue
+
+            row = self.__row__((field_id, crop)) if row is None else row
+            values = values[in_year]
+            valid = ~np.isnan(values)
+            self.__sums__[row][position] += values[valid].sum()
+            self.__counts__[row][position] += valid.sum()
+
+    @classmethod
+    def from_history(cls, table: pd.DataFrame, names: Iterable[str], year: int) -> "Averages":
+        """Averages the rows of a historical table dated in year."""
+        averages = cls(names, year)
+        table = table.loc[pd.to_datetime(table['time']).dt.year == year]
+        grouped = table.groupby(['field_id', 'crop'], sort=False)[averages.names]
+        sums, counts = grouped.sum(), grouped.count()
+        for key, row_sums, row_counts in zip(sums.index, sums.to_numpy(dtype=np.float64), counts.to_numpy(dtype=np.int64)):
+            row = averages.__row__(key)
+            averages.__sums__[row] += row_sums
+            averages.__counts__[row] += row_counts
+        return averages
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Returns the averages as a table of 'field_id', 'crop' and a column per variable.
+
+        Matches `table[table['time'].dt.year == year].groupby(['field_id', 'crop'])[names].mean().reset_index()`.
+        """
+        keys = list(self.__keys__)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            means = np.array([sums / counts for sums, counts in zip(self.__sums__, self.__counts__)]).reshape(-1, len(self.names))
+        frame = pd.DataFrame({
+            'field_id': [key[0] for key in keys],
+            'crop': [key[1] for key in keys],
+            **{name: means[:, position] for position, name in enumerate(self.names)},
+        })
+        return frame.sort_values(['field_id', 'crop'], kind='stable').reset_index(drop=True)
@@ -0,0 +1,72 @@
+import gzip
+import json
+
+from typing import IO, Any
+
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+def decompress(content: bytes | IO[bytes]) -> bytes:
+    """Decompresses a gzip body into bytes without decoding it to text.
+
+    Parameters
+    ----------
+    content : bytes, or binary file-like object
+        Response body. Bytes that are not gzipped are returned unchanged. File-like objects such as
+        `Response.raw` must be gzipped, and are decompressed as they are read, so the compressed body
+        is never held in memory.
+
+    Returns
+    -------
+    bytes
+        Decompressed body, held whole as the JSON parsers need it.
+    """
+    if isinstance(content, (bytes, bytearray, memoryview)):
+        if bytes(content[:2]) != GZIP_MAGIC:
+            return bytes(content)
+        return gzip.decompress(content)
+
+    with gzip.GzipFile(fileobj=content) as stream:
+        return stream.read()
+
+def loads(content: bytes | IO[bytes]) -> Any:
+    """Parses a possibly gzipped JSON body.
+
+    Uses orjson when installed, which parses bytes directly without an intermediate string.
+    """
+    body = decompress(content)
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+def records_frame(content: bytes | IO[bytes], columns: list[str] | None = None) -> pd.DataFrame:
+    """Parses a possibly gzipped JSON list of records into a DataFrame.
+
+    Parameters
+    ----------
+    content : bytes, or binary file-like object
+        Response body containing a list of dict.
+    columns : list of str, default None
+        Columns to keep. Every key found in any record, in order of first appearance, if None.
+
+    Returns
+    -------
+    DataFrame
+        One column per key, built column by column rather than row by row.
+    """
+    records = loads(content)
+    if len(records) == 0:
+        return pd.DataFrame(columns=columns)
+
+    # Records may hold different keys, e.g. crop_YYYY columns missing from some fields, as with from_records.
+    keys = columns or list(dict.fromkeys(key for record in records for key in record))
+    data = {key: [record.get(key) for record in records] for key in keys}
+    # Release the object graph before the DataFrame copies the columns.
+    del records
+    return pd.DataFrame(data, columns=keys)
@@ -2,4 +2,6 @@ class ETException(Exception): ...
 
 class MemoryLimitException(Exception): ...
 
-class PairValueError(ValueError): ...
\ No newline at end of file
+class PairValueError(ValueError): ...
+
+class QuotaExceededException(Exception): ...
\ No newline at end of file
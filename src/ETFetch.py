@@ -1,14 +1,24 @@
 from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from datetime import datetime
-from .ETRequest import ETRequest
+from .ETLimiter import RateLimiter
+from .ETPackets import CSVPackets, ParquetPackets, open_packets
+from .ETRequest import Request
 from .ETArg import ETArg
+from .ETDecode import records_frame
+from .ETReference import Reference
 from pathlib import Path
-from typing import Any
+from requests import Session
+from typing import Any, Callable
 
 import json
 import logging
 import pandas as pd
 
+GEODATABASE_TIMESERIES = "https://developer.openet-api.org/geodatabase/timeseries"
+# Fields dispatched but not yet stored, per worker. Bounds the fields held in memory behind a slow one.
+REORDER_LIMIT = 4
+
 class ETFetch:
     """
     OpenET data retrieval configuration. 
@@ -18,9 +28,10 @@ class ETFetch:
     fields_queue : deque
         Queue of fields that are to be processed. 
             
-    points_ref : dict, or DataFrame
+    points_ref : dict, DataFrame, or Reference
         Collection of points that are referenced for the fields. 
         Must contain key or column for USDA Cropland Data Layer and proper WKT formatted coordinates '.geo' column.
+        A Reference parses '.geo' once and can be shared by many ETFetch, e.g. one per forecast date.
         
     api_key : str
         User API key for OpenET API. User restrictions apply.
@@ -28,8 +39,9 @@ class ETFetch:
     See Also
     --------
     start : Begin gathering ET data from listed arguments.
+    start_bulk : Gather ET data for many fields per request from the geodatabase.
     export : Export data in provided file format. CSV by default. Passes kwargs to matching pandas export function.
-    ETRequest : ET API Request Handling.
+    Request : ET API Request Handling.
     collections.deque : Thread-safe, memory efficient appends and pops from either side.
     
     Notes
@@ -54,33 +66,221 @@ class ETFetch:
         self.__start_time__ = datetime.now()
         self.__timestamp__ = self.__start_time__.strftime('%Y%m%d_%H%M%S')
         self.__temp_bin__ = f'data/bin/{self.__timestamp__}/'
+        self.__packet_format__ = 'csv'
 
-    def __compile_packets__(self) -> None:
-        # Create empty tables for each column name. Will all be merged at the end.
-        tables = [pd.DataFrame(columns=['field_id', 'crop', 'time', name]) for name in self.__names__]
-        # Iterate through each column name first
-        for item in range(0, len(self.__names__)):
-            name = self.__names__[item]
-            # Collect list of files whose name contains the current column name
-            files = Path(self.__temp_bin__).glob(f'*.{name}.csv')
-
-            # Iterate through each file through Generator iterator
-            for file in files:
-                # e.g. CA_270812.27.actual_eto.csv
-                # becomes ['CA_270812', '27', 'actual_eto', 'csv']
-                parts = str(file.name).split('.')
-                # Contains [time, {variable}]
-                data = pd.read_csv(file, header=0, names=['time', name])
-                data['field_id'] = parts[0]
-                data['crop'] = int(parts[1])
-                tables[item] = pd.concat([data, tables[item]], ignore_index=True)
-
-        self.__merge__(tables=tables)
+    def __compile_packets__(self, packets: CSVPackets | ParquetPackets | None = None) -> None:
+        store = packets or open_packets(self.__temp_bin__, self.__names__, self.__packet_format__)
+        self.__merge__(tables=store.compile())
 
     def __merge__(self, *, tables) -> None:
-        for table in tables:
-            # Conducts full outer joins to preserve time column not always overlapping.
-            self.data_table = self.data_table.merge(table, on=['field_id', 'crop', 'time'], how='outer')
+        keys = ['field_id', 'crop', 'time']
+        if len(tables) == 0:
+            return
+
+        # Single outer join on the key columns preserves time values not always overlapping between tables.
+        joined = pd.concat([table.set_index(keys) for table in tables], axis=1, join='outer')
+        joined = joined.sort_index().reset_index()
+
+        if self.data_table.empty:
+            self.data_table = joined
+        else:
+            self.data_table = self.data_table.merge(joined, on=keys, how='outer')
+
+    def __crop__(self, field_id: Any, crop_col: str) -> Any:
+        if isinstance(self.points_ref, Reference):
+            return self.points_ref.crop(field_id, crop_col)
+        return self.points_ref[crop_col][field_id]
+
+    def __geometry__(self, field_id: Any) -> Any:
+        # Prepared references are not parsed again.
+        if isinstance(self.points_ref, Reference):
+            return self.points_ref.geometry(field_id)
+        return json.loads(self.points_ref['.geo'][field_id])['coordinates']
+
+    def __build_request__(self, req: ETArg, geometry: Any, frequency: str) -> dict:
+        arg = {
+            "geometry": geometry,
+            "variable": req.variable,
+            "file_format": "JSON"
+        }
+        arg['align'] = req.align
+        arg['model'] = req.model
+        arg['units'] = req.units
+        arg['reference_et'] = req.reference
+        # Below are optional fields. Included only if they exist
+        if req.date_range:
+            arg['date_range'] = req.date_range
+        if req.reducer:
+            arg['reducer'] = req.reducer
+        if req.match_variable:
+            arg['match_variable'] = req.match_variable
+        if req.match_window:
+            arg['match_window'] = req.match_window
+        if req.cog:
+            arg['cog'] = req.cog
+        if req.encrypt:
+            arg['encrypt'] = req.encrypt
+
+        if frequency:
+            arg['interval'] = frequency
+
+        return arg
+
+    def __group_args__(self, request_args: list[ETArg], frequency: str) -> list[list[int]]:
+        # Groups indices of ETArg whose requests only differ by variable.
+        groups: dict[str, list[int]] = {}
+        for index, req in enumerate(request_args):
+            arg = self.__build_request__(req, None, frequency)
+            arg.pop('variable')
+            key = json.dumps([req.endpoint, arg], sort_keys=True, default=str)
+            groups.setdefault(key, []).append(index)
+
+        return list(groups.values())
+
+    def __templates__(self, request_args: list[ETArg], frequency: str, coalesce: bool) -> tuple[list[list[int]], list[dict]]:
+        # Indices of request_args sent together as one request. Each ETArg is its own request unless coalescing.
+        if coalesce:
+            groups = self.__group_args__(request_args, frequency)
+        else:
+            groups = [[index] for index in range(len(request_args))]
+
+        # Request parameters of each group without the geometry, built once and copied per field.
+        templates = []
+        for group in groups:
+            template = self.__build_request__(request_args[group[0]], None, frequency)
+            if len(group) > 1:
+                template.pop('variable')
+                template['variables'] = [request_args[index].variable for index in group]
+            templates.append(template)
+
+        return groups, templates
+
+    def __contents__(
+        self,
+        field_id: Any,
+        results: list[Request],
+        groups: list[list[int]],
+        request_args: list[ETArg],
+        logger: logging.Logger | None = None,
+    ) -> dict[str, list[dict]] | None:
+        # Decodes every response of a field by ETArg name. None if any request failed.
+        if False in [item.success() for item in results]:
+            return None
+
+        contents: dict[str, list[dict]] = {}
+        try:
+            for group, res in zip(groups, results):
+                assert res.response
+                # Data returns as a list containing dict{'time': str, '$variable': float}
+                content: list[dict] = json.loads(res.response.content.decode('utf-8'))
+                contents.update(self.__split_response__(content, [request_args[index] for index in group]))
+        except KeyError as err:
+            if logger:
+                logger.warning(f"Field {field_id}: {err}")
+            return None
+
+        return contents
+
+    def __split_response__(self, content: list[dict], reqs: list[ETArg]) -> dict[str, list[dict]]:
+        # Fans a response out to each ETArg it was requested for.
+        if len(reqs) == 1:
+            return {reqs[0].name: content}
+
+        split = {}
+        for req in reqs:
+            # Multi-variable responses contain dict{'time': str, '$variable': float, ...}
+            keys = [key for key in (content[0] if content else {}) if key.lower() == req.variable.lower()]
+            if len(content) > 0 and len(keys) == 0:
+                raise KeyError(f"Response does not contain variable {req.variable}.")
+            split[req.name] = [{'time': item['time'], keys[0]: item[keys[0]]} for item in content]
+
+        return split
+
+    def __append_columns__(self, column: dict[str, list], name: str, field_id: Any, crop: Any, content: list[dict]) -> None:
+        if len(content) == 0:
+            return
+
+        # item: {'time': str, '$variable': float}
+        value_key = [key for key in content[0] if key != 'time'][0]
+        column['field_id'].extend([field_id] * len(content))
+        column['crop'].extend([crop] * len(content))
+        column['time'].extend([item['time'] for item in content])
+        column[name].extend([item[value_key] for item in content])
+
+    def __finish__(
+        self,
+        store: CSVPackets | ParquetPackets | None,
+        columns: list[dict[str, list]],
+        failed_fields: int,
+        logger: logging.Logger | None = None,
+    ) -> int:
+        # Produces data table depending on if this process enabled packets.
+        if store:
+            self.__compile_packets__(store)
+        else:
+            self.__merge__(tables=[pd.DataFrame(column) for column in columns])
+
+        if logger:
+            self.__end_time__ = datetime.now()
+            time_elapsed = (self.__end_time__ - self.__start_time__)
+            logger.info(f"Finished processing. {str(failed_fields)} fields failed. Elapsed time: {str(time_elapsed)}")
+        return failed_fields
+
+    def __build_bulk_request__(self, req: ETArg, field_ids: list[str], frequency: str) -> dict:
+        arg = {
+            "field_ids": field_ids,
+            "models": [req.model],
+            "variables": [req.variable],
+            "file_format": "JSON",
+        }
+        if req.date_range:
+            arg['date_range'] = req.date_range
+        if frequency:
+            arg['interval'] = frequency
+
+        return arg
+
+    @staticmethod
+    def __geodatabase_id__(field_id: str) -> str:
+        # Reference IDs e.g. CA_270812 are stored as 06270812 in the geodatabase.
+        if isinstance(field_id, str) and field_id.startswith('CA_'):
+            return '06' + field_id[3:]
+        return str(field_id)
+
+    def __split_bulk_response__(self, content: bytes, req: ETArg, id_map: dict[str, Any]) -> dict[Any, list[dict]]:
+        # Geodatabase responses are gzipped lists of dict{'field_id': str, 'time': str, 'value_mm': float, ...}
+        records = records_frame(content)
+        if len(records) == 0:
+            return {}
+
+        value_col = [col for col in records.columns if col.startswith('value')][0]
+        key = req.variable.lower()
+        rows = {}
+        for field_id, data in records.groupby('field_id', sort=False):
+            if str(field_id) not in id_map:
+                continue
+            rows[id_map[str(field_id)]] = [
+                {'time': time, key: value} for time, value in zip(data['time'], data[value_col])
+            ]
+
+        return rows
+
+    def __request__(
+        self,
+        req: ETArg,
+        arg: dict,
+        logger: logging.Logger | None = None,
+        session: Session | None = None,
+        limiter: RateLimiter | None = None,
+        endpoint: str | None = None,
+    ) -> Request:
+        # Runs inside a worker thread. Sends one request and hands it back to the dispatcher.
+        response = Request(
+            endpoint or req.endpoint, arg, key=self.__api_key__, logger=logger, session=session, limiter=limiter
+        )
+        response.send()
+
+        return response
 
     def set_api_key(self, api_key: str) -> None:
         self.__api_key__ = api_key
@@ -126,7 +326,13 @@ class ETFetch:
             request_args: list[ETArg], 
             frequency: str, 
             packets: bool = True,
+            packet_format: str = 'csv',
             crop_col: str = 'CROP_2023',
+            max_workers: int = 1,
+            session: Session | None = None,
+            limiter: RateLimiter | None = None,
+            coalesce: bool = False,
+            on_field: Callable[[Any, Any, dict[str, list[dict]]], None] | None = None,
             logger: logging.Logger | None = None) -> int:
         """
         Begin gathering ET data from listed arguments.
@@ -145,9 +351,38 @@ class ETFetch:
             If False, all data is stored in memory and compiled into a single pandas DataFrame at the end of retrieval.
             If retrieving large amounts of data, default True is recommended.
             
+        packet_format : str, default 'csv'
+            Storage used for packets. 'csv' writes one file per ETArg per field.
+            'parquet' appends fields as row groups to a Parquet dataset partitioned by ETArg name and requires pyarrow.
+            A resumed run must use the same packet_format as the original run.
+            
         crop_col : str, default 'CROP_2023'
             Name of column used to reference USDA's Cropland Data Layer code.
             
+        max_workers : int, default 1
+            Maximum number of requests kept in flight at once. Requests for a field are always dispatched together,
+            so at least one field is in flight even if it has more ETArg than max_workers.
+            Default 1 retrieves fields sequentially.
+            
+        session : requests.Session, default None
+            Session whose connection pool is used for every request. If None, the shared session from
+            `ETRequest.get_session` is used. Use `ETRequest.create_session` with `pool_maxsize` of at least
+            max_workers so every worker keeps its connection alive.
+            
+        limiter : RateLimiter, default None
+            Rate limiter every request draws from before it is sent. If None, the limiter installed with
+            `ETLimiter.set_limiter` is used, if any.
+            
+        coalesce : bool, default False
+            If True, ETArg sharing endpoint, date range, interval and every other parameter but variable are sent as
+            one request with `variables` listing each variable. Responses are split back into each ETArg's column by
+            matching the variable name. Only enable for endpoints that accept `variables`.
+            
+        on_field : callable, default None
+            Called with the field ID, crop and the rows retrieved for each ETArg name, e.g. {'actual_et': [{'time': ..., 'et': ...}]},
+            once a field succeeds. Lets aggregates such as a Climatology be accumulated while fields arrive.
+            Fields skipped because their packets already exist are not passed.
+            
         logger : logging.Logger, default None
             If logger is provided, logs request success and failure activity.
             Recommended for debugging.
@@ -168,6 +403,12 @@ class ETFetch:
         
         If a request for a field fails, the entire field is discarded regardless if other requests succeeded.
         
+        If a ResponseCache is installed with `ETRequest.set_cache`, requests already answered are served from disk.
+        
+        Fields are stored in the order they were taken from `fields_queue`. At most REORDER_LIMIT * max_workers fields
+        are dispatched but not yet stored, so a slow field holds back a bounded number of others. If retrieval is
+        interrupted, fields still in flight are returned to the front of `fields_queue`.
+        
         Examples
         --------
         Start data fetch from constructor
@@ -184,112 +425,262 @@ class ETFetch:
         >>> e = ETFetch(fields_queue = deque(df['fields']), points_ref = df, api_key = 'xxxxxx...')
         >>> e.start(request_args = [arg], frequency = 'monthly')
         """
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1.")
+
         failed_fields = 0
-        tables = [pd.DataFrame(columns=['field_id', 'crop', 'time', item.name]) for item in request_args]
+        # In-memory columns for each ETArg when packets are disabled. Materialized once retrieval ends.
+        columns: list[dict[str, list]] = [
+            {'field_id': [], 'crop': [], 'time': [], item.name: []} for item in request_args
+        ]
+        self.__names__ = [item.name for item in request_args]
 
-        while (len(self.fields_queue) == 0) is False:
-            current_field_id = self.fields_queue[0]
-            current_point_coordinates = json.loads(self.points_ref['.geo'][current_field_id])['coordinates']
-            current_crop = self.points_ref[crop_col][current_field_id]
+        # Path used for data dumping uses timestamp of initial program run.
+        # Or if a continued run, starts where it left off.
+        path = Path(self.__temp_bin__)
+        # Check if data bin exists, if not then create it
+        if path.exists() is False:
+            path.mkdir(parents=True)
+        self.__packet_format__ = packet_format
+        store = open_packets(path, self.__names__, packet_format) if packets else None
 
-            # Creates container to track each request to be made.
-            results: list[ETRequest] = [ETRequest() for item in request_args]
-            self.__names__ = [item.name for item in request_args]
-            
-            # Path used for data dumping uses timestamp of initial program run.
-            # Or if a continued run, starts where it left off.
-            path = Path(self.__temp_bin__)
-            # Check if data bin exists, if not then create it
-            if path.exists() is False:
-                path.mkdir(parents=True)
-            
-            if len(list(path.glob(f'{current_field_id}.{current_crop}.*'))) == len(self.__names__):
+        groups, templates = self.__templates__(request_args, frequency, coalesce)
+
+        # Fields whose requests have been submitted but not yet stored.
+        # Each entry is (field_id, crop, [Future of Request]) in dispatch order.
+        in_flight: list[tuple[Any, Any, list[Future]]] = []
+        # Requests still running. Finished fields wait in in_flight until those dispatched before them are stored.
+        pending: set[Future] = set()
+
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            while len(self.fields_queue) > 0 or len(in_flight) > 0:
+                # Keep up to max_workers requests in flight. A field is always dispatched when nothing is running.
+                # Dispatching pauses once REORDER_LIMIT * max_workers fields wait to be stored.
+                while len(self.fields_queue) > 0 and len(in_flight) < REORDER_LIMIT * max_workers and (
+                    len(pending) == 0 or len(pending) + len(groups) <= max_workers
+                ):
+                    current_field_id = self.fields_queue[0]
+                    current_crop = self.__crop__(current_field_id, crop_col)
+
+                    if store and store.completed(current_field_id, current_crop):
+                        if logger:
+                            logger.info(f"Field {current_field_id} already exists. Skipping...")
+                        self.fields_queue.popleft()
+                        continue
+
+                    if logger:
+                        logger.info(f"Now analyzing field ID {current_field_id}")
+                    current_point_coordinates = self.__geometry__(current_field_id)
+
+                    # Conduct request posts
+                    futures = []
+                    for group, template in zip(groups, templates):
+                        arg = {**template, 'geometry': current_point_coordinates}
+                        futures.append(executor.submit(self.__request__, request_args[group[0]], arg, logger, session, limiter))
+                    in_flight.append((current_field_id, current_crop, futures))
+                    pending.update(futures)
+                    self.fields_queue.popleft()
+
+                if len(pending) > 0:
+                    pending = wait(pending, return_when=FIRST_COMPLETED).not_done
+
+                # Store fields in dispatch order once every one of their requests has finished.
+                while len(in_flight) > 0 and all(future.done() for future in in_flight[0][2]):
+                    current_field_id, current_crop, futures = in_flight.pop(0)
+                    results: list[Request] = [future.result() for future in futures]
+
+                    contents = self.__contents__(current_field_id, results, groups, request_args, logger)
+
+                    if contents is not None:
+                        for entry in range(0, len(request_args)):
+                            name = request_args[entry].name
+                            content = contents[name]
+
+                            # Begin nth-field data composition
+                            if store is None:
+                                self.__append_columns__(columns[entry], name, current_field_id, current_crop, content)
+                            # End nth-field data composition
+
+                        if store:
+                            # Packets are written only once every ETArg for the field succeeded.
+                            store.write(current_field_id, current_crop, contents)
+
+                        if on_field:
+                            on_field(current_field_id, current_crop, contents)
+
+                        if logger:
+                            logger.info(f"Field {current_field_id} successful")
+
+                    else:
+                        if logger:
+                            logger.warning(f"Analyzing for {current_field_id} failed")
+                        failed_fields+=1
+
+                    if logger:
+                        logger.info(f"{str(len(self.fields_queue) + len(in_flight))} fields remaining")
+        except BaseException:
+            # Return unfinished fields to the front of the queue so an interrupted run can be resumed.
+            for current_field_id, _, futures in reversed(in_flight):
+                for future in futures:
+                    future.cancel()
+                self.fields_queue.appendleft(current_field_id)
+            raise
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            if store:
+                # Finalizes stored fields so an interrupted run can be resumed.
+                store.close()
+
+        return self.__finish__(store, columns, failed_fields, logger)
+
+    def start_bulk(self, *,
+            request_args: list[ETArg],
+            frequency: str,
+            chunk_size: int = 500,
+            endpoint: str = GEODATABASE_TIMESERIES,
+            packets: bool = True,
+            packet_format: str = 'csv',
+            crop_col: str = 'CROP_2023',
+            max_workers: int = 1,
+            session: Session | None = None,
+            limiter: RateLimiter | None = None,
+            on_field: Callable[[Any, Any, dict[str, list[dict]]], None] | None = None,
+            logger: logging.Logger | None = None) -> int:
+        """
+        Gather ET data for many fields per request from the geodatabase timeseries endpoint.
+
+        Parameters
+        ----------
+        request_args : Iterable of ETArg
+            Iterable container of ETArg. Only name, variable, model and date_range are used as the geodatabase
+            looks fields up by ID rather than geometry. ETArg.endpoint is ignored.
+
+        frequency : str
+            Accepts 'daily' or 'monthly'. Applied to all requests.
+
+        chunk_size : int, default 500
+            Number of field IDs sent in each request.
+
+        endpoint : str, default GEODATABASE_TIMESERIES
+            Geodatabase timeseries endpoint.
+
+        packets, packet_format, crop_col, max_workers, session, limiter, on_field, logger
+            Same as `start`. max_workers counts chunk requests rather than fields.
+
+        Returns
+        -------
+        int
+            Number of fields that failed to be retrieved.
+
+        See Also
+        --------
+        start : Retrieves one field per request from the endpoint in each ETArg.
+
+        Notes
+        -----
+        `fields_queue` IDs in the reference format, e.g. CA_270812, are sent in the geodatabase format, e.g. 06270812.
+        The resulting `data_table` has the same schema as `start`.
+
+        If a chunk request fails, or a field is missing from a response, those fields are counted as failed.
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1.")
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1.")
+
+        failed_fields = 0
+        columns: list[dict[str, list]] = [
+            {'field_id': [], 'crop': [], 'time': [], item.name: []} for item in request_args
+        ]
+        self.__names__ = [item.name for item in request_args]
+
+        path = Path(self.__temp_bin__)
+        if path.exists() is False:
+            path.mkdir(parents=True)
+        self.__packet_format__ = packet_format
+        store = open_packets(path, self.__names__, packet_format) if packets else None
+
+        # Fields not yet stored, in queue order.
+        pending: list[tuple[Any, Any]] = []
+        while len(self.fields_queue) > 0:
+            current_field_id = self.fields_queue.popleft()
+            current_crop = self.__crop__(current_field_id, crop_col)
+            if store and store.completed(current_field_id, current_crop):
                 if logger:
                     logger.info(f"Field {current_field_id} already exists. Skipping...")
-                self.fields_queue.popleft()
                 continue
-            
-            if logger:
-                logger.info(f"Now analyzing field ID {current_field_id}")
-            # Conduct request posts
-            for index in range(0, len(request_args)):
-                req = request_args[index]
-                arg = {
-                    "geometry": current_point_coordinates,
-                    "variable": req.variable,
-                    "file_format": "JSON"
-                }
-                arg['align'] = req.align
-                arg['model'] = req.model
-                arg['units'] = req.units
-                arg['reference_et'] = req.reference
-                # Below are optional fields. Included only if they exist
-                if req.date_range:
-                    arg['date_range'] = req.date_range
-                if req.reducer:
-                    arg['reducer'] = req.reducer
-                if req.match_variable:
-                    arg['match_variable'] = req.match_variable
-                if req.match_window:
-                    arg['match_window'] = req.match_window
-                if req.cog:
-                    arg['cog'] = req.cog
-                if req.encrypt:
-                    arg['encrypt'] = req.encrypt
-
-                if frequency:
-                    arg['interval'] = frequency
-
-                response = ETRequest(req.endpoint, arg, key=self.__api_key__)
-                response.send(logger=logger)
-
-                results[index] = response
-            # End conduct request posts
-
-            # There is no failed responses
-            if False not in [item.success() for item in results]:
-                for entry in range(0, len(results)):
-                    res = results[entry]
-                    assert res.response
-                    name = request_args[entry].name
-                    # Data returns as a list containing dict{'time': str, '$variable': float}
-                    content: list[dict] = json.loads(res.response.content.decode('utf-8'))
-
-                    # Begin nth-field data composition
-                    if packets:
-                        # Converts decoded JSON string to DataFrame, then exports as csv file
-                        # Filename e.g. CA_270812.27.actual_eto.csv
-                        prospective_file_output = f'{path}/{current_field_id}.{current_crop}.{name}.csv'
-                        pd.json_normalize(content).to_csv(prospective_file_output, index=False)
-                    else:
-                        # item: {'time': str, '$variable': float}
-                        for item in content:
-                            tables[entry] = pd.concat(
-                                [pd.DataFrame(
-                                    [[current_field_id, current_crop, item['time'], item[list(item.keys())[1]]]],
-                                    columns=tables[entry].columns), tables[entry]], ignore_index=True)
-                    # End nth-field data composition
+            pending.append((current_field_id, current_crop))
 
-                if logger:
-                    logger.info("Successful")
+        chunks = [pending[index:index + chunk_size] for index in range(0, len(pending), chunk_size)]
+        processed = 0
+
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            # One request per chunk per ETArg. Chunks are stored in order as their requests finish.
+            futures = [
+                [
+                    executor.submit(
+                        self.__request__,
+                        req,
+                        self.__build_bulk_request__(req, [self.__geodatabase_id__(field) for field, _ in chunk], frequency),
+                        logger,
+                        session,
+                        limiter,
+                        endpoint,
+                    )
+                    for req in request_args
+                ]
+                for chunk in chunks
+            ]
 
-            else:
+            for chunk, chunk_futures in zip(chunks, futures):
+                results: list[Request] = [future.result() for future in chunk_futures]
                 if logger:
-                    logger.warning(f"Analyzing for {current_field_id} failed")
-                failed_fields+=1
+                    logger.info(f"Now analyzing {len(chunk)} fields starting at {chunk[0][0]}")
 
-            self.fields_queue.popleft()
-            if logger:
-                logger.info(f"{str(len(self.fields_queue))} fields remaining")
+                # Per ETArg, rows of each field keyed by its reference ID.
+                by_field: list[dict[Any, list[dict]]] = []
+                if False not in [item.success() for item in results]:
+                    id_map = {self.__geodatabase_id__(field): field for field, _ in chunk}
+                    for req, res in zip(request_args, results):
+                        assert res.response
+                        by_field.append(self.__split_bulk_response__(res.response.content, req, id_map))
 
-        # Produces data table depending on if this process enabled packets.
-        if packets:
-            self.__compile_packets__()
-        else:
-            self.__merge__(tables=tables)
+                for current_field_id, current_crop in chunk:
+                    contents = {
+                        req.name: rows[current_field_id]
+                        for req, rows in zip(request_args, by_field)
+                        if current_field_id in rows
+                    }
+                    if len(by_field) == 0 or len(contents) < len(request_args):
+                        if logger:
+                            logger.warning(f"Analyzing for {current_field_id} failed")
+                        failed_fields+=1
+                        continue
 
-        if logger:
-            self.__end_time__ = datetime.now()
-            time_elapsed = (self.__end_time__ - self.__start_time__)
-            logger.info(f"Finished processing. {str(failed_fields)} fields failed. Elapsed time: {str(time_elapsed)}")
-        return failed_fields
\ No newline at end of file
+                    if store:
+                        store.write(current_field_id, current_crop, contents)
+                    else:
+                        for entry in range(0, len(request_args)):
+                            name = request_args[entry].name
+                            self.__append_columns__(columns[entry], name, current_field_id, current_crop, contents[name])
+
+                    if on_field:
+                        on_field(current_field_id, current_crop, contents)
+
+                processed += 1
+                if logger:
+                    logger.info(f"{str(sum(len(chunk) for chunk in chunks[processed:]))} fields remaining")
+        except BaseException:
+            # Return fields of unfinished chunks to the front of the queue so an interrupted run can be resumed.
+            for chunk in reversed(chunks[processed:]):
+                for current_field_id, _ in reversed(chunk):
+                    self.fields_queue.appendleft(current_field_id)
+            raise
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            if store:
+                store.close()
+
+        return self.__finish__(store, columns, failed_fields, logger)
@@ -0,0 +1,216 @@
+import hashlib
+import json
+import os
+
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from shapely.geometry import LineString
+
+# Simplification applied by simplification_from_config when ET_SIMPLIFY_GEOMETRY is set.
+# Tolerance in degrees. About 1 m.
+TOLERANCE = 1e-5
+# Decimal places kept. About 10 cm.
+PRECISION = 6
+# Vertices kept per geometry.
+MAX_VERTICES = 1000
+
+# Tolerance max_vertices starts from when none is given, and times it is doubled before giving up.
+MIN_TOLERANCE = 1e-7
+MAX_STEPS = 24
+
+def __flat__(geometry: dict[str, Any]) -> bool:
+    # '.geo' holds every ring of a feature back to back in one list, as written by polygon_fetch.
+    # Polygons as [x1, y1, x2, y2, ...] and MultiPolygons as [[x1, y1], [x2, y2], ...].
+    coordinates = geometry["coordinates"]
+    if len(coordinates) == 0:
+        return False
+    if geometry["type"] == "Polygon":
+        return not isinstance(coordinates[0], list)
+    if geometry["type"] == "MultiPolygon":
+        return not isinstance(coordinates[0][0], list)
+    return False
+
+def __split__(points: np.ndarray) -> list[np.ndarray]:
+    # Splits rings stored back to back. Each ring ends on the vertex it started from.
+    rings, start = [], 0
+    for position in range(3, len(points)):
+        if position - start >= 3 and points[position][0] == points[start][0] and points[position][1] == points[start][1]:
+            rings.append(points[start:position + 1])
+            start = position + 1
+    if start < len(points):
+        rings.append(points[start:])
+    return rings
+
+def __rings__(geometry: dict[str, Any]) -> list[np.ndarray] | None:
+    match geometry["type"]:
+        case "Polygon" | "MultiPolygon" if __flat__(geometry):
+            return __split__(np.asarray(geometry["coordinates"], dtype=float).reshape(-1, 2))
+        case "Polygon":
+            return [np.asarray(ring, dtype=float) for ring in geometry["coordinates"]]
+        case "MultiPolygon":
+            return [np.asarray(ring, dtype=float) for polygon in geometry["coordinates"] for ring in polygon]
+        case _:
+            return None
+
+def __rebuild__(geometry: dict[str, Any], rings: list[np.ndarray]) -> list:
+    if __flat__(geometry):
+        points = np.concatenate(rings)
+        return points.ravel().tolist() if geometry["type"] == "Polygon" else points.tolist()
+    if geometry["type"] == "Polygon":
+        return [ring.tolist() for ring in rings]
+
+    # Regroup rings into the polygons they came from.
+    coordinates, start = [], 0
+    for polygon in geometry["coordinates"]:
+        coordinates.append([ring.tolist() for ring in rings[start:start + len(polygon)]])
+        start += len(polygon)
+    return coordinates
+
+def __simplify_ring__(ring: np.ndarray, tolerance: float) -> np.ndarray:
+    # Simplified as a line so the closing vertex is kept and invalid rings cannot fail.
+    simplified = np.asarray(LineString(ring).simplify(tolerance, preserve_topology=False).coords)
+    return simplified if len(simplified) >= 4 else ring
+
+def simplify_geometry(
+    geometry: dict[str, Any],
+    tolerance: float | None = None,
+    precision: int | None = None,
+    max_vertices: int | None = None,
+) -> dict[str, Any]:
+    """
+    Simplifies a polygon and rounds its coordinates to shrink request payloads.
+
+    Parameters
+    ----------
+    geometry : dict
+        GeoJSON geometry. Coordinates may also be the flattened rings used in '.geo', i.e. [x1, y1, x2, y2, ...]
+        for Polygons and [[x1, y1], [x2, y2], ...] for MultiPolygons.
+    tolerance : float, default None
+        Distance in degrees a simplified ring may move from the original. Not simplified if None.
+    precision : int, default None
+        Decimal places coordinates are rounded to. Not rounded if None.
+    max_vertices : int, default None
+        Vertices kept per geometry. The tolerance is doubled until the geometry fits. If it never fits, the
+        smallest simplification found is kept. Uncapped if None.
+
+    Returns
+    -------
+    dict
+        Geometry with coordinates in the same form as provided. Points are only rounded.
+    """
+    rings = __rings__(geometry)
+
+    if rings is None:
+        coordinates = geometry["coordinates"]
+        if precision is not None:
+            coordinates = np.round(np.asarray(coordinates, dtype=float), precision).tolist()
+        return {**geometry, "coordinates": coordinates}
+
+    simplified = [__simplify_ring__(ring, tolerance) for ring in rings] if tolerance else rings
+
+    if max_vertices is not None and sum(len(ring) for ring in simplified) > max_vertices:
+        # Rings too small to simplify are kept whole, so a larger tolerance can end up with more vertices.
+        step = tolerance or MIN_TOLERANCE
+        for _ in range(MAX_STEPS):
+            step *= 2
+            attempt = [__simplify_ring__(ring, step) for ring in rings]
+            if sum(len(ring) for ring in attempt) < sum(len(ring) for ring in simplified):
+                simplified = attempt
+            if sum(len(ring) for ring in simplified) <= max_vertices:
+                break
+
+    if precision is not None:
+        simplified = [np.round(ring, precision) for ring in simplified]
+
+    return {**geometry, "coordinates": __rebuild__(geometry, simplified)}
+
+def simplify_reference(
+    reference: pd.DataFrame,
+    tolerance: float | None = None,
+    precision: int | None = None,
+    max_vertices: int | None = None,
+) -> pd.DataFrame:
+    """Returns a copy of reference with every '.geo' geometry passed through simplify_geometry."""
+    simplified = reference.copy()
+    simplified[".geo"] = [
+        json.dumps(simplify_geometry(
+            json.loads(geo) if isinstance(geo, str) else geo,
+            tolerance=tolerance,
+            precision=precision,
+            max_vertices=max_vertices,
+        ))
+        for geo in reference[".geo"]
+    ]
+    return simplified
+
+def simplification_from_config(config: dict) -> dict[str, Any]:
+    """Returns the load_reference arguments of TOLERANCE, PRECISION and MAX_VERTICES if ET_SIMPLIFY_GEOMETRY is set.
+
+    Returns no arguments, i.e. geometries are used as they are, otherwise. Keep the setting unchanged for runs
+    that update the same historical dataset, so earlier rows and new rows come from the same geometries.
+    """
+    if not config.get("ET_SIMPLIFY_GEOMETRY"):
+        return {}
+    return {"tolerance": TOLERANCE, "precision": PRECISION, "max_vertices": MAX_VERTICES}
+
+def load_reference(
+    path: str | Path,
+    index_col: str,
+    *,
+    tolerance: float | None = None,
+    precision: int | None = None,
+    max_vertices: int | None = None,
+    cache_dir: str | Path | None = "data/cache/geometry",
+) -> pd.DataFrame:
+    """
+    Reads a field reference csv, optionally with its '.geo' geometries simplified.
+
+    Parameters
+    ----------
+    path : str, path object
+        Reference csv with a '.geo' column, e.g. data/kern_polygons.csv.
+    index_col : str
+        Column holding field IDs.
+    tolerance, precision, max_vertices
+        Passed to simplify_geometry. If none is provided, geometries are read as they are and nothing is cached.
+    cache_dir : str, path object, default 'data/cache/geometry'
+        Directory the simplified reference is stored in and read from on later loads. Not cached if None.
+
+    Notes
+    -----
+    Cached references are keyed by the source file's path, size and modification time and the
+    simplification parameters, so editing the source or changing a parameter simplifies it again.
+    """
+    path = Path(path)
+    if tolerance is None and precision is None and max_vertices is None:
+        return pd.read_csv(path, low_memory=False).set_index(index_col)
+
+    cached = None
+    if cache_dir is not None:
+        stat = path.stat()
+        key = hashlib.sha256(
+            f"{path.resolve()}|{stat.st_size}|{stat.st_mtime_ns}|{tolerance}|{precision}|{max_vertices}".encode("utf-8")
+        ).hexdigest()
+        cached = Path(cache_dir) / f"{path.stem}.{key[:16]}.csv"
+        if cached.exists():
+            return pd.read_csv(cached, low_memory=False).set_index(index_col)
+
+    reference = simplify_reference(
+        pd.read_csv(path, low_memory=False),
+        tolerance=tolerance,
+        precision=precision,
+        max_vertices=max_vertices,
+    )
+
+    if cached is not None:
+        cached.parent.mkdir(parents=True, exist_ok=True)
+        # Written to a temporary file first so an interrupted write is never read back.
+        tmp = cached.with_name(f"{cached.name}.tmp")
+        reference.to_csv(tmp, index=False)
+        os.replace(tmp, cached)
+
+    return reference.set_index(index_col)
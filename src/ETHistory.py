@@ -0,0 +1,178 @@
+from collections import deque
+from copy import deepcopy
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterable
+
+from .ETArg import ETArg
+from .ETFetch import ETFetch
+from .ETReference import Reference
+
+import logging
+import pandas as pd
+
+def read_history(path: str | Path, storage: Any = None, **kwargs) -> pd.DataFrame | None:
+    """
+    Reads an existing historical dataset, e.g. one written by ETFetch.export or CloudStorage.fetch_save.
+
+    Parameters
+    ----------
+    path : str, path object
+        Local file read first.
+    storage : CloudStorage, default None
+        If provided and path does not exist locally, the blob named path.name is read instead.
+    **kwargs
+        Passed to pd.read_csv.
+
+    Returns
+    -------
+    DataFrame or None
+        None if the dataset does not exist yet.
+    """
+    path = Path(path)
+    if path.exists():
+        return pd.read_csv(path, **kwargs)
+
+    if storage is not None:
+        try:
+            return storage.pd_read(path.name, **kwargs)
+        except Exception:
+            return None
+    return None
+
+def history_starts(
+    history: pd.DataFrame | None,
+    fields: Iterable,
+    names: list[str],
+    start: str,
+    frequency: str = 'daily',
+) -> dict[Any, str]:
+    """
+    Returns the first date to request for each field so only the tail missing from history is retrieved.
+
+    Parameters
+    ----------
+    history : DataFrame or None
+        Existing data with 'field_id', 'time' and a column per name.
+    fields : Iterable
+        Field IDs to update.
+    names : list of str
+        Value columns a date must have to count as available, i.e. the ETArg names.
+    start : str
+        Date fields missing from history start from, e.g. '2016-01-01'.
+    frequency : str, default 'daily'
+        With 'monthly' the last month is requested again as it may have been partial.
+
+    Returns
+    -------
+    dict
+        Field ID to 'YYYY-MM-DD'.
+    """
+    fields = list(fields)
+    if history is None or history.empty:
+        return {field_id: start for field_id in fields}
+
+    complete = history.dropna(subset=[name for name in names if name in history.columns])
+    last = pd.to_datetime(complete['time']).groupby(complete['field_id']).max()
+
+    if frequency == 'monthly':
+        starts = last.dt.to_period('M').dt.start_time
+    else:
+        starts = last + pd.Timedelta(days=1)
+
+    formatted = starts.dt.strftime('%Y-%m-%d').to_dict()
+    return {field_id: formatted.get(field_id, start) for field_id in fields}
+
+def update_history(
+    history: pd.DataFrame | None,
+    fields_queue: Iterable,
+    points_ref: Any,
+    *,
+    api_key: str,
+    request_args: list[ETArg],
+    end_date: str,
+    frequency: str = 'daily',
+    logger: logging.Logger | None = None,
+    **kwargs,
+) -> ETFetch:
+    """
+    Appends the dates missing from an existing historical dataset instead of requesting it again in full.
+
+    Parameters
+    ----------
+    history : DataFrame or None
+        Existing data as exported by ETFetch. Everything is requested if None.
+    fields_queue : Iterable
+        Fields to update.
+    points_ref : dict, DataFrame, or Reference
+        Collection of points that are referenced for the fields, as accepted by ETFetch.
+    api_key : str
+        User API key for OpenET API. User restrictions apply.
+    request_args : list of ETArg
+        Arguments as for a full retrieval. The first date of each date_range is where fields missing from
+        history start, and the end is replaced by end_date.
+    end_date : str
+        Last date to retrieve.
+    frequency : str, default 'daily'
+        Passed to ETFetch.start.
+    logger : logging.Logger, default None
+        Passed to ETFetch.start.
+    **kwargs
+        Passed to ETFetch.start, e.g. packets or max_workers.
+
+    Returns
+    -------
+    ETFetch
+        Run whose data_table holds history and the retrieved tail, so it can be exported as usual.
+
+    Notes
+    -----
+    Fields are grouped by the date their tail starts, and each group is retrieved with one ETFetch run.
+    Fields already up to end_date are not requested. Rows retrieved again replace those in history.
+    """
+    fields = list(fields_queue)
+    names = [item.name for item in request_args]
+    starts = history_starts(history, fields, names, request_args[0].date_range[0], frequency)
+
+    end = datetime.strptime(end_date, '%Y-%m-%d')
+    groups: dict[str, list] = {}
+    for field_id in fields:
+        if datetime.strptime(starts[field_id], '%Y-%m-%d') <= end:
+            groups.setdefault(starts[field_id], []).append(field_id)
+
+    # Geometries are parsed once and shared by every group.
+    reference = points_ref if isinstance(points_ref, Reference) else Reference(points_ref)
+    fetch = ETFetch(deque(), reference, api_key=api_key)
+    tables = [] if history is None else [history]
+    for start, group in sorted(groups.items()):
+        if logger:
+            logger.info(f"Retrieving {len(group)} fields from {start} to {end_date}")
+
+        args = deepcopy(request_args)
+        for item in args:
+            item.date_range = [start, end_date]
+
+        # Each group keeps its packets apart so compiling one does not read another's.
+        run = ETFetch(deque(group), reference, api_key=api_key)
+        run.__temp_bin__ = f'{fetch.__temp_bin__}{start}/'
+        run.start(request_args=args, frequency=frequency, logger=logger, **kwargs)
+        tables.append(run.data_table)
+
+    if logger and len(groups) == 0:
+        logger.info(f"History is already up to {end_date}")
+
+    fetch.data_table = __combine__([table for table in tables if not table.empty], names)
+    return fetch
+
+def __combine__(tables: list[pd.DataFrame], names: list[str]) -> pd.DataFrame:
+    # Later rows replace earlier ones for the same field and date, kept grouped by field in first-seen order.
+    if len(tables) == 0:
+        return pd.DataFrame(columns=['field_id', 'crop', 'time', *names])
+
+    combined = pd.concat(tables, ignore_index=True)
+    dates = pd.to_datetime(combined['time'])
+    combined = combined.loc[~pd.DataFrame({'field_id': combined['field_id'], 'time': dates}).duplicated(keep='last')]
+
+    order = pd.Series(pd.factorize(combined['field_id'])[0], index=combined.index)
+    positions = pd.DataFrame({'order': order, 'time': dates.loc[combined.index]}).sort_values(['order', 'time'], kind='stable').index
+    return combined.loc[positions].reset_index(drop=True)
@@ -0,0 +1,167 @@
+import json
+import threading
+import time
+
+from datetime import datetime
+from pathlib import Path
+
+from .ETException import QuotaExceededException
+
+class RateLimiter:
+    """
+    Token bucket shared by every request drawing from the same API key.
+
+    Parameters
+    ----------
+    rate : float
+        Requests allowed per second once the burst is spent.
+
+    burst : int, default 1
+        Maximum number of requests that may be sent back to back.
+
+    quota : int, default None
+        Maximum number of requests per calendar month. Unlimited if None.
+
+    quota_path : str, path object, default None
+        JSON file used to persist the month's request count across runs.
+        Only used when quota is provided.
+
+    See Also
+    --------
+    from_config : Builds a RateLimiter from .env values.
+    set_limiter : Installs a RateLimiter shared by every Request.
+
+    Examples
+    --------
+    Allow 60 requests per minute with bursts of 10
+    >>> limiter = RateLimiter.per_minute(60, burst=10)
+    >>> limiter.acquire()
+    """
+    def __init__(
+        self,
+        rate: float,
+        burst: int = 1,
+        *,
+        quota: int | None = None,
+        quota_path: str | Path | None = None,
+    ) -> None:
+        if rate <= 0:
+            raise ValueError("rate must be greater than 0.")
+        if burst < 1:
+            raise ValueError("burst must be at least 1.")
+
+        self.rate = rate
+        self.burst = burst
+        self.quota = quota
+        self.quota_path = Path(quota_path) if quota_path else None
+
+        self._tokens: float = burst
+        self._updated = time.monotonic()
+        # Monotonic time before which no request may be sent, set when the server asks us to slow down.
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+        self._month, self._used = self.__load_usage__()
+
+    @classmethod
+    def per_minute(cls, requests: int, burst: int = 1, **kwargs) -> "RateLimiter":
+        return cls(requests / 60, burst, **kwargs)
+
+    @classmethod
+    def from_config(cls, config: dict) -> "RateLimiter | None":
+        """Builds a RateLimiter from ET_RATE_PER_MINUTE, ET_BURST, ET_MONTHLY_QUOTA and ET_QUOTA_PATH.
+
+        Returns None if ET_RATE_PER_MINUTE is not set.
+        """
+        per_minute = config.get("ET_RATE_PER_MINUTE")
+        if not per_minute:
+            return None
+
+        quota = config.get("ET_MONTHLY_QUOTA")
+        return cls.per_minute(
+            int(per_minute),
+            burst=int(config.get("ET_BURST") or 1),
+            quota=int(quota) if quota else None,
+            quota_path=config.get("ET_QUOTA_PATH") or "data/quota.json",
+        )
+
+    @property
+    def used(self) -> int:
+        return self._used
+
+    @property
+    def remaining(self) -> int | None:
+        if self.quota is None:
+            return None
+        return max(self.quota - self._used, 0)
+
+    def __load_usage__(self) -> tuple[str, int]:
+        month = datetime.now().strftime("%Y-%m")
+        if self.quota is None or self.quota_path is None or not self.quota_path.exists():
+            return month, 0
+
+        try:
+            usage = json.loads(self.quota_path.read_text())
+        except (OSError, ValueError):
+            return month, 0
+
+        # Usage from a previous month no longer counts.
+        if usage.get("month") != month:
+            return month, 0
+        return month, int(usage.get("used", 0))
+
+    def __count__(self) -> None:
+        # Called with the lock held.
+        month = datetime.now().strftime("%Y-%m")
+        if month != self._month:
+            self._month, self._used = month, 0
+
+        if self.quota is not None and self._used >= self.quota:
+            raise QuotaExceededException(f"Monthly quota of {self.quota} requests reached for {self._month}.")
+        self._used += 1
+
+        if self.quota is not None and self.quota_path is not None:
+            self.quota_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.quota_path.with_suffix(".tmp")
+            tmp.write_text(json.dumps({"month": self._month, "used": self._used}))
+            tmp.replace(self.quota_path)
+
+    def acquire(self) -> None:
+        """Blocks until a request may be sent.
+
+        Raises
+        ------
+        QuotaExceededException
+            If the monthly quota has been used up.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                # Refill tokens for the time passed, never holding more than the burst size.
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if now >= self._paused_until and self._tokens >= 1:
+                    self.__count__()
+                    self._tokens -= 1
+                    return
+
+                delay = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+            time.sleep(delay)
+
+    def pause(self, seconds: float) -> None:
+        """Holds every request for the given number of seconds, e.g. from a 429 Retry-After header."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0
+
+_limiter: RateLimiter | None = None
+
+def get_limiter() -> RateLimiter | None:
+    """Returns the limiter shared by every Request that is not given its own. None if unlimited."""
+    return _limiter
+
+def set_limiter(limiter: RateLimiter | None) -> None:
+    """Installs a limiter shared by every Request. Passing None removes throttling."""
+    global _limiter
+    _limiter = limiter
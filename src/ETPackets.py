@@ -0,0 +1,305 @@
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import os
+import pandas as pd
+import threading
+
+PACKET_FORMATS = ['csv', 'parquet']
+
+class Manifest:
+    """
+    Append-only journal of the field and ETArg name pairs stored in a bin directory.
+
+    Parameters
+    ----------
+    path : str, path object
+        Bin directory holding the journal.
+
+    Notes
+    -----
+    Each line of `manifest.log` is `<field_id>\t<crop>\t<name>`. Lines are appended with a single write
+    and synced to disk before `append` returns. A line cut short by a crash has no trailing newline and
+    is ignored when the journal is loaded.
+    """
+    FILENAME = 'manifest.log'
+
+    def __init__(self, path: str | Path) -> None:
+        self.file = Path(path) / self.FILENAME
+        self.exists = self.file.exists()
+        self.__entries__: set[tuple[str, str, str]] = set()
+        self.__fd__: int | None = None
+        self.__lock__ = threading.Lock()
+
+        # Set when the journal ends in a torn line that must be terminated before appending.
+        self.__torn__ = False
+
+        if self.exists:
+            with open(self.file, 'r') as journal:
+                for line in journal:
+                    parts = line.rstrip('\n').split('\t')
+                    if not line.endswith('\n'):
+                        self.__torn__ = True
+                    elif len(parts) == 3:
+                        self.__entries__.add((parts[0], parts[1], parts[2]))
+
+    def __len__(self) -> int:
+        return len(self.__entries__)
+
+    def completed(self, field_id: str, crop: int, names: list[str]) -> bool:
+        return all((str(field_id), str(crop), name) in self.__entries__ for name in names)
+
+    def append(self, field_id: str, crop: int, names: list[str]) -> None:
+        self.extend([(field_id, crop, name) for name in names])
+
+    def extend(self, entries: list[tuple[str, int, str]]) -> None:
+        if len(entries) == 0:
+            return
+
+        lines = ''.join(f'{field_id}\t{crop}\t{name}\n' for field_id, crop, name in entries)
+        with self.__lock__:
+            if self.__fd__ is None:
+                self.file.parent.mkdir(parents=True, exist_ok=True)
+                self.__fd__ = os.open(self.file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            if self.__torn__:
+                lines = '\n' + lines
+                self.__torn__ = False
+            os.write(self.__fd__, lines.encode('utf-8'))
+            os.fsync(self.__fd__)
+            self.exists = True
+            self.__entries__.update((str(field_id), str(crop), name) for field_id, crop, name in entries)
+
+    def close(self) -> None:
+        with self.__lock__:
+            if self.__fd__ is not None:
+                os.close(self.__fd__)
+                self.__fd__ = None
+
+class CSVPackets:
+    """
+    Packet store writing one csv file per field per ETArg.
+
+    Parameters
+    ----------
+    path : str, path object
+        Bin directory packets are written to.
+
+    names : list of str
+        Names of the ETArg stored for each field.
+
+    Notes
+    -----
+    Files are named `<field_id>.<crop>.<name>.csv`, e.g. CA_270812.27.actual_eto.csv.
+    
+    Stored fields are recorded in the bin's Manifest once their files are written. Bins written before the
+    manifest existed are scanned once and recorded.
+    """
+    def __init__(self, path: str | Path, names: list[str]) -> None:
+        self.path = Path(path)
+        self.names = names
+        self.manifest = Manifest(self.path)
+
+        if not self.manifest.exists and self.path.exists():
+            self.__seed_manifest__()
+
+    def __seed_manifest__(self) -> None:
+        entries = []
+        with os.scandir(self.path) as files:
+            for file in files:
+                parts = file.name.split('.')
+                if len(parts) == 4 and parts[3] == 'csv':
+                    entries.append((parts[0], parts[1], parts[2]))
+        self.manifest.extend(entries)
+
+    def completed(self, field_id: str, crop: int) -> bool:
+        return self.manifest.completed(field_id, crop, self.names)
+
+    def write(self, field_id: str, crop: int, contents: dict[str, list[dict]]) -> None:
+        for name, content in contents.items():
+            # Converts decoded JSON to DataFrame, then exports as csv file
+            pd.json_normalize(content).to_csv(self.path / f'{field_id}.{crop}.{name}.csv', index=False)
+        self.manifest.append(field_id, crop, list(contents.keys()))
+
+    def close(self) -> None:
+        self.manifest.close()
+
+    def compile(self) -> list[pd.DataFrame]:
+        """Reads every packet into one DataFrame per name with columns ['field_id', 'crop', 'time', name]."""
+        tables = []
+        # Iterate through each column name first
+        for name in self.names:
+            # Collect every file whose name contains the current column name, then concatenate once.
+            frames: list[pd.DataFrame] = []
+            field_ids: list[str] = []
+            crops: list[int] = []
+            for file in self.path.glob(f'*.{name}.csv'):
+                # e.g. CA_270812.27.actual_eto.csv
+                # becomes ['CA_270812', '27', 'actual_eto', 'csv']
+                parts = str(file.name).split('.')
+                # Contains [time, {variable}]
+                frames.append(pd.read_csv(file, header=0, names=['time', name]))
+                field_ids.append(parts[0])
+                crops.append(int(parts[1]))
+
+            if len(frames) == 0:
+                tables.append(pd.DataFrame(columns=['field_id', 'crop', 'time', name]))
+                continue
+
+            data = pd.concat(frames, ignore_index=True)
+            # Key columns are expanded from one entry per file rather than assigned per frame.
+            lengths = [len(frame) for frame in frames]
+            data.insert(0, 'field_id', np.repeat(field_ids, lengths))
+            data.insert(1, 'crop', np.repeat(crops, lengths))
+            tables.append(data)
+
+        return tables
+
+class ParquetPackets:
+    """
+    Packet store appending fields as row groups to a Parquet dataset partitioned by ETArg name.
+
+    Parameters
+    ----------
+    path : str, path object
+        Bin directory the dataset is written to.
+
+    names : list of str
+        Names of the ETArg stored for each field.
+
+    row_group_size : int, default 256
+        Number of fields buffered before a row group is written.
+
+    Notes
+    -----
+    Each run appends to its own file per name, `<path>/<name>/part-<timestamp>.parquet`, with columns
+    field_id (string), crop (int64), time (timestamp) and the value (float64).
+
+    A file is only readable once it is closed, so stored fields are recorded in the bin's Manifest when
+    the store is closed. Fields from a run that was killed before closing are retrieved again when the
+    run is resumed.
+    """
+    def __init__(self, path: str | Path, names: list[str], row_group_size: int = 256) -> None:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("packet_format='parquet' requires pyarrow. Please run `pip install pyarrow`.")
+
+        self.__pa__ = pa
+        self.__pq__ = pq
+        self.path = Path(path)
+        self.names = names
+        self.row_group_size = row_group_size
+
+        self.__part__ = f"part-{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.parquet"
+        self.__writers__: dict = {}
+        self.__buffer__: dict[str, list[pd.DataFrame]] = {name: [] for name in names}
+        self.__buffered_fields__ = 0
+        # Fields written to the open part files. Recorded in the manifest once the files are closed.
+        self.__pending__: list[tuple[str, int]] = []
+        self.manifest = Manifest(self.path)
+
+        if not self.manifest.exists:
+            self.__seed_manifest__()
+
+    def __schema__(self, name: str):
+        pa = self.__pa__
+        return pa.schema([
+            ('field_id', pa.string()),
+            ('crop', pa.int64()),
+            ('time', pa.timestamp('s')),
+            (name, pa.float64()),
+        ])
+
+    def __parts__(self, name: str) -> list[Path]:
+        readable = []
+        for file in sorted((self.path / name).glob('*.parquet')):
+            try:
+                self.__pq__.read_metadata(file)
+            except Exception:
+                # Unclosed file from an interrupted run.
+                continue
+            readable.append(file)
+        return readable
+
+    def __seed_manifest__(self) -> None:
+        # Records fields from closed part files written before the manifest existed.
+        entries = []
+        for name in self.names:
+            for file in self.__parts__(name):
+                table = self.__pq__.read_table(file, columns=['field_id', 'crop'])
+                keys = set(zip(table['field_id'].to_pylist(), table['crop'].to_pylist()))
+                entries.extend((field_id, crop, name) for field_id, crop in keys)
+        self.manifest.extend(entries)
+
+    def completed(self, field_id: str, crop: int) -> bool:
+        return self.manifest.completed(field_id, int(crop), self.names)
+
+    def write(self, field_id: str, crop: int, contents: dict[str, list[dict]]) -> None:
+        for name, content in contents.items():
+            frame = pd.DataFrame({
+                'field_id': field_id,
+                'crop': int(crop),
+                'time': pd.to_datetime([item['time'] for item in content]),
+                name: [item[[key for key in item if key != 'time'][0]] for item in content],
+            })
+            self.__buffer__[name].append(frame)
+
+        self.__pending__.append((field_id, int(crop)))
+        self.__buffered_fields__ += 1
+        if self.__buffered_fields__ >= self.row_group_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.__buffered_fields__ == 0:
+            return
+
+        for name in self.names:
+            if len(self.__buffer__[name]) == 0:
+                continue
+            if name not in self.__writers__:
+                (self.path / name).mkdir(parents=True, exist_ok=True)
+                self.__writers__[name] = self.__pq__.ParquetWriter(self.path / name / self.__part__, self.__schema__(name))
+
+            frame = pd.concat(self.__buffer__[name], ignore_index=True)
+            table = self.__pa__.Table.from_pandas(frame, schema=self.__schema__(name), preserve_index=False)
+            self.__writers__[name].write_table(table)
+            self.__buffer__[name] = []
+
+        self.__buffered_fields__ = 0
+
+    def close(self) -> None:
+        self.flush()
+        for writer in self.__writers__.values():
+            writer.close()
+        self.__writers__ = {}
+
+        # Part files are only readable once closed, so fields are recorded after closing.
+        self.manifest.extend([(field_id, crop, name) for field_id, crop in self.__pending__ for name in self.names])
+        self.__pending__ = []
+        self.manifest.close()
+
+    def compile(self) -> list[pd.DataFrame]:
+        """Reads the dataset into one DataFrame per name with columns ['field_id', 'crop', 'time', name]."""
+        self.close()
+
+        tables = []
+        for name in self.names:
+            parts = self.__parts__(name)
+            if len(parts) == 0:
+                tables.append(pd.DataFrame(columns=['field_id', 'crop', 'time', name]))
+                continue
+            tables.append(self.__pq__.read_table(parts, schema=self.__schema__(name)).to_pandas())
+
+        return tables
+
+def open_packets(path: str | Path, names: list[str], packet_format: str = 'csv') -> CSVPackets | ParquetPackets:
+    """Opens the packet store for packet_format in path."""
+    match packet_format:
+        case 'csv':
+            return CSVPackets(path, names)
+        case 'parquet':
+            return ParquetPackets(path, names)
+        case _:
+            raise ValueError(f'Provided packet_format "{packet_format}" is not supported.')
@@ -0,0 +1,77 @@
+import json
+
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+class Reference:
+    """
+    Field reference with every '.geo' geometry parsed once, reusable across many ETFetch runs.
+
+    Parameters
+    ----------
+    points_ref : dict, or DataFrame
+        Collection of points indexed by field ID with a '.geo' column and USDA Cropland Data Layer columns,
+        as accepted by ETFetch.
+
+    Notes
+    -----
+    Flat coordinate lists, i.e. points and the flattened polygons in '.geo', are stored back to back in one
+    float64 array with an offset per field. Other geometries keep their parsed coordinates.
+
+    Columns other than '.geo' are read from the wrapped DataFrame, so `reference[column][field_id]` works as it
+    does for the DataFrame.
+
+    Examples
+    --------
+    >>> ref = Reference(pd.read_csv("./data/kern_polygons.csv").set_index("OPENET_ID"))
+    >>> for date in forecast_dates:
+    ...     ETFetch(deque(ref.index), ref, api_key='xxxxxx...').start(...)
+    """
+    def __init__(self, points_ref: Any) -> None:
+        self.frame: pd.DataFrame = pd.DataFrame(points_ref) if isinstance(points_ref, dict) else points_ref
+        self.__positions__: dict[Any, int] = {field_id: position for position, field_id in enumerate(self.frame.index)}
+        self.__crops__: dict[str, np.ndarray] = {}
+
+        lengths = np.zeros(len(self.frame), dtype=np.int64)
+        flat: list[np.ndarray] = []
+        # Parsed coordinates of geometries that are not flat lists, by position.
+        self.__nested__: dict[int, Any] = {}
+
+        for position, geo in enumerate(self.frame['.geo']):
+            coordinates = (json.loads(geo) if isinstance(geo, str) else geo)['coordinates']
+            if len(coordinates) > 0 and isinstance(coordinates[0], list):
+                self.__nested__[position] = coordinates
+                continue
+            flat.append(np.asarray(coordinates, dtype=np.float64))
+            lengths[position] = len(coordinates)
+
+        self.__coordinates__ = np.concatenate(flat) if len(flat) > 0 else np.empty(0, dtype=np.float64)
+        self.__offsets__ = np.concatenate([[0], np.cumsum(lengths)])
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    def __contains__(self, field_id: Any) -> bool:
+        return field_id in self.__positions__
+
+    def __getitem__(self, column: str) -> pd.Series:
+        return self.frame[column]
+
+    @property
+    def index(self) -> pd.Index:
+        return self.frame.index
+
+    def geometry(self, field_id: Any) -> list:
+        """Returns the coordinates of field_id as sent in a request's `geometry`."""
+        position = self.__positions__[field_id]
+        if position in self.__nested__:
+            return self.__nested__[position]
+        return self.__coordinates__[self.__offsets__[position]:self.__offsets__[position + 1]].tolist()
+
+    def crop(self, field_id: Any, crop_col: str) -> Any:
+        """Returns the value of crop_col for field_id."""
+        if crop_col not in self.__crops__:
+            self.__crops__[crop_col] = self.frame[crop_col].to_numpy()
+        return self.__crops__[crop_col][self.__positions__[field_id]]
@@ -1,30 +1,238 @@
+import hashlib
+import json
+import os
+import threading
 import time
 import warnings
 
 from logging import Logger, WARNING, ERROR, addLevelName
-from requests import Response, post
+from pathlib import Path
+from requests import Response, Session
+from requests.adapters import HTTPAdapter
 from requests.exceptions import Timeout, ConnectionError
 
 from .ETException import ETException
+from .ETLimiter import RateLimiter, get_limiter
 
 STATUS_ALLOWED = [200]
+STATUS_TOO_MANY_REQUESTS = 429
 TIMEOUT = 60 * 5
 
 HELPFUL = 25
 addLevelName(HELPFUL, "HELPFUL")
 
+# Number of hosts whose connection pools are kept alive.
+POOL_CONNECTIONS = 4
+# Number of connections kept alive per host.
+POOL_MAXSIZE = 16
+
+_session: Session | None = None
+_session_lock = threading.Lock()
+
+def create_session(
+    pool_connections: int = POOL_CONNECTIONS,
+    pool_maxsize: int = POOL_MAXSIZE,
+    pool_block: bool = False,
+) -> Session:
+    """Creates a keep-alive HTTP session with its own connection pool.
+
+    Parameters
+    ----------
+    pool_connections : int, default POOL_CONNECTIONS
+        Number of per-host connection pools to cache.
+    pool_maxsize : int, default POOL_MAXSIZE
+        Maximum number of connections kept alive per host.
+    pool_block : bool, default False
+        If True, limits connections per host to pool_maxsize and blocks until one is free.
+        If False, extra connections are opened when the pool is exhausted but are not kept alive.
+
+    Returns
+    -------
+    Session
+        Session whose adapters reuse sockets between requests.
+    """
+    session = Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        pool_block=pool_block,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    return session
+
+def get_session() -> Session:
+    """Returns the session shared by every Request that is not given its own."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = create_session()
+        return _session
+
+def set_session(session: Session) -> None:
+    """Replaces the shared session, e.g. with one from create_session using a larger pool."""
+    global _session
+    with _session_lock:
+        _session = session
+
+class ResponseCache:
+    """
+    On-disk cache of successful response bodies keyed by endpoint and request parameters.
+
+    Parameters
+    ----------
+    directory : str, path object, default 'data/cache'
+        Directory cached bodies are stored in.
+
+    ttl : float, default None
+        Seconds a cached body is served for after it was stored. Never expires if None.
+
+    max_bytes : int, default None
+        Total size the cache is kept under by evicting the least recently used bodies. Unbounded if None.
+
+    Notes
+    -----
+    Keys are the SHA-256 of the endpoint and the parameters serialized as JSON with sorted keys,
+    so parameter order does not matter and the API key is never part of the key.
+    The file's modification time records when it was stored and its access time when it was last served.
+    """
+    def __init__(
+        self,
+        directory: str | Path = "data/cache",
+        ttl: float | None = None,
+        max_bytes: int | None = None,
+    ) -> None:
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._size = sum(file.stat().st_size for file in self.directory.glob("*/*"))
+
+    @classmethod
+    def from_config(cls, config: dict) -> "ResponseCache | None":
+        """Builds a ResponseCache from ET_CACHE_DIR, ET_CACHE_TTL_DAYS and ET_CACHE_MAX_GB.
+
+        Returns None if ET_CACHE_DIR is not set.
+        """
+        directory = config.get("ET_CACHE_DIR")
+        if not directory:
+            return None
+
+        ttl_days = config.get("ET_CACHE_TTL_DAYS")
+        max_gb = config.get("ET_CACHE_MAX_GB")
+        return cls(
+            directory,
+            ttl=float(ttl_days) * 86400 if ttl_days else None,
+            max_bytes=int(float(max_gb) * 1024 ** 3) if max_gb else None,
+        )
+
+    @staticmethod
+    def key(endpoint: str, params: dict | None) -> str:
+        canonical = json.dumps(params, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(f"{endpoint}\n{canonical}".encode("utf-8")).hexdigest()
+
+    def __path__(self, key: str) -> Path:
+        # Two-character fan-out keeps directories small.
+        return self.directory / key[:2] / key
+
+    def get(self, endpoint: str, params: dict | None) -> Response | None:
+        path = self.__path__(self.key(endpoint, params))
+        try:
+            stat = path.stat()
+            if self.ttl is not None and time.time() - stat.st_mtime > self.ttl:
+                self.__remove__(path)
+                return None
+            content = path.read_bytes()
+            # Marks the body as recently used without changing when it was stored.
+            os.utime(path, (time.time(), stat.st_mtime))
+        except FileNotFoundError:
+            return None
+
+        response = Response()
+        response.status_code = 200
+        response.url = endpoint
+        response._content = content
+        return response
+
+    def put(self, endpoint: str, params: dict | None, response: Response) -> None:
+        path = self.__path__(self.key(endpoint, params))
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Written to a temporary file first so readers never see a partial body.
+        tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(response.content)
+        with self._lock:
+            previous = path.stat().st_size if path.exists() else 0
+            os.replace(tmp, path)
+            self._size += len(response.content) - previous
+        self.evict()
+
+    def __remove__(self, path: Path) -> None:
+        with self._lock:
+            try:
+                size = path.stat().st_size
+                path.unlink()
+                self._size -= size
+            except FileNotFoundError:
+                pass
+
+    def evict(self) -> None:
+        """Removes least recently used bodies until the cache is under max_bytes."""
+        if self.max_bytes is None or self._size <= self.max_bytes:
+            return
+
+        entries = []
+        for file in self.directory.glob("*/*"):
+            if file.suffix == ".tmp":
+                continue
+            stat = file.stat()
+            entries.append((stat.st_atime, stat.st_size, file))
+
+        for _, _, file in sorted(entries, key=lambda entry: entry[0]):
+            if self._size <= self.max_bytes:
+                break
+            self.__remove__(file)
+
+    def clear(self) -> None:
+        for file in self.directory.glob("*/*"):
+            self.__remove__(file)
+
+_cache: ResponseCache | None = None
+
+def get_cache() -> ResponseCache | None:
+    """Returns the cache shared by every Request that is not given its own. None if disabled."""
+    return _cache
+
+def set_cache(cache: ResponseCache | None) -> None:
+    """Installs a response cache shared by every Request. Passing None disables caching."""
+    global _cache
+    _cache = cache
+
 class Request:
     def __init__(
         self, 
         endpoint: str | None = None, 
         params: dict | None = {}, 
         key: str | None = None, 
-        logger: Logger | None = None
+        logger: Logger | None = None,
+        session: Session | None = None,
+        limiter: RateLimiter | None = None,
+        cache: ResponseCache | None = None,
+        fail_fast: bool = False,
     ) -> None:
         self.endpoint = endpoint
         self.params = params
         self.header = {"Authorization": key}
         self.logger = logger
+        # Falls back to the shared session, limiter and cache when sent.
+        self.session = session
+        self.limiter = limiter
+        self.cache = cache
+        # Client errors other than 429 fail the same way on every attempt, so they can be raised at once.
+        self.fail_fast = fail_fast
 
         self._attempt: int = 1
         self.response: Response | None = None
@@ -39,21 +247,42 @@ class Request:
         if not self.header.get("Authorization", None):
             raise AttributeError("No Authorization key provided for request.")
         
+        cache = self.cache or get_cache()
+        if cache:
+            cached = cache.get(self.endpoint, self.params)
+            if cached is not None:
+                self.response = cached
+                return
+        
         res = None
         err = None
+        session = self.session or get_session()
+        limiter = self.limiter or get_limiter()
+        throttled = False
         
         for attempt in range(self._attempt, n_retries + 1):
-            if attempt > 1:
+            self._attempt = attempt
+            err = None
+            res = None
+            if attempt > 1 and not throttled:
                 # Exponential backoff
                 time.sleep(min(2 ** (attempt - 1), 60))
+            throttled = False
             try:
-                res = post(
+                if limiter:
+                    limiter.acquire()
+                res = session.post(
                     url=self.endpoint,
                     json=self.params,
                     headers=self.header,
                     timeout=TIMEOUT
                 )
                 
+                if limiter and res.status_code == STATUS_TOO_MANY_REQUESTS:
+                    # The limiter holds every request until the server is ready, which replaces the backoff.
+                    limiter.pause(self.retry_after(res))
+                    throttled = True
+                
                 if not self.success(res):
                     raise ValueError()
                 
@@ -61,7 +290,9 @@ class Request:
                 err = e
             
             if err is not None:
-                if attempt == n_retries:
+                if attempt == n_retries or (self.fail_fast and self.client_error(res)):
+                    # The failed response is kept so callers can tell why it failed.
+                    self.response = res
                     raise ETException
                 
                 if self.logger:
@@ -70,6 +301,12 @@ class Request:
                         f"Attempt {attempt} failed for endpoint {self.endpoint}: {err}"
                     )
                 continue
+            
+            # Stop retrying once a successful response is received.
+            break
+        
+        if cache and res is not None:
+            cache.put(self.endpoint, self.params, res)
         
         self.response = res
     
@@ -81,6 +318,21 @@ class Request:
         
         return self.response
 
+    @staticmethod
+    def retry_after(response: Response, default: float = 60) -> float:
+        # Seconds to wait from the Retry-After header. Only the delay-seconds form is supported.
+        try:
+            return float(response.headers.get("Retry-After", default))
+        except (TypeError, ValueError):
+            return default
+
+    @staticmethod
+    def client_error(response: Response | None) -> bool:
+        # True for 4xx responses that retrying cannot fix, i.e. anything but 408 and 429.
+        if response is None:
+            return False
+        return 400 <= response.status_code < 500 and response.status_code not in (408, STATUS_TOO_MANY_REQUESTS)
+
     def success(self, request: Response | None = None) -> bool:
         # Returns true in the event that a response is returned and its status code is in STATUS_ALLOWED.
         req = request or self.response
@@ -91,13 +343,13 @@ class Request:
             return False
 
 class ETRequest(Request):
-    def __init__(self, request_endpoint=None, request_params=None, key=None) -> None:
+    def __init__(self, request_endpoint=None, request_params=None, key=None, session=None) -> None:
         warnings.warn(
             "ETRequest is deprecated. Use Request instead.",
             DeprecationWarning,
             stacklevel=2,
         )
-        super().__init__(endpoint=request_endpoint, params=request_params, key=key)
+        super().__init__(endpoint=request_endpoint, params=request_params, key=key, session=session)
         
     def send(self, logger=None, *args, **kwargs):
         super().send(*args, **kwargs)
@@ -0,0 +1,226 @@
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from requests import Session
+from typing import Any, Callable, Iterable
+
+from .ETArg import ETArg
+from .ETFetch import REORDER_LIMIT, ETFetch
+from .ETLimiter import RateLimiter
+from .ETReference import Reference
+from .ETRequest import Request
+
+import logging
+
+class Cell:
+    """One grid cell of a Sweep, e.g. a forecast date, match window and match variable."""
+    def __init__(self, request_args: list[ETArg], filename: str, fetch: ETFetch) -> None:
+        self.request_args = request_args
+        self.filename = filename
+        self.fetch = fetch
+
+        # Set when the sweep starts.
+        self.groups: list[list[int]] = []
+        self.templates: list[dict] = []
+        self.columns: list[dict[str, list]] = []
+        self.remaining = 0
+        self.failed = 0
+
+class Sweep:
+    """
+    Grid of ETFetch runs executed as one flat list of field requests across a worker pool.
+
+    Parameters
+    ----------
+    fields_queue : Iterable
+        Fields retrieved for every cell.
+
+    points_ref : dict, DataFrame, or Reference
+        Collection of points that are referenced for the fields, as accepted by ETFetch.
+        Parsed once into a Reference shared by every cell.
+
+    api_key : str
+        User API key for OpenET API. User restrictions apply.
+
+    See Also
+    --------
+    ETFetch : Retrieval of a single cell.
+
+    Notes
+    -----
+    Each cell is the list of ETArg one ETFetch run would receive and the file its data is exported to.
+    Requests of every cell share one worker pool, session and rate limiter, and a cell is exported as soon as
+    its last field finishes rather than after the whole grid.
+
+    Examples
+    --------
+    >>> sweep = Sweep(deque(ref.index), ref, api_key='xxxxxx...')
+    >>> for date, window in product(forecast_dates, match_windows):
+    ...     sweep.add([forecast_et(date, window), forecast_eto(date, window)], f"{date}_window_{window}_forecast.csv")
+    >>> sweep.start(frequency='daily', max_workers=8)
+    """
+    def __init__(self, fields_queue: Iterable, points_ref: Any, *, api_key: str) -> None:
+        self.fields = list(fields_queue)
+        self.points_ref = points_ref if isinstance(points_ref, Reference) else Reference(points_ref)
+        self.cells: list[Cell] = []
+
+        # private
+        self.__api_key__ = api_key
+
+    def add(self, request_args: list[ETArg], filename: str) -> None:
+        """Adds a cell retrieving request_args for every field, exported to filename."""
+        fetch = ETFetch(deque(), self.points_ref, api_key=self.__api_key__)
+        self.cells.append(Cell(list(request_args), str(filename), fetch))
+
+    def __jobs__(self, cells: list[Cell]):
+        # Flat job list of every (cell, field). Cells are expanded in order so early cells finish first.
+        for cell in cells:
+            for field_id in self.fields:
+                yield cell, field_id
+
+    def start(self, *,
+            frequency: str,
+            crop_col: str = 'CROP_2023',
+            max_workers: int = 4,
+            session: Session | None = None,
+            limiter: RateLimiter | None = None,
+            coalesce: bool = False,
+            skip_exists: bool = False,
+            on_complete: Callable[[str, ETFetch], None] | None = None,
+            logger: logging.Logger | None = None) -> int:
+        """
+        Retrieve every cell.
+
+        Parameters
+        ----------
+        frequency : str
+            Accepts 'daily' or 'monthly'. Applied to all cells.
+
+        crop_col : str, default 'CROP_2023'
+            Name of column used to reference USDA's Cropland Data Layer code.
+
+        max_workers : int, default 4
+            Maximum number of requests kept in flight at once across every cell.
+
+        session, limiter, coalesce
+            As in ETFetch.start. Shared by every cell.
+
+        skip_exists : bool, default False
+            If True, cells whose file already exists are skipped, so an interrupted sweep can be resumed.
+
+        on_complete : callable, default None
+            Called with the filename and ETFetch of each cell once it is exported, e.g. to upload it.
+
+        logger : logging.Logger, default None
+            If logger is provided, logs request success and failure activity.
+
+        Returns
+        -------
+        int
+            Number of fields that failed to be retrieved across every cell.
+
+        Notes
+        -----
+        Data of a cell is kept in memory until the cell is exported. A failed field is discarded from its cell only.
+
+        As in ETFetch.start, at most REORDER_LIMIT * max_workers fields are dispatched after the oldest one still
+        running, so a slow field keeps a bounded number of cells open.
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1.")
+
+        cells = []
+        for cell in self.cells:
+            if skip_exists and Path(cell.filename).exists():
+                if logger:
+                    logger.info(f"{cell.filename} already exists. Skipping...")
+                continue
+
+            cell.groups, cell.templates = cell.fetch.__templates__(cell.request_args, frequency, coalesce)
+            cell.columns = [{'field_id': [], 'crop': [], 'time': [], item.name: []} for item in cell.request_args]
+            cell.fetch.__names__ = [item.name for item in cell.request_args]
+            cell.remaining = len(self.fields)
+            cell.failed = 0
+            cells.append(cell)
+
+        failed_fields = 0
+        jobs = self.__jobs__(cells)
+        # Each entry is (job index, cell, field_id, crop, [Future of Request]) in dispatch order.
+        in_flight: list[tuple[int, Cell, Any, Any, list[Future]]] = []
+        dispatched = 0
+        # Requests still running. Only these count against max_workers.
+        pending: set[Future] = set()
+
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            exhausted = len(cells) == 0 or len(self.fields) == 0
+            while not exhausted or len(in_flight) > 0:
+                # Keep up to max_workers requests in flight. A field is always dispatched when nothing is running.
+                # Dispatching pauses once REORDER_LIMIT * max_workers fields follow the oldest one running.
+                while not exhausted and len(pending) < max_workers and (
+                    len(in_flight) == 0 or dispatched - in_flight[0][0] < REORDER_LIMIT * max_workers
+                ):
+                    job = next(jobs, None)
+                    if job is None:
+                        exhausted = True
+                        break
+
+                    cell, field_id = job
+                    crop = self.points_ref.crop(field_id, crop_col)
+                    geometry = self.points_ref.geometry(field_id)
+                    futures = [
+                        executor.submit(
+                            cell.fetch.__request__,
+                            cell.request_args[group[0]],
+                            {**template, 'geometry': geometry},
+                            logger,
+                            session,
+                            limiter,
+                        )
+                        for group, template in zip(cell.groups, cell.templates)
+                    ]
+                    in_flight.append((dispatched, cell, field_id, crop, futures))
+                    pending.update(futures)
+                    dispatched += 1
+
+                if len(pending) > 0:
+                    pending = wait(pending, return_when=FIRST_COMPLETED).not_done
+
+                # Store every field whose requests have all finished.
+                finished = [entry for entry in in_flight if all(future.done() for future in entry[4])]
+                for entry in finished:
+                    in_flight.remove(entry)
+                    _, cell, field_id, crop, futures = entry
+                    results: list[Request] = [future.result() for future in futures]
+                    contents = cell.fetch.__contents__(field_id, results, cell.groups, cell.request_args, logger)
+
+                    if contents is not None:
+                        for index, item in enumerate(cell.request_args):
+                            cell.fetch.__append_columns__(cell.columns[index], item.name, field_id, crop, contents[item.name])
+                    else:
+                        if logger:
+                            logger.warning(f"Analyzing for {field_id} failed in {cell.filename}")
+                        cell.failed += 1
+
+                    cell.remaining -= 1
+                    if cell.remaining == 0:
+                        failed_fields += self.__complete__(cell, on_complete, logger)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        return failed_fields
+
+    def __complete__(self, cell: Cell, on_complete: Callable[[str, ETFetch], None] | None, logger: logging.Logger | None) -> int:
+        # Exports a finished cell and releases its data.
+        failed = cell.fetch.__finish__(None, cell.columns, cell.failed, logger)
+        cell.columns = []
+
+        Path(cell.filename).parent.mkdir(parents=True, exist_ok=True)
+        cell.fetch.export(cell.filename)
+        if logger:
+            logger.info(f"Exported {cell.filename}")
+        if on_complete:
+            on_complete(cell.filename, cell.fetch)
+        cell.fetch.data_table = cell.fetch.data_table.iloc[0:0]
+
+        return failed
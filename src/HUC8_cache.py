@@ -0,0 +1,119 @@
+import json
+import os
+import threading
+
+from pathlib import Path
+from typing import Any
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+from shapely.geometry import Point, shape
+from shapely.geometry.base import BaseGeometry
+
+class BoundaryCache:
+    """
+    On-disk cache of HUC8 watershed boundaries with a spatial index.
+
+    Parameters
+    ----------
+    path : str, path object, default 'data/huc8_boundaries.gpkg'
+        GeoPackage the boundaries are stored in. Created on the first put.
+
+    Notes
+    -----
+    Boundaries are stored in the `huc8` layer with the properties Earth Engine returns for
+    USGS/WBD/2017/HUC08, so a cached watershed is returned in the same shape as `getInfo()`.
+    The GeoPackage keeps its own R-tree index on disk. Lookups use the STRtree of the loaded
+    boundaries, which is rebuilt after each put.
+
+    The file is rewritten to a temporary file and moved into place on every put, so readers never
+    see a partial file.
+    """
+    LAYER = "huc8"
+    CRS = "EPSG:4326"
+
+    def __init__(self, path: str | Path = "data/huc8_boundaries.gpkg") -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+        if self.path.exists():
+            self.boundaries = gpd.read_file(self.path, layer=self.LAYER)
+        else:
+            self.boundaries = gpd.GeoDataFrame({"huc8": pd.Series(dtype=str)}, geometry=[], crs=self.CRS)
+
+    def __len__(self) -> int:
+        return self.boundaries["huc8"].nunique()
+
+    def __contains__(self, huc8_id: str) -> bool:
+        return bool((self.boundaries["huc8"] == huc8_id).any())
+
+    def missing(self, huc8_ids: list[str]) -> list[str]:
+        """Returns the codes in huc8_ids that are not cached, in the order provided."""
+        cached = set(self.boundaries["huc8"])
+        return [huc8_id for huc8_id in huc8_ids if huc8_id not in cached]
+
+    def get(self, huc8_id: str) -> dict[str, Any] | None:
+        """Returns the cached watershed as a GeoJSON FeatureCollection, or None if it is not cached."""
+        rows = self.boundaries[self.boundaries["huc8"] == huc8_id]
+        if len(rows) == 0:
+            return None
+        return json.loads(rows.to_json(drop_id=True))
+
+    def put(self, info: dict[str, Any]) -> None:
+        """Stores every feature of a FeatureCollection, e.g. from `getInfo()`, replacing watersheds already cached."""
+        if len(info["features"]) == 0:
+            return
+
+        features = gpd.GeoDataFrame.from_features(info["features"], crs=self.CRS)
+        with self._lock:
+            if len(self.boundaries) == 0:
+                self.boundaries = features
+            else:
+                kept = self.boundaries[~self.boundaries["huc8"].isin(features["huc8"])]
+                self.boundaries = pd.concat([kept, features], ignore_index=True)
+            self.__write__()
+
+    def __write__(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.stem}.tmp{self.path.suffix}")
+        self.boundaries.to_file(tmp, layer=self.LAYER, driver="GPKG")
+        os.replace(tmp, self.path)
+
+    @staticmethod
+    def geometry(geometry: BaseGeometry | dict | tuple[float, float]) -> BaseGeometry:
+        """Converts a shapely geometry, GeoJSON geometry or (lon, lat) pair to a shapely geometry."""
+        if isinstance(geometry, BaseGeometry):
+            return geometry
+        if isinstance(geometry, dict):
+            return shape(geometry)
+        return Point(*geometry)
+
+    def lookup(self, geometry: BaseGeometry | dict | tuple[float, float]) -> list[str]:
+        """
+        Returns the codes of cached watersheds intersecting geometry.
+
+        Parameters
+        ----------
+        geometry : shapely geometry, GeoJSON geometry, or (lon, lat)
+            Point or polygon in EPSG:4326.
+
+        Returns
+        -------
+        list of str
+            HUC8 codes in cache order. Empty if no cached watershed intersects geometry.
+        """
+        if len(self.boundaries) == 0:
+            return []
+
+        index = self.boundaries.sindex.query(self.geometry(geometry), predicate="intersects")
+        return list(dict.fromkeys(self.boundaries["huc8"].iloc[np.sort(index)]))
+
+    def covers(self, geometry: BaseGeometry | dict | tuple[float, float]) -> bool:
+        """Returns True if the cached watersheds together cover geometry."""
+        geometry = self.geometry(geometry)
+        index = self.boundaries.sindex.query(geometry, predicate="intersects") if len(self.boundaries) else []
+        if len(index) == 0:
+            return False
+        return bool(self.boundaries.geometry.iloc[index].union_all().covers(geometry))
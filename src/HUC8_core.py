@@ -1,10 +1,18 @@
-import gzip
-
 import ee
+import json
 import numpy as np
 import pandas as pd
 
-from src.ETRequest import ETRequest
+from concurrent.futures import ThreadPoolExecutor
+from logging import Logger
+from requests import Session
+from shapely import to_geojson
+
+from src.ETDecode import loads, records_frame
+from src.ETException import ETException
+from src.ETLimiter import RateLimiter
+from src.ETRequest import Request
+from src.HUC8_cache import BoundaryCache
 
 endpoints = {
     "fieldId": "https://openet-api.org/geodatabase/metadata/ids",
@@ -12,55 +20,197 @@ endpoints = {
     "timeseries": "https://openet-api.org/geodatabase/timeseries",
 }
 
+# Field IDs sent per request by request_chunks.
+FIELD_CHUNK_SIZE = 2000
+
+def request_chunks(
+    endpoint: str,
+    params: dict,
+    key: str,
+    *,
+    chunk_size: int = FIELD_CHUNK_SIZE,
+    max_workers: int = 4,
+    n_retries: int = 3,
+    session: Session | None = None,
+    limiter: RateLimiter | None = None,
+    logger: Logger | None = None,
+) -> pd.DataFrame:
+    """
+    Sends params['field_ids'] in chunks concurrently and merges the record responses.
+
+    Parameters
+    ----------
+    endpoint : str
+        Geodatabase endpoint that accepts `field_ids` and returns a gzipped list of records.
+    params : dict
+        Request parameters. Every chunk is sent with the same parameters and its own `field_ids`.
+    key : str
+        OpenET API key.
+    chunk_size : int, default FIELD_CHUNK_SIZE
+        Field IDs sent per request.
+    max_workers : int, default 4
+        Chunks in flight at once.
+    n_retries : int, default 3
+        Attempts per chunk before it is split in half and each half is retried. Only timeouts, connection errors
+        and server errors are retried. A client error, e.g. 401 for a bad key, raises at once.
+    session, limiter, logger
+        Passed to each Request.
+
+    Returns
+    -------
+    DataFrame
+        Records of every chunk in field_ids order.
+
+    Raises
+    ------
+    ETException
+        If a single field still fails after its retries, or a chunk fails with a client error.
+    """
+    field_ids = list(params["field_ids"])
+    chunks = [field_ids[index:index + chunk_size] for index in range(0, len(field_ids), chunk_size)]
+
+    def send(chunk: list) -> list[pd.DataFrame]:
+        request = Request(
+            endpoint,
+            {**params, "field_ids": chunk},
+            key=key,
+            logger=logger,
+            session=session,
+            limiter=limiter,
+            fail_fast=True,
+        )
+        res = request.send(n_retries)
+
+        if res is not None:
+            return [records_frame(res.content)]
+        if Request.client_error(request.response):
+            # Bad keys or parameters fail for any chunk, so halving would only repeat the error.
+            failed = request.response
+            raise ETException(f"Request to {endpoint} failed with {failed.status_code}: {failed.text}")
+        if len(chunk) == 1:
+            raise ETException(f"Request to {endpoint} failed for field {chunk[0]}.")
+
+        # Large chunks may time out or fail on the server. Halves are retried independently so one slow chunk does not fail the run.
+        if logger:
+            logger.warning(f"Chunk of {len(chunk)} fields failed. Retrying in halves.")
+        middle = len(chunk) // 2
+        return send(chunk[:middle]) + send(chunk[middle:])
+
+    if len(chunks) == 0:
+        return pd.DataFrame()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        frames = [frame for result in executor.map(send, chunks) for frame in result]
+
+    return pd.concat(frames, ignore_index=True)
+
 class HUC8:
-    def __init__(self, et_api_key):
-        self.dataset = ee.FeatureCollection("USGS/WBD/2017/HUC08")
+    def __init__(
+        self,
+        et_api_key,
+        session: Session | None = None,
+        limiter: RateLimiter | None = None,
+        chunk_size: int = FIELD_CHUNK_SIZE,
+        max_workers: int = 4,
+        boundaries: BoundaryCache | None = None,
+    ):
+        self.__dataset__: ee.FeatureCollection | None = None
         self.KEY = et_api_key
+        # Connection pool and rate limiter used by every request. Fall back to the shared ones.
+        self.session = session
+        self.limiter = limiter
+        # Field IDs are sent in chunks of chunk_size with up to max_workers chunks in flight.
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        # Boundaries are read from the cache before Earth Engine, and cached once fetched.
+        self.boundaries = boundaries
     
-    def get_huc8_metadata(self, huc8_id) -> pd.DataFrame:
+    @property
+    def dataset(self) -> ee.FeatureCollection:
+        # Built on first use so cached boundaries can be used without Earth Engine.
+        if self.__dataset__ is None:
+            self.__dataset__ = ee.FeatureCollection("USGS/WBD/2017/HUC08")
+        return self.__dataset__
+    
+    def get_huc8_boundary(self, huc8_id) -> dict:
+        if self.boundaries is not None:
+            info = self.boundaries.get(huc8_id)
+            if info is not None:
+                return info
+
         # Filter huc8 IDs to return element matching ID provided.
         elements: ee.Collection = self.dataset.filter(ee.Filter.eq("huc8", huc8_id))
         # Localize.
         info = elements.getInfo()
 
+        if self.boundaries is not None:
+            self.boundaries.put(info)
+        return info
+
+    def locate(self, geometry, offline: bool = False) -> list[str]:
+        """
+        Returns the HUC8 codes of watersheds intersecting a point or polygon.
+
+        Parameters
+        ----------
+        geometry : shapely geometry, GeoJSON geometry, or (lon, lat)
+            Point or polygon in EPSG:4326.
+        offline : bool, default False
+            If True, only cached boundaries are searched. Otherwise Earth Engine is queried unless
+            the cached boundaries already cover geometry, and the watersheds found are cached.
+        """
+        if self.boundaries is not None and (offline or self.boundaries.covers(geometry)):
+            return self.boundaries.lookup(geometry)
+        if offline:
+            raise ValueError("offline lookups require a BoundaryCache.")
+
+        region = ee.Geometry(json.loads(to_geojson(BoundaryCache.geometry(geometry))))
+        info = self.dataset.filterBounds(region).getInfo()
+
+        if self.boundaries is not None:
+            self.boundaries.put(info)
+        return list(dict.fromkeys(feature["properties"]["huc8"] for feature in info["features"]))
+
+    def get_huc8_metadata(self, huc8_id) -> pd.DataFrame:
+        info = self.get_huc8_boundary(huc8_id)
+
         # Extract coordinates from dataset element.
         boundaries_raw = [x["geometry"]["coordinates"] for x in info["features"]]
         # Flatten coordinate list as float values.
         boundaries = np.array(boundaries_raw).flatten().astype(float).tolist()
 
         # Request Handler for getting Field IDs from geometry.
-        id_req = ETRequest(
-            request_endpoint=endpoints["fieldId"],
-            request_params={"geometry": boundaries},
+        id_req = Request(
+            endpoint=endpoints["fieldId"],
+            params={"geometry": boundaries},
             key=self.KEY,
+            session=self.session,
+            limiter=self.limiter,
         )
         # Queue request.
         id_res = id_req.send()
 
         # Unzip data. List of Field IDs.
-        field_Ids = eval(gzip.decompress(id_res.content).decode())
+        field_Ids = loads(id_res.content)
 
-        # Request Handler for getting field metadata.
-        metadata_req = ETRequest(
-            request_endpoint=endpoints["fieldProps"],
-            request_params={"field_ids": field_Ids},
-            key=self.KEY,
+        # Field metadata, fetched in chunks. Columns ['field_id', 'hectares', 'crop_2016', ..., 'crop_2022', ...]
+        df = request_chunks(
+            endpoints["fieldProps"],
+            {"field_ids": field_Ids},
+            self.KEY,
+            chunk_size=self.chunk_size,
+            max_workers=self.max_workers,
+            session=self.session,
+            limiter=self.limiter,
         )
-        metadata_res = metadata_req.send()
-
-        # Unzips data. List of Dicts['field_id', 'hectares', 'crop_2016', ..., 'crop_2022', ...]
-        metadata = eval(gzip.decompress(metadata_res.content).decode())
-
-        # Convert to pandas dataframe.
-        df = pd.DataFrame.from_records(metadata)
 
         return df
 
     def get_timeseries_data(self, field_ids) -> pd.DataFrame:
-        # Request Handler for timeseries data.
-        req = ETRequest(
-            request_endpoint=endpoints["timeseries"],
-            request_params={
+        # Timeseries data, fetched in chunks of field IDs.
+        df = request_chunks(
+            endpoints["timeseries"],
+            {
                 "date_range": ["2022-01-01", "2022-12-31"],
                 "interval": "monthly",
                 "field_ids": field_ids,
@@ -76,12 +226,11 @@ class HUC8:
                 "variables": ["ETof"],
                 "file_format": "JSON",
             },
-            key=self.KEY,
+            self.KEY,
+            chunk_size=self.chunk_size,
+            max_workers=self.max_workers,
+            session=self.session,
+            limiter=self.limiter,
         )
-        res = req.send()
-
-        data = eval(gzip.decompress(res.content).decode())
-
-        df = pd.DataFrame(data)
 
         return df
@@ -1,7 +1,19 @@
+from src.ETAlignment import Alignment
+from src.ETArchive import ForecastArchive
 from src.ETArg import ETArg
-from src.ETException import MemoryLimitException
+from src.ETCatalog import FieldCatalog
+from src.ETClimatology import Averages, Climatology
+from src.ETException import MemoryLimitException, QuotaExceededException
 from src.ETFetch import ETFetch
-from src.ETRequest import ETRequest
+from src.ETGeometry import load_reference, simplify_geometry
+from src.ETHistory import read_history, update_history
+from src.ETLimiter import RateLimiter, get_limiter, set_limiter
+from src.ETReference import Reference
+from src.ETRequest import (
+    ETRequest, Request, ResponseCache, create_session, get_cache, get_session, set_cache, set_session
+)
+from src.ETSweep import Sweep
+from src.HUC8_cache import BoundaryCache
 from src.HUC8_core import HUC8
 
 from src.ETUtils import (
@@ -9,11 +21,34 @@ from src.ETUtils import (
 )
 
 __all__ = [
+    "Alignment",
+    "ForecastArchive",
     "ETArg",
+    "FieldCatalog",
+    "Averages",
+    "Climatology",
     "MemoryLimitException",
+    "QuotaExceededException",
     "ETFetch",
+    "load_reference",
+    "simplify_geometry",
+    "read_history",
+    "update_history",
+    "Reference",
+    "RateLimiter",
+    "get_limiter",
+    "set_limiter",
     "ETRequest",
+    "Request",
+    "ResponseCache",
+    "get_cache",
+    "set_cache",
+    "create_session",
+    "get_session",
+    "set_session",
+    "Sweep",
     "CloudStorage",
     "Authenticate",
+    "BoundaryCache",
     "HUC8"
 ]
\ No newline at end of file
@@ -0,0 +1,78 @@
+from datetime import timedelta
+from src import Alignment
+
+import numpy as np
+import pandas as pd
+import pandas.testing as pd_testing
+import pytest
+
+class Test_ETAlignment:
+    @pytest.fixture
+    def tables(self):
+        rng = np.random.default_rng(0)
+        days = pd.date_range("2024-05-01", "2024-07-31")
+        # CA_2 has no actuals and CA_1 misses June 10th.
+        historical = pd.DataFrame(
+            [(field_id, crop, day) for field_id, crop in [("CA_0", 47), ("CA_1", 62)] for day in days],
+            columns=["field_id", "crop", "time"],
+        )
+        historical = historical.loc[~((historical["field_id"] == "CA_1") & (historical["time"] == "2024-06-10"))]
+        historical = historical.sample(frac=1, random_state=0).reset_index(drop=True)
+        historical["actual_et"] = rng.random(len(historical))
+        historical["actual_eto"] = rng.random(len(historical))
+
+        forecasts = []
+        for forecasting_date in pd.date_range("2024-06-01", "2024-06-29", freq="7D"):
+            for field_id, crop in [("CA_0", 47), ("CA_1", 62), ("CA_2", 36)]:
+                forecasts.append(pd.DataFrame({
+                    "forecasting_date": forecasting_date,
+                    "field_id": field_id,
+                    "crop": crop,
+                    "time": pd.date_range(forecasting_date - timedelta(days=3), periods=14),
+                    "expected_et": rng.random(14),
+                }))
+        return historical, pd.concat(forecasts, ignore_index=True)
+
+    @staticmethod
+    def merged(historical, forecasts, how, until=None):
+        # How the notebooks pair forecasts with actuals.
+        table = historical.merge(forecasts, on=["field_id", "time", "crop"], how=how)
+        keep = (table["time"] > table["forecasting_date"]) & (table["time"] < table["forecasting_date"] + timedelta(days=7))
+        if until is not None:
+            keep &= table["time"] < until
+        return table.loc[keep]
+
+    @staticmethod
+    def ordered(table):
+        columns = ["forecasting_date", "field_id", "crop", "time", "expected_et", "actual_et", "actual_eto"]
+        return table[columns].sort_values(["forecasting_date", "field_id", "time"]).reset_index(drop=True)
+
+    def ETAlignment_pairs(self, tables):
+        historical, forecasts = tables
+        alignment = Alignment(historical, ["actual_et", "actual_eto"])
+        assert len(alignment) == len(historical)
+
+        pairs = alignment.pairs(forecasts)
+        assert pairs["lead"].between(1, 6).all()
+        pd_testing.assert_frame_equal(self.ordered(pairs), self.ordered(self.merged(historical, forecasts, "right")))
+        assert pairs.loc[pairs["field_id"] == "CA_2", "actual_et"].isna().all()
+        assert pairs.loc[(pairs["field_id"] == "CA_1") & (pairs["time"] == "2024-06-10"), "actual_et"].isna().all()
+
+        inner = alignment.pairs(forecasts, until="2024-06-20", dropna=True)
+        pd_testing.assert_frame_equal(
+            self.ordered(inner), self.ordered(self.merged(historical, forecasts, "inner", pd.Timestamp("2024-06-20")))
+        )
+
+    def ETAlignment_lookup(self, tables):
+        historical, _ = tables
+        alignment = Alignment(historical.assign(time=historical["time"].dt.strftime("%Y-%m-%d")))
+
+        assert alignment.names == ["actual_et", "actual_eto"]
+        expected = historical.set_index(["field_id", "crop", "time"]).loc[("CA_0", 47, pd.Timestamp("2024-05-01")), "actual_et"]
+        found = alignment.lookup(
+            ["CA_0", "CA_0", "CA_1", "CA_2", "CA_0"],
+            [47, 62, 62, 47, 47],
+            ["2024-05-01", "2024-05-01", "2024-06-10", "2024-05-01", "2023-12-31"],
+        )
+        assert found["actual_et"].iloc[0] == expected
+        assert found["actual_et"].iloc[1:].isna().all()
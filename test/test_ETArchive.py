@@ -0,0 +1,84 @@
+from src import ForecastArchive
+
+import logging
+import pandas as pd
+import pandas.testing as pd_testing
+import pytest
+
+class Test_ETArchive:
+    @pytest.fixture
+    def archive(self, cleandir):
+        archive = ForecastArchive("data/forecasts/archive")
+
+        def forecast(value):
+            return pd.DataFrame({
+                "field_id": ["CA_1", "CA_0", "CA_1", "CA_0"],
+                "crop": [62, 47, 62, 47],
+                "time": ["2024-06-02", "2024-06-01", "2024-06-01", "2024-06-02"],
+                "expected_et": [value] * 4,
+            })
+
+        archive.write(forecast(1.0), county="kern", forecast_date="2024-05-31")
+        archive.write(forecast(2.0), county="kern", forecast_date="2024-05-31", match_window=60, match_variable="ndvi")
+        archive.write(forecast(3.0), county="kern", forecast_date=pd.Timestamp("2024-06-07"), match_window=90)
+        archive.write(forecast(4.0), county="monterey", forecast_date="2024-05-31")
+
+        yield archive
+
+    def ETArchive_partitions(self, archive):
+        assert archive.exists("kern", "2024-05-31")
+        assert archive.exists("kern", "2024-05-31", 60, "ndvi")
+        assert not archive.exists("kern", "2024-06-07")
+
+        # Rewriting a partition replaces it.
+        archive.write(
+            pd.DataFrame({"field_id": ["CA_0"], "crop": [47], "time": ["2024-06-01"], "expected_et": [5.0]}),
+            county="monterey", forecast_date="2024-05-31",
+        )
+        assert archive.read(county="monterey")["expected_et"].tolist() == [5.0]
+
+    def ETArchive_read(self, archive):
+        kern = archive.read(county="kern", match_window=None)
+        assert kern["expected_et"].tolist() == [1.0] * 4
+        # Rows are sorted by field and time.
+        assert kern["field_id"].tolist() == ["CA_0", "CA_0", "CA_1", "CA_1"]
+        assert kern["time"].dt.strftime("%Y-%m-%d").tolist() == ["2024-06-01", "2024-06-02"] * 2
+        assert kern["forecast_date"].unique().tolist() == [pd.Timestamp("2024-05-31")]
+
+        windows = archive.read(county="kern", match_window=[60, 90])
+        assert sorted(windows["expected_et"].unique().tolist()) == [2.0, 3.0]
+        assert windows.loc[windows["match_window"] == 90, "match_variable"].isna().all()
+
+        sliced = archive.read(
+            forecast_date="2024-05-31",
+            columns=["field_id", "time", "expected_et", "county"],
+            filters=[("field_id", "==", "CA_1"), ("time", ">=", pd.Timestamp("2024-06-02"))],
+        )
+        expected = pd.DataFrame({
+            "field_id": ["CA_1"] * 3,
+            "time": pd.to_datetime(["2024-06-02"] * 3),
+            "expected_et": [1.0, 2.0, 4.0],
+            "county": ["kern", "kern", "monterey"],
+        })
+        pd_testing.assert_frame_equal(
+            sliced.sort_values("expected_et").reset_index(drop=True), expected, check_dtype=False
+        )
+
+        with pytest.raises(ValueError):
+            archive.read(version="0.0.1")
+
+    def ETArchive_missing(self, cleandir):
+        assert ForecastArchive("data/forecasts/empty").read(county="kern").empty
+
+    def ETArchive_empty(self, archive, caplog):
+        # Every field failed, so the table holds no rows and its columns are all float64, as ETFetch leaves it.
+        # Its partition sorts first, so the dataset schema would be inferred from it.
+        empty = pd.DataFrame({column: [] for column in ["field_id", "crop", "time", "expected_et"]}).astype(float)
+        archive.write(empty, county="kern", forecast_date="2024-05-24", logger=logging.getLogger(__name__))
+        assert "empty forecast" in caplog.text
+
+        kern = archive.read(county="kern")
+        assert len(kern) == 12
+        assert sorted(kern["field_id"].unique()) == ["CA_0", "CA_1"]
+        assert set(kern["crop"].tolist()) == {47, 62}
+        assert archive.read(county="kern", forecast_date="2024-05-24").empty
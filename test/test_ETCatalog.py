@@ -0,0 +1,62 @@
+from src.ETCatalog import FieldCatalog
+
+from shapely import box
+
+import pandas as pd
+
+def square(field_id, minx, miny):
+    return {
+        "type": "Feature",
+        "geometry": box(minx, miny, minx + 1, miny + 1).__geo_interface__,
+        "properties": {"field_id": field_id},
+    }
+
+def ETCatalog_fields(tmp_path):
+    catalog = FieldCatalog(tmp_path / "fields.sqlite")
+    outer = box(-0.5, -0.5, 1.5, 0.5)
+    
+    assert catalog.field_ids(outer) is None
+    catalog.put_field_ids(outer, ["06000002", "06000001"])
+    # Coordinates equal after rounding share an entry, whatever form they are given in.
+    assert catalog.field_ids([-0.5, -0.5, 1.5, -0.5, 1.5, 0.5, -0.5, 0.5, -0.5, -0.5]) is None
+    assert catalog.field_ids(box(-0.5, -0.5 + 1e-9, 1.5, 0.5)) == ["06000002", "06000001"]
+    
+    catalog.put_boundaries([square("06000001", 0, 0), square("06000002", 1, 0), square("06000003", 5, 5)])
+    assert catalog.missing_boundaries(["06000001", "06000004"]) == ["06000004"]
+    assert catalog.boundaries(["06000002", "06000001"])["field_id"].tolist() == ["06000002", "06000001"]
+    assert catalog.intersecting(outer) == ["06000001", "06000002"]
+    assert catalog.intersecting(box(10, 10, 11, 11)) == []
+    
+    catalog.put_properties(pd.DataFrame({"field_id": ["06000001", "06000002"], "crop_2023": [47, 36]}))
+    catalog.close()
+    
+    # Entries persist between runs.
+    catalog = FieldCatalog(tmp_path / "fields.sqlite")
+    assert catalog.missing_properties(["06000001", "06000003"]) == ["06000003"]
+    assert catalog.properties(["06000002", "06000001"]).to_dict("records") == [
+        {"field_id": "06000002", "crop_2023": 36},
+        {"field_id": "06000001", "crop_2023": 47},
+    ]
+    
+    # Expired entries are fetched again.
+    catalog.ttl = -1
+    assert catalog.field_ids(outer) is None
+    assert catalog.missing_boundaries(["06000001"]) == ["06000001"]
+
+def ETCatalog_coverage(tmp_path):
+    catalog = FieldCatalog(tmp_path / "fields.sqlite")
+    outer = box(-0.5, -0.5, 1.5, 0.5)
+    assert catalog.coverage(outer).is_empty
+    
+    # A query only covers its polygon once the boundaries of its fields are stored.
+    catalog.put_field_ids(outer, ["06000001", "06000002"])
+    assert catalog.coverage(outer).is_empty
+    catalog.put_boundaries([square("06000001", 0, 0), square("06000002", 1, 0)])
+    
+    shifted = box(0.5, -0.5, 2.5, 0.5)
+    assert catalog.coverage(shifted).equals(box(0.5, -0.5, 1.5, 0.5))
+    assert catalog.intersecting(catalog.coverage(shifted)) == ["06000001", "06000002"]
+    assert catalog.coverage(box(10, 10, 11, 11)).is_empty
+    
+    catalog.ttl = -1
+    assert catalog.coverage(shifted).is_empty
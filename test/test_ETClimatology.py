@@ -0,0 +1,126 @@
+from src import Averages, Climatology, ETArg, ETFetch
+
+from collections import deque
+
+import json
+import numpy as np
+import pandas as pd
+import pandas.testing as pd_testing
+import pytest
+import requests_mock as rm
+
+class Test_ETClimatology:
+    @pytest.fixture
+    def history(self):
+        days = pd.date_range("2019-12-30", "2021-01-02")
+        rng = np.random.default_rng(0)
+        table = pd.concat([
+            pd.DataFrame({
+                "field_id": field_id,
+                "crop": crop,
+                "time": days.strftime("%Y-%m-%d"),
+                "actual_et": rng.random(len(days)),
+                "actual_eto": rng.random(len(days)),
+            })
+            for field_id, crop in [("CA_1", 47), ("CA_0", 62), ("CA_0", 47)]
+        ], ignore_index=True)
+        table.loc[2, "actual_et"] = np.nan
+
+        yield table
+
+    def ETClimatology_from_history(self, history):
+        climatology = Climatology.from_history(history, ["actual_et", "actual_eto"])
+
+        history["doy"] = pd.to_datetime(history["time"]).dt.dayofyear
+        expected = history.groupby(["field_id", "crop", "doy"])[["actual_et", "actual_eto"]].mean().reset_index()
+
+        assert len(climatology) == 3
+        pd_testing.assert_frame_equal(climatology.to_frame(), expected, check_dtype=False)
+
+        # Read back from the table it was written as.
+        pd_testing.assert_frame_equal(Climatology.from_frame(expected).to_frame(), expected, check_dtype=False)
+
+    def ETClimatology_slice(self, history):
+        climatology = Climatology.from_history(history, ["actual_et", "actual_eto"])
+        rows = history[(history["field_id"] == "CA_0") & (history["crop"] == 62)]
+
+        # Day of year 1 was observed in 2020 and 2021, day 366 only in 2020.
+        first = rows.loc[rows["time"].isin(["2020-01-01", "2021-01-01"]), "actual_eto"].mean()
+        leap = rows.loc[rows["time"] == "2020-12-31", "actual_eto"].iloc[0]
+
+        values = climatology.slice("CA_0", 62, 1, 3, "actual_eto")
+        assert len(values) == 3
+        assert values[0] == pytest.approx(first)
+        assert climatology.get("CA_0", 62, "actual_eto")[365] == pytest.approx(leap)
+        assert len(climatology.slice("CA_0", 62, 10, 9, "actual_eto")) == 0
+
+        assert ("CA_1", 47) in climatology
+        assert climatology.rows(["CA_1", "CA_1"], [47, 62]).tolist() == [climatology.row("CA_1", 47), -1]
+        with pytest.raises(KeyError):
+            climatology.row("CA_1", 62)
+
+    def ETClimatology_streaming(self, requests_mock: rm.Mocker, cleandir):
+        cwd = cleandir
+        reference = pd.read_csv(f'{cwd}/test/mock_fields.csv').set_index('OPENET_ID')
+        days = pd.date_range("2023-12-25", "2024-01-05").strftime("%Y-%m-%d")
+
+        def respond(request, context):
+            # Values depend on the field's geometry and the day.
+            params = request.json()
+            context.status_code = 200
+            return json.dumps([
+                {"time": day, "et": params["geometry"][0] + position} for position, day in enumerate(days)
+            ]).encode()
+
+        requests_mock.post(url="https://developer.openet.org/awesome_endpoint", content=respond)
+
+        et_arg = ETArg(
+            "actual_et",
+            args={
+                "endpoint": "https://developer.openet.org/awesome_endpoint",
+                "date_range": ["2023-12-25", "2024-01-05"],
+                "variable": "ET",
+            },
+        )
+
+        climatology = Climatology(["actual_et"])
+        averages = Averages(["actual_et"], 2024)
+
+        def accumulate(field_id, crop, contents):
+            climatology.add(field_id, crop, contents)
+            averages.add(field_id, crop, contents)
+
+        fetch = ETFetch(deque(['CA_0', 'CA_1', 'CA_2']), reference, api_key='1234567890')
+        fetch.start(request_args=[et_arg], frequency='daily', packets=False, on_field=accumulate)
+
+        pd_testing.assert_frame_equal(climatology.to_frame(), Climatology.from_history(fetch.data_table, ["actual_et"]).to_frame())
+
+        table = fetch.data_table.assign(time=pd.to_datetime(fetch.data_table["time"]))
+        expected = table[table["time"].dt.year == 2024].groupby(["field_id", "crop"])[["actual_et"]].mean().reset_index()
+        pd_testing.assert_frame_equal(averages.to_frame(), expected, check_dtype=False)
+        pd_testing.assert_frame_equal(
+            Averages.from_history(fetch.data_table, ["actual_et"], 2024).to_frame(), expected, check_dtype=False
+        )
+
+    def ETClimatology_growth(self, history):
+        expected = Climatology.from_history(history, ["actual_et", "actual_eto"])
+
+        # Keys added one at a time outgrow the initial capacity several times.
+        climatology = Climatology(["actual_et", "actual_eto"], capacity=1)
+        for (field_id, crop), rows in history.groupby(["field_id", "crop"], sort=False):
+            climatology.add(field_id, crop, {
+                name: [{"time": time, "et": value} for time, value in zip(rows["time"], rows[name])]
+                for name in ["actual_et", "actual_eto"]
+            })
+            climatology.means("actual_et")
+        for field_id in range(40):
+            climatology.add(f"CA_{field_id + 2}", 47, {"actual_et": [{"time": "2020-01-01", "et": field_id}]})
+
+        assert len(climatology) == 43
+        assert climatology.present().shape == (43, 366)
+        assert climatology.means("actual_eto").shape == (43, 366)
+        assert climatology.get("CA_41", 47, "actual_et")[0] == 39
+        frame = climatology.to_frame()
+        pd_testing.assert_frame_equal(
+            frame[frame["field_id"].isin(["CA_0", "CA_1"])].reset_index(drop=True), expected.to_frame(), check_dtype=False
+        )
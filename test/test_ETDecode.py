@@ -0,0 +1,33 @@
+from src.ETDecode import decompress, loads, records_frame
+
+from io import BytesIO
+
+import gzip
+import json
+import pandas as pd
+import pandas.testing as pd_testing
+
+RECORDS = [
+    {"field_id": "06270812", "time": "2022-01-01", "value_mm": 0.51},
+    {"field_id": "06270813", "time": "2022-01-01", "value_mm": None},
+]
+
+def ETDecode_gzip_and_plain():
+    body = json.dumps(RECORDS).encode()
+    
+    assert decompress(gzip.compress(body)) == body
+    assert decompress(body) == body
+    # File-like bodies, e.g. Response.raw, are decompressed as they are read.
+    assert loads(BytesIO(gzip.compress(body))) == RECORDS
+    assert loads(gzip.compress(b'["06270812", "06270813"]')) == ["06270812", "06270813"]
+
+def ETDecode_records_frame():
+    df = records_frame(gzip.compress(json.dumps(RECORDS).encode()))
+    
+    pd_testing.assert_frame_equal(df, pd.DataFrame.from_records(RECORDS))
+    assert records_frame(gzip.compress(b'[]'), columns=["field_id"]).columns.tolist() == ["field_id"]
+    
+    # Keys missing from the first record are kept, as from_records does.
+    records = [{"field_id": "06270812", "crop_2022": 47}, {"field_id": "06270813", "crop_2022": 62, "crop_2023": 36}]
+    df = records_frame(json.dumps(records).encode())
+    pd_testing.assert_frame_equal(df, pd.DataFrame.from_records(records))
@@ -1,4 +1,4 @@
-from src import ETFetch, ETArg
+from src import ETFetch, ETArg, Reference
 
 from collections import deque
 from copy import deepcopy
@@ -7,11 +7,15 @@ from pathlib import Path
 
 from google.cloud.storage import Blob
 
+import gzip
+import json
 import logging
 import pandas as pd
 import pandas.testing as pd_testing
 import pytest
 import requests_mock as rm
+import sys
+import threading
 
 class Test_ETFetch:
     @pytest.fixture
@@ -57,6 +61,271 @@ class Test_ETFetch:
         
         pd_testing.assert_frame_equal(fetch.data_table, result_data, check_like=True, check_dtype=False) # Ignore order.
 
+    def ETFetch_in_memory(self, requests_mock: rm.Mocker, setup, cleandir):
+        queue, reference, et_arg = setup
+        cwd = cleandir
+        
+        requests_mock.post(
+            url="https://developer.openet.org/awesome_endpoint", response_list=
+            [
+                {"status_code": 200, "content": b'[{"time": "2023-06-01", "et": 0.12}]'},
+                {"status_code": 200, "content": b'[{"time": "2023-06-01", "et": 0.15}]'},
+                {"status_code": 200, "content": b'[{"time": "2023-06-01", "et": 0.13}]'},
+            ],
+        )
+        
+        fetch = ETFetch(deepcopy(queue), reference, api_key='1234567890')
+        fetch.__temp_bin__ = "data/bin/in_memory/"
+        fetch.start(request_args=[et_arg], frequency='monthly', packets=False)
+        
+        result_data = pd.read_csv(f"{cwd}/test/mock_result.csv")
+        
+        # No packets are written when data is kept in memory.
+        assert len(list(Path(fetch.__temp_bin__).glob('*.csv'))) == 0
+        
+        pd_testing.assert_frame_equal(fetch.data_table, result_data, check_like=True, check_dtype=False)
+
+    def ETFetch_reference(self, requests_mock: rm.Mocker, setup, cleandir):
+        queue, reference, et_arg = setup
+        cwd = cleandir
+        
+        requests_mock.post(
+            url="https://developer.openet.org/awesome_endpoint", response_list=
+            [
+                {"status_code": 200, "content": b'[{"time": "2023-06-01", "et": 0.12}]'},
+                {"status_code": 200, "content": b'[{"time": "2023-06-01", "et": 0.15}]'},
+                {"status_code": 200, "content": b'[{"time": "2023-06-01", "et": 0.13}]'},
+            ] * 2,
+        )
+        
+        prepared = Reference(reference)
+        result_data = pd.read_csv(f"{cwd}/test/mock_result.csv")
+        
+        # One prepared reference is shared by every run.
+        for run in range(2):
+            fetch = ETFetch(deepcopy(queue), prepared, api_key='1234567890')
+            fetch.__temp_bin__ = f"data/bin/reference_{run}/"
+            fetch.start(request_args=[et_arg], frequency='monthly', packets=False)
+            
+            pd_testing.assert_frame_equal(fetch.data_table, result_data, check_like=True, check_dtype=False)
+        
+        # Requests carry the same geometry as the unprepared reference.
+        for request, field_id in zip(requests_mock.request_history, list(queue) * 2):
+            assert request.json()["geometry"] == json.loads(reference['.geo'][field_id])['coordinates']
+
+    def ETFetch_parquet_resume(self, requests_mock: rm.Mocker, setup, cleandir):
+        queue, reference, et_arg = setup
+        cwd = cleandir
+        
+        requests_mock.post(
+            url="https://developer.openet.org/awesome_endpoint", response_list=
+            [
+                {"status_code": 200, "content": b'[{"time": "2023-06-01", "et": 0.12}]'},
+                {"status_code": 200, "content": b'[{"time": "2023-06-01", "et": 0.15}]'},
+                {"status_code": 200, "content": b'[{"time": "2023-06-01", "et": 0.13}]'},
+            ],
+        )
+        
+        fetch = ETFetch(deepcopy(queue), reference, api_key='1234567890')
+        fetch.__temp_bin__ = "data/bin/parquet/"
+        fetch.start(request_args=[et_arg], frequency='monthly', packet_format='parquet')
+        
+        result_data = pd.read_csv(f"{cwd}/test/mock_result.csv", parse_dates=['time'])
+        
+        assert len(list(Path(fetch.__temp_bin__).glob('et/*.parquet'))) == 1
+        pd_testing.assert_frame_equal(fetch.data_table, result_data, check_like=True, check_dtype=False)
+        
+        # Resuming from the same bin skips every stored field.
+        resumed = ETFetch(deepcopy(queue), reference, api_key='1234567890')
+        resumed.__temp_bin__ = fetch.__temp_bin__
+        resumed.start(request_args=[et_arg], frequency='monthly', packet_format='parquet')
+        
+        assert requests_mock.call_count == 3
+        pd_testing.assert_frame_equal(resumed.data_table, result_data, check_like=True, check_dtype=False)
+
+    def ETFetch_manifest_resume(self, requests_mock: rm.Mocker, setup, cleandir):
+        queue, reference, et_arg = setup
+        bin_path = Path("data/bin/manifest/")
+        bin_path.mkdir(parents=True)
+        # CA_0 is journaled. CA_1 was written by a run that crashed before its journal line was complete.
+        (bin_path / "CA_0.47.et.csv").write_text("time,et\n2023-06-01,0.12\n")
+        (bin_path / "CA_1.62.et.csv").write_text("time,et\n")
+        (bin_path / "manifest.log").write_text("CA_0\t47\tet\nCA_1\t62")
+        
+        requests_mock.post(
+            url="https://developer.openet.org/awesome_endpoint", response_list=
+            [
+                {"status_code": 200, "content": b'[{"time": "2023-06-01", "et": 0.15}]'},
+                {"status_code": 200, "content": b'[{"time": "2023-06-01", "et": 0.13}]'},
+            ],
+        )
+        
+        fetch = ETFetch(deepcopy(queue), reference, api_key='1234567890')
+        fetch.__temp_bin__ = str(bin_path)
+        fetch.start(request_args=[et_arg], frequency='monthly')
+        
+        # Only CA_0 is skipped. The torn line for CA_1 is ignored and terminated before appending.
+        assert requests_mock.call_count == 2
+        assert (bin_path / "manifest.log").read_text().splitlines() == [
+            "CA_0\t47\tet", "CA_1\t62", "CA_1\t62\tet", "CA_2\t47\tet"
+        ]
+        assert len(fetch.data_table) == 3
+        
+        # Without a manifest the bin is scanned once and recorded.
+        (bin_path / "manifest.log").unlink()
+        resumed = ETFetch(deepcopy(queue), reference, api_key='1234567890')
+        resumed.__temp_bin__ = str(bin_path)
+        resumed.start(request_args=[et_arg], frequency='monthly')
+        
+        assert requests_mock.call_count == 2
+        assert len((bin_path / "manifest.log").read_text().splitlines()) == 3
+
+    def ETFetch_coalesced(self, requests_mock: rm.Mocker, setup, cleandir):
+        queue, reference, et_arg = setup
+        eto_arg = deepcopy(et_arg)
+        eto_arg.name = "eto"
+        eto_arg.variable = "ETo"
+        
+        def respond(request, context):
+            params = request.json()
+            assert params["variables"] == ["ET", "ETo"] and "variable" not in params
+            context.status_code = 200
+            return b'[{"time": "2023-06-01", "et": 0.12, "eto": 1.2}]'
+        
+        requests_mock.post(url="https://developer.openet.org/awesome_endpoint", content=respond)
+        
+        fetch = ETFetch(deepcopy(queue), reference, api_key='1234567890')
+        fetch.__temp_bin__ = "data/bin/coalesced/"
+        failed = fetch.start(request_args=[et_arg, eto_arg], frequency='monthly', coalesce=True)
+        
+        # One request per field instead of one per ETArg.
+        assert requests_mock.call_count == 3
+        assert failed == 0
+        assert len(list(Path(fetch.__temp_bin__).glob('*.csv'))) == 6
+        assert fetch.data_table["et"].tolist() == [0.12] * 3
+        assert fetch.data_table["eto"].tolist() == [1.2] * 3
+
+    def ETFetch_bulk(self, requests_mock: rm.Mocker, setup, cleandir):
+        queue, reference, et_arg = setup
+        cwd = cleandir
+        
+        def respond(request, context):
+            params = request.json()
+            assert params["variables"] == ["ET"]
+            values = {"060": 0.12, "061": 0.15, "062": 0.13}
+            records = [
+                {"field_id": field_id, "time": "2023-06-01", "collection": "ensemble", "value_mm": values[field_id]}
+                for field_id in params["field_ids"]
+            ]
+            context.status_code = 200
+            return gzip.compress(json.dumps(records).encode())
+        
+        requests_mock.post(url="https://developer.openet-api.org/geodatabase/timeseries", content=respond)
+        
+        fetch = ETFetch(deepcopy(queue), reference, api_key='1234567890')
+        fetch.__temp_bin__ = "data/bin/bulk/"
+        failed = fetch.start_bulk(request_args=[et_arg], frequency='monthly', chunk_size=2)
+        
+        result_data = pd.read_csv(f"{cwd}/test/mock_result.csv")
+        
+        # Three fields in chunks of two.
+        assert requests_mock.call_count == 2
+        assert failed == 0
+        pd_testing.assert_frame_equal(fetch.data_table, result_data, check_like=True, check_dtype=False)
+
+    def ETFetch_concurrent(self, requests_mock: rm.Mocker, monkeypatch, setup, cleandir):
+        queue, reference, et_arg = setup
+        # Skip retry backoff. The module is shadowed by the ETRequest class in the src namespace.
+        monkeypatch.setattr(sys.modules["src.ETRequest"].time, "sleep", lambda _: None)
+        eto_arg = deepcopy(et_arg)
+        eto_arg.name = "eto"
+        eto_arg.variable = "ETo"
+        
+        # Responses are keyed by request payload as concurrent requests arrive in any order.
+        values = {(1.6, "ET"): 0.12, (1.6, "ETo"): 1.2, (-2.7, "ET"): 0.15, (-2.7, "ETo"): 1.5}
+        
+        def respond(request, context):
+            params = request.json()
+            key = (params["geometry"][0], params["variable"])
+            if key not in values:
+                context.status_code = 403
+                return b''
+            context.status_code = 200
+            return f'[{{"time": "2023-06-01", "{params["variable"].lower()}": {values[key]}}}]'.encode()
+        
+        requests_mock.post(url="https://developer.openet.org/awesome_endpoint", content=respond)
+        
+        fetch = ETFetch(deepcopy(queue), reference, api_key='1234567890')
+        fetch.__temp_bin__ = "data/bin/concurrent/"
+        failed = fetch.start(request_args=[et_arg, eto_arg], frequency='monthly', packets=True, max_workers=4)
+        
+        # CA_2 has no ETo response so the entire field is discarded.
+        assert failed == 1
+        assert len(fetch.fields_queue) == 0
+        assert len(list(Path(fetch.__temp_bin__).glob('*.csv'))) == 4
+        
+        expected = pd.DataFrame({
+            "field_id": ["CA_0", "CA_1"],
+            "crop": [47, 62],
+            "time": ["2023-06-01", "2023-06-01"],
+            "et": [0.12, 0.15],
+            "eto": [1.2, 1.5],
+        })
+        result = fetch.data_table.sort_values("field_id").reset_index(drop=True)
+        pd_testing.assert_frame_equal(result, expected, check_like=True, check_dtype=False)
+
+    def ETFetch_slow_field(self, requests_mock: rm.Mocker, setup, cleandir, monkeypatch):
+        queue, reference, et_arg = setup
+        
+        requests_mock.post(url="https://developer.openet.org/awesome_endpoint", content=b'[{"time": "2023-06-01", "et": 0.12}]')
+        
+        fetch = ETFetch(deepcopy(queue), reference, api_key='1234567890')
+        fetch.__temp_bin__ = "data/bin/slow/"
+        
+        # CA_0 is held until CA_2 has been requested, i.e. later fields keep being dispatched behind a slow one.
+        # Held outside of the mocked send, which requests_mock serializes.
+        request = fetch.__request__
+        requested = threading.Event()
+        waited = []
+        
+        def slow_request(req, arg, *args):
+            if arg["geometry"][0] == 1.6:
+                waited.append(requested.wait(timeout=5))
+            elif arg["geometry"][0] == 2.81:
+                requested.set()
+            return request(req, arg, *args)
+        
+        fetch.__request__ = slow_request
+        failed = fetch.start(request_args=[et_arg], frequency='monthly', packets=False, max_workers=2)
+        
+        assert waited == [True]
+        assert failed == 0
+        # Fields are still stored in dispatch order.
+        assert fetch.data_table["field_id"].tolist() == ["CA_0", "CA_1", "CA_2"]
+
+        # With room for two unstored fields, CA_2 is not requested until CA_0 is stored.
+        monkeypatch.setattr(sys.modules["src.ETFetch"], "REORDER_LIMIT", 1)
+        requested.clear()
+        waited.clear()
+
+        fetch = ETFetch(deepcopy(queue), reference, api_key='1234567890')
+        fetch.__temp_bin__ = "data/bin/capped/"
+        request = fetch.__request__
+
+        def capped_request(req, arg, *args):
+            if arg["geometry"][0] == 1.6:
+                waited.append(requested.wait(timeout=0.5))
+            elif arg["geometry"][0] == 2.81:
+                requested.set()
+            return request(req, arg, *args)
+
+        fetch.__request__ = capped_request
+        failed = fetch.start(request_args=[et_arg], frequency='monthly', packets=False, max_workers=2)
+
+        assert waited == [False]
+        assert failed == 0
+        assert fetch.data_table["field_id"].tolist() == ["CA_0", "CA_1", "CA_2"]
+
     @pytest.mark.skip(reason="Requests mock is producing inconsistent behavior. Needs investigating.")
     def ETFetch_missing_field(self, monkeypatch, requests_mock, setup):
         queue, reference, et_arg = setup
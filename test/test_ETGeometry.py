@@ -0,0 +1,96 @@
+from src.ETGeometry import MAX_VERTICES, load_reference, simplification_from_config, simplify_geometry
+
+import json
+import numpy as np
+import pandas as pd
+
+def circle(n):
+    angles = np.linspace(0, 2 * np.pi, n)
+    ring = np.column_stack([-119 + 0.01 * np.cos(angles), 35 + 0.01 * np.sin(angles)])
+    return ring
+
+def ETGeometry_simplify_flat():
+    # '.geo' polygons hold their coordinates as one flat list.
+    geometry = {"type": "Polygon", "coordinates": circle(5001).ravel().tolist()}
+    
+    simplified = simplify_geometry(geometry, precision=6, max_vertices=200)
+    points = np.asarray(simplified["coordinates"]).reshape(-1, 2)
+    
+    assert 4 <= len(points) <= 200
+    # Rings stay closed and within the original's extent.
+    assert np.allclose(points[0], points[-1])
+    assert np.abs(points - [-119, 35]).max() <= 0.0100001
+    assert all(round(value, 6) == value for value in simplified["coordinates"])
+    
+    # Nothing changes without parameters.
+    assert simplify_geometry(geometry) == geometry
+
+def ETGeometry_simplify_geojson():
+    ring = circle(1001).tolist()
+    geometry = {"type": "MultiPolygon", "coordinates": [[ring], [ring, ring[::-1]]]}
+    
+    simplified = simplify_geometry(geometry, tolerance=1e-4)
+    
+    assert [len(polygon) for polygon in simplified["coordinates"]] == [1, 2]
+    assert sum(len(ring) for polygon in simplified["coordinates"] for ring in polygon) < 3 * 1001
+    
+    point = {"type": "Point", "coordinates": [-121.64489395805282, 36.633390650961346]}
+    assert simplify_geometry(point, tolerance=1e-4, precision=5)["coordinates"] == [-121.64489, 36.63339]
+
+def ETGeometry_load_reference(tmp_path):
+    source = tmp_path / "polygons.csv"
+    pd.DataFrame({
+        "OPENET_ID": ["CA_244144"],
+        "CROP_2023": [47],
+        ".geo": [json.dumps({"type": "Polygon", "coordinates": circle(5001).ravel().tolist()})],
+    }).to_csv(source, index=False)
+    
+    reference = load_reference(source, "OPENET_ID", max_vertices=500, cache_dir=tmp_path / "cache")
+    cached = load_reference(source, "OPENET_ID", max_vertices=500, cache_dir=tmp_path / "cache")
+    
+    assert len(list((tmp_path / "cache").glob("*.csv"))) == 1
+    pd.testing.assert_frame_equal(reference, cached)
+    assert len(json.loads(reference[".geo"]["CA_244144"])["coordinates"]) <= 1000
+
+def ETGeometry_simplify_flat_multipolygon():
+    # polygon_fetch writes MultiPolygon rings back to back as one list of points.
+    first, second = circle(1001), circle(501) + [0.05, 0]
+    geometry = {"type": "MultiPolygon", "coordinates": np.concatenate([first, second]).tolist()}
+    
+    simplified = simplify_geometry(geometry, tolerance=1e-4, precision=6)
+    points = np.asarray(simplified["coordinates"])
+    
+    assert points.ndim == 2 and points.shape[1] == 2
+    assert 8 <= len(points) < 1502
+    # Both rings are kept and stay closed.
+    assert np.allclose(points[0], first[0])
+    assert (np.abs(points[:, 0] - (-118.95)) <= 0.0100001).any()
+    closed = [position for position in range(1, len(points)) if np.allclose(points[position], points[0])]
+    assert len(closed) == 1 and np.allclose(points[closed[0] + 1], np.round(second[0], 6))
+    assert np.allclose(points[-1], points[closed[0] + 1])
+    
+    assert simplify_geometry(geometry) == geometry
+
+def ETGeometry_simplify_unreachable():
+    # A cap below what any ring can be simplified to keeps the smallest simplification rather than the original.
+    geometry = {"type": "Polygon", "coordinates": [circle(1001).tolist(), (circle(1001) * 0.5).tolist()]}
+    
+    simplified = simplify_geometry(geometry, max_vertices=4)
+    
+    assert 8 <= sum(len(ring) for ring in simplified["coordinates"]) < 100
+
+def ETGeometry_load_reference_unsimplified(tmp_path):
+    source = tmp_path / "polygons.csv"
+    pd.DataFrame({
+        "OPENET_ID": ["CA_244144"],
+        "CROP_2023": [47],
+        ".geo": [json.dumps({"type": "Polygon", "coordinates": circle(501).ravel().tolist()})],
+    }).to_csv(source, index=False)
+    
+    # Simplification is opt-in, so geometries are read as they are by default.
+    reference = load_reference(source, "OPENET_ID", cache_dir=tmp_path / "cache")
+    
+    pd.testing.assert_frame_equal(reference, pd.read_csv(source).set_index("OPENET_ID"))
+    assert not (tmp_path / "cache").exists()
+    assert simplification_from_config({}) == {}
+    assert simplification_from_config({"ET_SIMPLIFY_GEOMETRY": "1"})["max_vertices"] == MAX_VERTICES
@@ -0,0 +1,84 @@
+from src import ETArg, update_history
+from src.ETHistory import history_starts
+
+from collections import deque
+
+import json
+import pandas as pd
+import pytest
+import requests_mock as rm
+
+class Test_ETHistory:
+    @pytest.fixture
+    def setup(self, cleandir):
+        queue = deque(['CA_0', 'CA_1', 'CA_2'])
+        cwd = cleandir
+        reference = pd.read_csv(f'{cwd}/test/mock_fields.csv').set_index('OPENET_ID')
+
+        et_arg = ETArg(
+            "et",
+            args={
+                "endpoint": "https://developer.openet.org/awesome_endpoint",
+                "date_range": ["2023-06-01", "2023-06-05"],
+                "variable": "ET",
+            },
+        )
+
+        # CA_0 is complete up to June 3rd, CA_1 is missing its value for June 3rd and CA_2 has no history.
+        history = pd.DataFrame({
+            'field_id': ['CA_0', 'CA_0', 'CA_0', 'CA_1', 'CA_1', 'CA_1'],
+            'crop': [47, 47, 47, 62, 62, 62],
+            'time': ['2023-06-01', '2023-06-02', '2023-06-03', '2023-06-01', '2023-06-02', '2023-06-03'],
+            'et': [1.0, 1.0, 1.0, 2.0, 2.0, None],
+        })
+
+        yield queue, reference, et_arg, history
+
+    def ETHistory_starts(self, setup):
+        queue, _, et_arg, history = setup
+
+        assert history_starts(history, queue, ['et'], '2023-06-01') == {
+            'CA_0': '2023-06-04', 'CA_1': '2023-06-03', 'CA_2': '2023-06-01'
+        }
+        assert history_starts(history, queue, ['et'], '2023-06-01', 'monthly') == {
+            'CA_0': '2023-06-01', 'CA_1': '2023-06-01', 'CA_2': '2023-06-01'
+        }
+        assert history_starts(None, queue, ['et'], '2023-06-01') == {
+            'CA_0': '2023-06-01', 'CA_1': '2023-06-01', 'CA_2': '2023-06-01'
+        }
+
+    def ETHistory_update(self, requests_mock: rm.Mocker, setup):
+        queue, reference, et_arg, history = setup
+
+        def respond(request, context):
+            # Returns every day of the requested range with a value of 9.
+            params = request.json()
+            context.status_code = 200
+            days = pd.date_range(*params["date_range"]).strftime('%Y-%m-%d')
+            return json.dumps([{"time": day, "et": 9.0} for day in days]).encode()
+
+        requests_mock.post(url="https://developer.openet.org/awesome_endpoint", content=respond)
+
+        fetch = update_history(
+            history, queue, reference, api_key='1234567890', request_args=[et_arg], end_date='2023-06-05', packets=False
+        )
+
+        ranges = sorted(tuple(request.json()["date_range"]) for request in requests_mock.request_history)
+        assert ranges == [
+            ('2023-06-01', '2023-06-05'), ('2023-06-03', '2023-06-05'), ('2023-06-04', '2023-06-05')
+        ]
+        # The original arguments are left as they were.
+        assert et_arg.date_range == ["2023-06-01", "2023-06-05"]
+
+        table = fetch.data_table
+        assert table['field_id'].tolist() == ['CA_0'] * 5 + ['CA_1'] * 5 + ['CA_2'] * 5
+        assert table.groupby('field_id')['time'].apply(list).map(len).tolist() == [5, 5, 5]
+        assert table['et'].tolist() == [1.0, 1.0, 1.0, 9.0, 9.0] + [2.0, 2.0, 9.0, 9.0, 9.0] + [9.0] * 5
+
+        # Nothing is requested once history is up to date.
+        calls = requests_mock.call_count
+        again = update_history(
+            table, queue, reference, api_key='1234567890', request_args=[et_arg], end_date='2023-06-05', packets=False
+        )
+        assert requests_mock.call_count == calls
+        assert again.data_table['et'].tolist() == table['et'].tolist()
@@ -0,0 +1,54 @@
+from src.ETException import QuotaExceededException
+from src.ETLimiter import RateLimiter
+
+import json
+import pytest
+import time
+
+def ETLimiter_burst_then_rate():
+    limiter = RateLimiter(rate=20, burst=2)
+    
+    start = time.monotonic()
+    limiter.acquire()
+    limiter.acquire()
+    # Burst is spent without waiting.
+    assert time.monotonic() - start < 0.04
+    
+    limiter.acquire()
+    limiter.acquire()
+    # Remaining requests are spaced by 1 / rate.
+    assert time.monotonic() - start >= 0.09
+    assert limiter.used == 4
+
+def ETLimiter_pause():
+    limiter = RateLimiter(rate=1000, burst=5)
+    limiter.pause(0.1)
+    
+    start = time.monotonic()
+    limiter.acquire()
+    
+    assert time.monotonic() - start >= 0.09
+
+def ETLimiter_quota(tmp_path):
+    quota_path = tmp_path / "quota.json"
+    limiter = RateLimiter(rate=1000, burst=5, quota=2, quota_path=quota_path)
+    
+    limiter.acquire()
+    limiter.acquire()
+    assert limiter.remaining == 0
+    
+    with pytest.raises(QuotaExceededException):
+        limiter.acquire()
+    
+    # Usage carries over to the next run in the same month.
+    assert json.loads(quota_path.read_text())["used"] == 2
+    assert RateLimiter(rate=1000, quota=2, quota_path=quota_path).remaining == 0
+
+def ETLimiter_from_config():
+    assert RateLimiter.from_config({}) is None
+    
+    limiter = RateLimiter.from_config({"ET_RATE_PER_MINUTE": "120", "ET_BURST": "4"})
+    
+    assert limiter.rate == 2
+    assert limiter.burst == 4
+    assert limiter.quota is None
@@ -1,8 +1,11 @@
-from src.ETRequest import Request
+from src.ETLimiter import RateLimiter
+from src.ETRequest import Request, ResponseCache, create_session, get_session
 
 import logging
+import os
 import pytest
 import requests
+import time
 
 from dotenv import dotenv_values
 from requests.exceptions import Timeout
@@ -126,6 +129,85 @@ def ETRequest_missing_attributes():
                 params={"param": "val"}).send()
     assert "Request has no API key." in str(key_err.value)
     
+def ETRequest_shared_session(requests_mock):
+    session = create_session(pool_maxsize=8, pool_block=True)
+    adapter = session.get_adapter("https://developer.openet.org")
+    
+    assert adapter._pool_maxsize == 8
+    assert adapter._pool_block is True
+    # Requests without their own session share one pool.
+    assert get_session() is get_session()
+    
+    res = Request(
+        endpoint="https://developer.openet.org/awesome_endpoint",
+        params={"param": "val"},
+        key="1234567890",
+        session=session,
+    )
+    
+    requests_mock.post(res.endpoint, status_code=200)
+    
+    res.send()
+    
+    assert res.success() is True
+    assert requests_mock.call_count == 1    # Stops after the first successful attempt.
+
+def ETRequest_rate_limited(requests_mock):
+    limiter = RateLimiter(rate=1000, burst=5)
+    res = Request(
+        endpoint="https://developer.openet.org/awesome_endpoint",
+        params={"param": "val"},
+        key="1234567890",
+        limiter=limiter,
+    )
+    
+    requests_mock.post(res.endpoint, [{"status_code": 429, "headers": {"Retry-After": "0.2"}}, {"status_code": 200}])
+    
+    start = time.monotonic()
+    res.send()
+    elapsed = time.monotonic() - start
+    
+    assert res.success() is True
+    assert limiter.used == 2
+    # Waits for Retry-After instead of the 2 second exponential backoff.
+    assert 0.2 <= elapsed < 1
+
+def ETRequest_cached(requests_mock, tmp_path):
+    cache = ResponseCache(tmp_path, ttl=60)
+    endpoint = "https://developer.openet.org/awesome_endpoint"
+    requests_mock.post(endpoint, status_code=200, content=b'[{"time": "2023-06-01", "et": 0.12}]')
+    
+    first = Request(endpoint=endpoint, params={"a": 1, "b": [1, 2]}, key="1234567890", cache=cache).send()
+    # Parameter order and API key are not part of the cache key.
+    second = Request(endpoint=endpoint, params={"b": [1, 2], "a": 1}, key="0987654321", cache=cache).send()
+    
+    assert requests_mock.call_count == 1
+    assert second.status_code == 200
+    assert second.content == first.content
+    
+    # Expired bodies are fetched again.
+    cache.ttl = 0
+    time.sleep(0.01)
+    Request(endpoint=endpoint, params={"a": 1, "b": [1, 2]}, key="1234567890", cache=cache).send()
+    
+    assert requests_mock.call_count == 2
+
+def ETRequest_cache_eviction(tmp_path):
+    cache = ResponseCache(tmp_path, max_bytes=10)
+    endpoint = "https://developer.openet.org/awesome_endpoint"
+    
+    for index in range(3):
+        response = requests.Response()
+        response._content = b"12345"
+        cache.put(endpoint, {"index": index}, response)
+        # Access times are ordered explicitly so the test does not depend on filesystem resolution.
+        path = tmp_path / cache.key(endpoint, {"index": index})[:2] / cache.key(endpoint, {"index": index})
+        os.utime(path, (index, index))
+    
+    # Least recently used body is evicted to stay under 10 bytes.
+    assert cache.get(endpoint, {"index": 0}) is None
+    assert cache.get(endpoint, {"index": 2}).content == b"12345"
+
 
 ###--- Stress Test ---###
 @pytest.mark.skipif(
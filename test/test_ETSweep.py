@@ -0,0 +1,139 @@
+from src import ETArg, Sweep
+
+from collections import deque
+from copy import deepcopy
+from pathlib import Path
+
+import json
+import pandas as pd
+import pandas.testing as pd_testing
+import pytest
+import requests_mock as rm
+import sys
+import threading
+
+class Test_ETSweep:
+    @pytest.fixture
+    def setup(self, cleandir):
+        queue = deque(['CA_0', 'CA_1', 'CA_2'])
+        cwd = cleandir
+        reference = pd.read_csv(f'{cwd}/test/mock_fields.csv').set_index('OPENET_ID')
+        
+        yield queue, reference
+    
+    def ETSweep_grid(self, requests_mock: rm.Mocker, setup, cleandir):
+        queue, reference = setup
+        cwd = cleandir
+        
+        values = {1.6: 0.12, -2.7: 0.15, 2.81: 0.13}
+        
+        def respond(request, context):
+            params = request.json()
+            context.status_code = 200
+            # Fails CA_1 for the 90 day window only.
+            if params["geometry"][0] == -2.7 and params["match_window"] == 90:
+                context.status_code = 500
+                return b''
+            return json.dumps([{"time": "2023-06-01", "et": values[params["geometry"][0]]}]).encode()
+        
+        requests_mock.post(url="https://developer.openet.org/awesome_endpoint", content=respond)
+        
+        sweep = Sweep(deepcopy(queue), reference, api_key='1234567890')
+        for window in [60, 90]:
+            et_arg = ETArg(
+                "et",
+                args={
+                    "endpoint": "https://developer.openet.org/awesome_endpoint",
+                    "date_range": ["2023-06-01", "2023-07-01"],
+                    "variable": "ET",
+                    "match_window": window,
+                },
+            )
+            sweep.add([et_arg], f"data/sweep/window_{window}.csv")
+        
+        completed = []
+        failed = sweep.start(
+            frequency='monthly', max_workers=4, on_complete=lambda filename, fetch: completed.append(filename)
+        )
+        
+        result_data = pd.read_csv(f"{cwd}/test/mock_result.csv")
+        
+        assert failed == 1
+        assert sorted(completed) == ["data/sweep/window_60.csv", "data/sweep/window_90.csv"]
+        pd_testing.assert_frame_equal(pd.read_csv("data/sweep/window_60.csv"), result_data, check_like=True)
+        # A failed field is only discarded from its own cell.
+        pd_testing.assert_frame_equal(
+            pd.read_csv("data/sweep/window_90.csv"), result_data[result_data["field_id"] != "CA_1"].reset_index(drop=True), check_like=True
+        )
+        
+        # Finished cells are skipped when the sweep is resumed.
+        history = len(requests_mock.request_history)
+        Path("data/sweep/window_90.csv").unlink()
+        sweep.start(frequency='monthly', max_workers=4, skip_exists=True)
+        
+        windows = {request.json()["match_window"] for request in requests_mock.request_history[history:]}
+        assert windows == {90}
+        assert Path("data/sweep/window_90.csv").exists()
+
+    def ETSweep_slow_request(self, requests_mock: rm.Mocker, setup, cleandir, monkeypatch):
+        queue, reference = setup
+        
+        requests_mock.post(url="https://developer.openet.org/awesome_endpoint", content=b'[{"time": "2023-06-01", "et": 0.12}]')
+        
+        sweep = Sweep(deepcopy(queue), reference, api_key='1234567890')
+        args = []
+        for name, variable in [("et", "ET"), ("eto", "ETo")]:
+            args.append(ETArg(
+                name,
+                args={
+                    "endpoint": "https://developer.openet.org/awesome_endpoint",
+                    "date_range": ["2023-06-01", "2023-07-01"],
+                    "variable": variable,
+                },
+            ))
+        sweep.add(args, "data/sweep/slow.csv")
+        
+        # The ET request of CA_0 is held until CA_1 is requested, so its finished ETo request must free its worker.
+        # Held outside of the mocked send, which requests_mock serializes.
+        fetch = sweep.cells[0].fetch
+        request = fetch.__request__
+        requested = threading.Event()
+        waited = []
+        
+        def slow_request(req, arg, *args):
+            if arg["geometry"][0] == 1.6 and req.name == "et":
+                waited.append(requested.wait(timeout=5))
+            elif arg["geometry"][0] == -2.7:
+                requested.set()
+            return request(req, arg, *args)
+        
+        fetch.__request__ = slow_request
+        failed = sweep.start(frequency='monthly', max_workers=2)
+        
+        assert waited == [True]
+        assert failed == 0
+        assert sorted(pd.read_csv("data/sweep/slow.csv")["field_id"]) == ["CA_0", "CA_1", "CA_2"]
+
+        # With room for two fields from the oldest one running, CA_2 is not requested while CA_0 is held.
+        monkeypatch.setattr(sys.modules["src.ETSweep"], "REORDER_LIMIT", 1)
+        requested.clear()
+        waited.clear()
+        
+        sweep = Sweep(deepcopy(queue), reference, api_key='1234567890')
+        sweep.add(args, "data/sweep/capped.csv")
+        fetch = sweep.cells[0].fetch
+        request = fetch.__request__
+        
+        def capped_request(req, arg, *args):
+            if arg["geometry"][0] == 1.6 and req.name == "et":
+                waited.append(requested.wait(timeout=0.5))
+            elif arg["geometry"][0] == 2.81:
+                requested.set()
+            return request(req, arg, *args)
+        
+        fetch.__request__ = capped_request
+        failed = sweep.start(frequency='monthly', max_workers=2)
+        
+        assert waited == [False]
+        assert failed == 0
+        assert sorted(pd.read_csv("data/sweep/capped.csv")["field_id"]) == ["CA_0", "CA_1", "CA_2"]
@@ -0,0 +1,86 @@
+from src.ETException import ETException
+from src.HUC8_cache import BoundaryCache
+from src.HUC8_core import request_chunks
+
+from shapely import box
+
+import gzip
+import json
+import pytest
+import sys
+
+ENDPOINT = "https://openet-api.org/geodatabase/metadata/properties"
+
+def ETHUC8_request_chunks(requests_mock, monkeypatch):
+    monkeypatch.setattr(sys.modules["src.ETRequest"].time, "sleep", lambda _: None)
+    
+    def respond(request, context):
+        field_ids = request.json()["field_ids"]
+        # Chunks larger than two fields time out.
+        if len(field_ids) > 2:
+            context.status_code = 504
+            return b""
+        context.status_code = 200
+        return gzip.compress(json.dumps([{"field_id": field_id, "hectares": 1.5} for field_id in field_ids]).encode())
+    
+    requests_mock.post(ENDPOINT, content=respond)
+    
+    field_ids = [f"0627081{index}" for index in range(7)]
+    df = request_chunks(ENDPOINT, {"field_ids": field_ids}, "1234567890", chunk_size=4, max_workers=2, n_retries=1)
+    
+    # Failed chunks are split in half and merged back in field order.
+    assert df["field_id"].tolist() == field_ids
+    assert df.columns.tolist() == ["field_id", "hectares"]
+
+def ETHUC8_request_chunks_failed(requests_mock, monkeypatch):
+    monkeypatch.setattr(sys.modules["src.ETRequest"].time, "sleep", lambda _: None)
+    requests_mock.post(ENDPOINT, status_code=500)
+    
+    with pytest.raises(ETException):
+        request_chunks(ENDPOINT, {"field_ids": ["06270810", "06270811"]}, "1234567890", n_retries=1)
+
+def ETHUC8_request_chunks_client_error(requests_mock, monkeypatch):
+    monkeypatch.setattr(sys.modules["src.ETRequest"].time, "sleep", lambda _: None)
+    stub = requests_mock.post(ENDPOINT, status_code=401, text="Invalid API key")
+    
+    # A bad key fails every chunk the same way, so it is neither retried nor split.
+    with pytest.raises(ETException, match="401"):
+        request_chunks(ENDPOINT, {"field_ids": [f"0627081{index}" for index in range(8)]}, "1234567890", max_workers=1)
+    assert stub.call_count == 1
+
+def ETHUC8_boundary_cache(tmp_path):
+    path = tmp_path / "huc8.gpkg"
+    info = {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "geometry": {"type": "Polygon", "coordinates": [[[-120, 35], [-119, 35], [-119, 36], [-120, 36], [-120, 35]]]},
+                "properties": {"huc8": "18030012", "name": "Tulare-Buena Vista Lakes", "states": "CA"},
+            },
+            {
+                "type": "Feature",
+                "geometry": {"type": "Polygon", "coordinates": [[[-119, 35], [-118, 35], [-118, 36], [-119, 36], [-119, 35]]]},
+                "properties": {"huc8": "18030003", "name": "Middle Kern-Upper Tehachapi-Grapevine", "states": "CA"},
+            },
+        ],
+    }
+    
+    cache = BoundaryCache(path)
+    assert cache.get("18030012") is None
+    cache.put(info)
+    
+    # Reloaded from disk, watersheds are returned in the shape of getInfo().
+    cache = BoundaryCache(path)
+    assert len(cache) == 2
+    assert cache.missing(["18030012", "18030010"]) == ["18030010"]
+    
+    cached = cache.get("18030012")
+    assert cached["features"][0]["properties"]["name"] == "Tulare-Buena Vista Lakes"
+    assert cached["features"][0]["geometry"] == info["features"][0]["geometry"]
+    
+    assert cache.lookup((-119.5, 35.5)) == ["18030012"]
+    assert cache.lookup(box(-119.5, 35.2, -118.5, 35.8)) == ["18030012", "18030003"]
+    assert cache.lookup((-100, 40)) == []
+    assert cache.covers(box(-119.5, 35.2, -118.5, 35.8)) is True
+    assert cache.covers(box(-119.5, 35.2, -117.5, 35.8)) is False
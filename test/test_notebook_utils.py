@@ -0,0 +1,115 @@
+from src import Climatology
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pandas.testing as pd_testing
+import pytest
+import sys
+
+# Notebook helpers import their plotting dependencies at module level.
+sys.path.append(str(Path(__file__).resolve().parents[1] / "notebook"))
+notebook_utils = pytest.importorskip("notebook_utils")
+
+NAMES = ["actual_et", "actual_eto", "actual_etof"]
+
+class Test_NotebookUtils:
+    @pytest.fixture
+    def tables(self):
+        rng = np.random.default_rng(0)
+        keys = [("CA_0", 47), ("CA_0", 62), ("CA_1", 47), ("CA_2", 36)]
+
+        days = pd.date_range("2021-01-01", "2023-12-31")
+        history = pd.concat([
+            pd.DataFrame({"field_id": field_id, "crop": crop, "time": days, **{name: rng.random(len(days)) + 1 for name in NAMES}})
+            for field_id, crop in keys
+        ], ignore_index=True)
+        # CA_2 has no climatology for day of year 157, i.e. June 5th 2024.
+        history = history.loc[~((history["field_id"] == "CA_2") & (history["time"].dt.dayofyear == 157))]
+        history["doy"] = history["time"].dt.dayofyear
+        climatology = history.groupby(["field_id", "crop", "doy"])[NAMES].mean().reset_index()
+        avgs = history.groupby(["field_id", "crop"])[NAMES].mean().reset_index()
+
+        windows = []
+        for forecasting_date in pd.date_range("2024-06-01", periods=4, freq="7D"):
+            for field_id, crop in keys:
+                time = pd.date_range(forecasting_date + pd.Timedelta(days=1), periods=6)
+                window = pd.DataFrame({"forecasting_date": forecasting_date, "field_id": field_id, "crop": crop, "time": time})
+                for name in NAMES:
+                    window[name] = rng.random(len(time)) + 1
+                    window[name.replace("actual", "expected")] = rng.random(len(time)) + 1
+                windows.append(window)
+        table = pd.concat(windows, ignore_index=True)
+
+        first = table["forecasting_date"] == "2024-06-01"
+        # A missing actual.
+        table.loc[first & (table["field_id"] == "CA_0") & (table["crop"] == 47), "actual_et"] = [1.2, np.nan, 1.4, 1.1, 1.3, 1.5]
+        # A constant forecast, whose correlation is undefined.
+        table.loc[first & (table["field_id"] == "CA_1"), "expected_eto"] = 1.0
+        # A gap of one day inside the window.
+        table = table.loc[~(first & (table["field_id"] == "CA_0") & (table["crop"] == 62) & (table["time"] == "2024-06-04"))]
+
+        yield table.reset_index(drop=True), climatology, avgs
+
+    @staticmethod
+    def expected(table, by, climatology_ref, avgs_ref, normalize):
+        # calculate_metrics per group and variable, NaN where it fails, as groupby().apply(calculate_metrics) gave.
+        frames = []
+        for variable, (actual, expected) in notebook_utils.VARIABLES.items():
+            rows = []
+            for key, group in table.groupby(by):
+                metrics = notebook_utils.calculate_metrics(
+                    group, climatology_ref=climatology_ref, avgs_ref=avgs_ref, actual=actual, expected=expected, normalize=normalize
+                )
+                metrics = pd.Series(np.nan, index=notebook_utils.METRICS) if metrics is None else metrics
+                rows.append({**dict(zip(by, key)), **metrics.astype(float).to_dict(), "variable": variable})
+            frames.append(pd.DataFrame(rows))
+        return pd.concat(frames, ignore_index=True)
+
+    @staticmethod
+    def assert_metrics_equal(result, expected):
+        # Rounded metrics may differ by one in the last place. c_mae and c_bias are not rounded.
+        rounded = ["mae", "rmse", "corr", "bias", "skill_score"]
+        pd_testing.assert_frame_equal(
+            result.drop(columns=rounded), expected.drop(columns=rounded), check_dtype=False
+        )
+        pd_testing.assert_frame_equal(result[rounded], expected[rounded], check_dtype=False, atol=0.0100001)
+
+    @pytest.mark.parametrize("normalize", [False, True])
+    def ETNotebook_grouped_metrics(self, tables, normalize):
+        table, climatology, avgs = tables
+        by = ["forecasting_date", "field_id", "crop"]
+        reference = Climatology.from_frame(climatology, names=NAMES)
+
+        result = notebook_utils.grouped_metrics(table, climatology_ref=climatology, avgs_ref=avgs, by=by, normalize=normalize)
+        expected = self.expected(table, by, reference, avgs, normalize)
+
+        # Groups calculate_metrics fails on are NaN: the missing actual, the gap and the day without climatology.
+        failed = result.loc[result[notebook_utils.METRICS].isna().all(axis=1), by + ["variable"]]
+        assert len(failed) == 1 + 3 + 3
+        assert result["corr"].isna().sum() == len(failed) + 1
+
+        self.assert_metrics_equal(result, expected)
+
+        # Given the climatology table rather than a Climatology, calculate_metrics subtracts the climatology and the actuals by
+        # index label, and the labels of the two tables never match. Its c_bias is then NaN, where grouped_metrics pairs them
+        # day by day. Every other metric is the same.
+        by_table = self.expected(table, by, climatology, avgs, normalize)
+        assert by_table["c_bias"].isna().all()
+        self.assert_metrics_equal(result.assign(c_bias=np.nan), by_table)
+
+    def ETNotebook_eval_metrics(self, tables):
+        table, climatology, avgs = tables
+        june = table[table["forecasting_date"] == "2024-06-08"]
+
+        result = notebook_utils.eval_metrics(june, climatology_ref=climatology, avgs_ref=avgs)
+        expected = self.expected(june, ["field_id", "crop"], Climatology.from_frame(climatology, names=NAMES), avgs, False)
+
+        # Variables are listed ETof, ETo, then ET.
+        assert result["variable"].unique().tolist() == ["ETof", "ETo", "ET"]
+        assert (result.dtypes == object).all()
+        expected = expected.set_index(["variable", "field_id", "crop"]).loc[
+            pd.MultiIndex.from_frame(result[["variable", "field_id", "crop"]])
+        ].reset_index()[result.columns]
+        self.assert_metrics_equal(result.astype({metric: float for metric in notebook_utils.METRICS}), expected)